@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
 from django.utils.html import format_html
 from django.db.models import Count, Q
 from .models import (
@@ -9,10 +11,18 @@ from .models import (
     Comment,
     CommentLike,
     EditProposal,
+    HeritageRevision,
+    PublicationBatch,
     Submission,
     UserProfile,
 )
+from . import proposals, publishing
 from .admin_site import admin_site
+from .fragments import bump
+from .object_cache import invalidate
+from .read_model import refresh_counters
+from .media_checks import check_submission_media
+from .tasks import enqueue
 
 # Unregister default User admin from default site
 admin.site.unregister(User)
@@ -63,6 +73,27 @@ class HeritageObjectAdmin(admin.ModelAdmin):
         "alternate_name", "maker", "attribution", "origin_place",
     )
     save_on_top = True
+    readonly_fields = ("poster", "revision_history")
+
+    def save_model(self, request, obj, form, change):
+        obj._revision_user = request.user  # see signals.record_object_revision
+        super().save_model(request, obj, form, change)
+
+    def revision_history(self, obj):
+        """Latest revisions with the fields each one changed"""
+        if not obj or not obj.pk:
+            return "-"
+        revisions = HeritageRevision.objects.filter(object_id=obj.pk).select_related("user").order_by("-number")[:10]
+        html = "<div style='background: #f8f9fa; padding: 10px; border-radius: 4px;'>"
+        for revision in revisions:
+            changed = "full snapshot" if revision.kind == HeritageRevision.SNAPSHOT else ", ".join(revision.data)
+            html += format_html(
+                "<div><strong>#{}</strong> {} · {} · {}: {}</div>",
+                revision.number, f"{timezone.localtime(revision.created_at):%Y-%m-%d %H:%M}", revision.user or "system", revision.source or "-", changed,
+            )
+        html += "</div>"
+        return format_html(html)
+    revision_history.short_description = "Revisions"
     
     def has_3d_model(self, obj):
         """Check if object has 3D model"""
@@ -102,6 +133,7 @@ class HeritageObjectAdmin(admin.ModelAdmin):
             "fields": (
                 "image",
                 "model_3d",
+                "poster",
             )
         }),
         ("📝 Identification Details", {
@@ -128,6 +160,11 @@ class HeritageObjectAdmin(admin.ModelAdmin):
                        "accession_number", "object_number", "record_id", "metadata_usage",
                        "guid", "related_resource"),
         }),
+        ("🕘 History", {
+            "classes": ("collapse",),
+            "description": "Changes recorded for this object (see also Heritage revisions)",
+            "fields": ("revision_history",),
+        }),
     )
 
     class Media:
@@ -137,12 +174,59 @@ class HeritageObjectAdmin(admin.ModelAdmin):
 @admin.register(Submission, site=admin_site)
 class SubmissionAdmin(admin.ModelAdmin):
     """Community submissions awaiting review"""
-    list_display = ("title", "user", "status", "region", "object_type", "created_at")
-    list_filter = ("status", "created_at", "region", "object_type", "ich_domain")
+    list_display = ("title", "user", "status", "media_check", "published_object", "region", "object_type", "created_at")
+    list_filter = ("status", "media_status", "created_at", "region", "object_type", "ich_domain")
     search_fields = ("title", "description", "user__username", "user__email")
     raw_id_fields = ("user",)
     date_hierarchy = "created_at"
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'media_status', 'media_checked_at', 'media_report_detail',
+                       'heritage_object')
+    
+    MEDIA_STATUS_COLORS = {
+        "pending": "#6c757d",
+        "ok": "green",
+        "warning": "#d97706",
+        "error": "#dc2626",
+    }
+
+    def media_check(self, obj):
+        """Show the result of the background media checks"""
+        problems = obj.media_report.get("problems", []) if obj.media_report else []
+        label = obj.get_media_status_display()
+        if problems:
+            label = f"{label} ({len(problems)})"
+        return format_html(
+            '<span style="color: {};">{}</span>',
+            self.MEDIA_STATUS_COLORS.get(obj.media_status, "gray"), label,
+        )
+    media_check.short_description = "Media"
+
+    def media_report_detail(self, obj):
+        """Show technical metadata and problems found in the uploaded files"""
+        report = obj.media_report if obj else None
+        if not report:
+            return "Not checked yet"
+        html = "<div style='background: #f8f9fa; padding: 10px; border-radius: 4px;'>"
+        for problem in report.get("problems", []):
+            color = self.MEDIA_STATUS_COLORS.get(problem["level"], "gray")
+            html += format_html(
+                "<div style='color: {};'>⚠ <strong>{}:</strong> {}</div>",
+                color, problem["field"], problem["message"],
+            )
+        for field in ("image", "model_3d"):
+            for key, value in report.get(field, {}).items():
+                html += format_html("<strong>{}.{}:</strong> {}<br>", field, key, value)
+        html += "</div>"
+        return format_html(html)
+    media_report_detail.short_description = "Media Report"
+
+    def published_object(self, obj):
+        """Link to the HeritageObject this submission was published as"""
+        if not obj.heritage_object_id:
+            return "-"
+        url = reverse(f"{self.admin_site.name}:archive_heritageobject_change", args=[obj.heritage_object_id])
+        return format_html('<a href="{}">#{}</a>', url, obj.heritage_object_id)
+    published_object.short_description = "Published"
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -150,7 +234,7 @@ class SubmissionAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ("📥 Submission Info", {
-            "fields": ("user", "status")
+            "fields": ("user", "status", "heritage_object")
         }),
         ("🏛️ Heritage Details", {
             "fields": ("title", "description", "region", "object_type", "ich_domain",
@@ -159,6 +243,9 @@ class SubmissionAdmin(admin.ModelAdmin):
         ("📸 Media", {
             "fields": ("image", "model_3d")
         }),
+        ("🔍 Media Checks", {
+            "fields": ("media_status", "media_checked_at", "media_report_detail")
+        }),
         ("📝 Additional Information", {
             "classes": ("collapse",),
             "fields": ("alternate_name", "maker", "attribution", "copy_after", "sitter",
@@ -171,24 +258,105 @@ class SubmissionAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['approve_submissions', 'reject_submissions']
+    actions = ['approve_submissions', 'reject_submissions', 'recheck_media']
     
     def approve_submissions(self, request, queryset):
-        updated = queryset.update(status='approved')
-        self.message_user(request, f'{updated} submissions approved.')
-    approve_submissions.short_description = "Approve selected submissions"
+        """Approve and publish; large selections run as a background batch"""
+        ids = list(queryset.filter(heritage_object__isnull=True).values_list("pk", flat=True))
+        already = queryset.count() - len(ids)
+        if len(ids) <= publishing.INLINE_LIMIT:
+            published, skipped = publishing.publish_submissions(ids)
+            self.message_user(request, f'{published} submissions approved and published'
+                                       f' ({already + skipped} already published).')
+            return
+        batch = publishing.start_batch(request.user, ids)
+        url = reverse(f"{self.admin_site.name}:archive_publicationbatch_change", args=[batch.pk])
+        self.message_user(request, format_html(
+            'Publishing {} submissions in the background ({} already published): '
+            '<a href="{}">follow batch #{}</a>.', len(ids), already, url, batch.pk,
+        ))
+    approve_submissions.short_description = "Approve and publish selected submissions"
     
     def reject_submissions(self, request, queryset):
         updated = queryset.update(status='rejected')
         self.message_user(request, f'{updated} submissions rejected.')
     reject_submissions.short_description = "Reject selected submissions"
 
+    def recheck_media(self, request, queryset):
+        pks = list(queryset.values_list("pk", flat=True))
+        # Mark them pending first: a check may finish before this returns
+        Submission.objects.filter(pk__in=pks).update(media_status="pending")
+        for pk in pks:
+            enqueue(check_submission_media, pk)
+        self.message_user(request, f'Media checks queued for {len(pks)} submissions.')
+    recheck_media.short_description = "Re-run media checks"
+
+
+@admin.register(PublicationBatch, site=admin_site)
+class PublicationBatchAdmin(admin.ModelAdmin):
+    """Background publishing of large moderation batches"""
+    list_display = ("__str__", "user", "status", "progress", "published", "skipped", "created_at", "finished_at")
+    list_filter = ("status", "created_at")
+    readonly_fields = ("user", "status", "progress", "total", "published", "skipped", "error",
+                       "created_at", "finished_at")
+    exclude = ("submission_ids",)
+    actions = ["rerun_batches"]
+
+    def progress(self, obj):
+        """Share of the batch's submissions processed so far"""
+        percent = int(100 * obj.processed / obj.total) if obj.total else 100
+        return format_html(
+            '<div style="width: 120px; background: #e5e7eb; border-radius: 4px;">'
+            '<div style="width: {}%; background: {}; color: white; padding: 0 4px; border-radius: 4px;">{}%</div>'
+            '</div>',
+            percent, "#dc2626" if obj.status == "failed" else "green", percent,
+        )
+    progress.short_description = "Progress"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def rerun_batches(self, request, queryset):
+        """Run failed batches again; published submissions are skipped"""
+        batches = queryset.filter(status="failed")
+        for pk in batches.values_list("pk", flat=True):
+            enqueue(publishing.run_batch, pk)
+        updated = batches.update(status="queued")
+        self.message_user(request, f'{updated} failed batches queued again.')
+    rerun_batches.short_description = "Run failed batches again"
+
+
+@admin.register(HeritageRevision, site=admin_site)
+class HeritageRevisionAdmin(admin.ModelAdmin):
+    """Field-level change history of heritage objects"""
+    list_display = ("object_id", "number", "kind", "changed_fields", "user", "source", "created_at")
+    list_filter = ("kind", "source", "created_at")
+    search_fields = ("=object_id",)
+    date_hierarchy = "created_at"
+    raw_id_fields = ("user",)
+
+    def changed_fields(self, obj):
+        """Fields written by this revision"""
+        if obj.kind == HeritageRevision.SNAPSHOT:
+            return "full snapshot"
+        return ", ".join(obj.data)
+    changed_fields.short_description = "Changes"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(EditProposal, site=admin_site)
 class EditProposalAdmin(admin.ModelAdmin):
     """Proposed edits from community members"""
-    list_display = ("user", "object", "status", "proposal_summary", "created_at")
-    list_filter = ("status", "created_at")
+    list_display = ("user", "object", "status", "proposal_summary", "created_at", "applied_at")
+    list_filter = ("status", "created_at", "applied_at")
     search_fields = ("user__username", "user__email", "object__title", "note")
     raw_id_fields = ("user", "object")
     date_hierarchy = "created_at"
@@ -201,15 +369,18 @@ class EditProposalAdmin(admin.ModelAdmin):
         return "No changes"
     proposal_summary.short_description = "Changes"
     
-    readonly_fields = ('created_at', 'updated_at', 'proposal_summary_detail')
+    readonly_fields = ('created_at', 'updated_at', 'proposal_summary_detail', 'applied_at', 'conflicts_detail')
     
     fieldsets = (
         ("✏️ Edit Proposal", {
-            "fields": ("user", "object", "status")
+            "fields": ("user", "object", "status", "applied_at")
         }),
         ("📝 Proposed Changes", {
             "fields": ("data", "note", "proposal_summary_detail")
         }),
+        ("⚠️ Conflicts", {
+            "fields": ("conflicts_detail",)
+        }),
         ("📅 Timestamps", {
             "fields": ("created_at", "updated_at"),
             "classes": ("collapse",)
@@ -226,13 +397,34 @@ class EditProposalAdmin(admin.ModelAdmin):
             return format_html(html)
         return "No changes yet"
     proposal_summary_detail.short_description = "Proposed Changes Detail"
+
+    def conflicts_detail(self, obj):
+        """Why the proposal could not be applied"""
+        if not obj or not obj.conflicts:
+            return "No conflicts"
+        html = "<div style='background: #f8f9fa; padding: 10px; border-radius: 4px;'>"
+        for field, problem in obj.conflicts.items():
+            html += format_html(
+                "<div style='color: #dc2626;'><strong>{}:</strong> {}</div>"
+                "<div>current: {} → proposed: {}</div>",
+                field, problem.get("reason"), problem.get("current", "-"), problem.get("proposed"),
+            )
+        html += "</div>"
+        return format_html(html)
+    conflicts_detail.short_description = "Conflicts"
     
-    actions = ['approve_edits', 'reject_edits']
+    actions = ['approve_edits', 'apply_edits_overwriting', 'reject_edits']
     
     def approve_edits(self, request, queryset):
-        updated = queryset.update(status='approved')
-        self.message_user(request, f'{updated} edit proposals approved.')
-    approve_edits.short_description = "Approve selected edits"
+        """Approve and apply; conflicting proposals are left for review"""
+        result = proposals.apply_proposals(queryset, user=request.user)
+        self.message_user(request, f'Edit proposals: {result}.')
+    approve_edits.short_description = "Approve and apply selected edits"
+
+    def apply_edits_overwriting(self, request, queryset):
+        result = proposals.apply_proposals(queryset, force=True, user=request.user)
+        self.message_user(request, f'Edit proposals: {result}.')
+    apply_edits_overwriting.short_description = "Apply selected edits, overwriting conflicts"
     
     def reject_edits(self, request, queryset):
         updated = queryset.update(status='rejected')
@@ -263,13 +455,25 @@ class CommentAdmin(admin.ModelAdmin):
     
     actions = ['mark_deleted', 'mark_active']
     
+    def _set_deleted(self, queryset, deleted):
+        # Read the rows before the update: the changelist may filter on
+        # is_deleted, and the queryset would then match none of them after.
+        rows = list(queryset.values_list("pk", "parent_id", "object_id"))
+        pks = [pk for pk, _parent_id, _object_id in rows]
+        updated = Comment.objects.filter(pk__in=pks).update(is_deleted=deleted)
+        bump("comment", *{value for pk, parent_id, _object_id in rows for value in (pk, parent_id) if value})
+        invalidate(Comment, *pks)
+        for object_id in {object_id for _pk, _parent_id, object_id in rows}:
+            refresh_counters(object_id)
+        return updated
+
     def mark_deleted(self, request, queryset):
-        updated = queryset.update(is_deleted=True)
+        updated = self._set_deleted(queryset, True)
         self.message_user(request, f'{updated} comments marked as deleted.')
     mark_deleted.short_description = "Mark as deleted"
     
     def mark_active(self, request, queryset):
-        updated = queryset.update(is_deleted=False)
+        updated = self._set_deleted(queryset, False)
         self.message_user(request, f'{updated} comments marked as active.')
     mark_active.short_description = "Mark as active"
 
@@ -419,6 +623,14 @@ class DefaultHeritageObjectAdmin(HeritageObjectAdmin):
 class DefaultSubmissionAdmin(SubmissionAdmin):
     pass
 
+@admin.register(PublicationBatch)
+class DefaultPublicationBatchAdmin(PublicationBatchAdmin):
+    pass
+
+@admin.register(HeritageRevision)
+class DefaultHeritageRevisionAdmin(HeritageRevisionAdmin):
+    pass
+
 @admin.register(EditProposal)
 class DefaultEditProposalAdmin(EditProposalAdmin):
     pass
@@ -35,6 +35,12 @@ class TurathAdminSite(AdminSite):
                     elif model_name == 'Submission':
                         model['description'] = 'Community-submitted heritage items awaiting review and approval'
                         heritage_models.append(model)
+                    elif model_name == 'HeritageRevision':
+                        model['description'] = 'Field-level change history of heritage objects'
+                        heritage_models.append(model)
+                    elif model_name == 'PublicationBatch':
+                        model['description'] = 'Progress of submissions being published in the background'
+                        heritage_models.append(model)
                     elif model_name == 'EditProposal':
                         model['description'] = 'Proposed edits to existing heritage objects from community members'
                         heritage_models.append(model)
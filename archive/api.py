@@ -0,0 +1,253 @@
+"""
+Read-only JSON API for the catalog (version 1, under ``/api/v1/``).
+
+    GET /api/v1/objects/              list (filters: region, type, ich_domain, q)
+    GET /api/v1/objects/<id>/         one object with its full metadata
+    GET /api/v1/search/?q=…           list restricted to a title search
+    GET /api/v1/facets/               region/type/domain counts for the filters
+
+Lists and facets read the per-language HeritageCard read model
+(archive/read_model.py), so every request is one indexed query.
+
+* ``fields=id,title,…`` returns only those fields (sparse fieldsets);
+  without it lists return a compact default set.
+* ``lang=ar`` selects the language of titles, descriptions and labels;
+  otherwise the site language negotiation applies (cookie or
+  Accept-Language). ``Content-Language`` says which one was used.
+* Lists are paged by object id: ``next`` is the URL of the following page,
+  with an opaque ``cursor``; ``limit`` is at most ``MAX_LIMIT``.
+* Responses carry a strong ``ETag`` over the exact bytes sent, and
+  ``If-None-Match`` gets a bodiless 304.
+"""
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import HeritageCard, HeritageObject
+from .object_cache import get_cached
+
+VERSION = "1"
+DEFAULT_LIMIT = 24
+MAX_LIMIT = 100
+MAX_AGE = 60
+
+CARD_FIELDS = (
+    "id", "title", "description",
+    "region", "region_label",
+    "object_type", "object_type_label",
+    "ich_domain", "ich_domain_label",
+    "origin_date",
+    "image_url", "thumbnail_url", "poster_url", "has_model",
+    "like_count", "comment_count",
+    "url",
+)
+DEFAULT_LIST_FIELDS = (
+    "id", "title", "region", "object_type", "origin_date",
+    "thumbnail_url", "has_model", "like_count", "comment_count",
+)
+METADATA_FIELDS = (
+    "alternate_name", "maker", "attribution", "copy_after", "sitter",
+    "date_text", "period", "origin_place",
+    "provenance", "collector", "site_name", "field_identifier",
+    "materials", "dimensions", "weight", "taxon",
+    "collection_name", "on_view_location", "exhibition_history",
+    "credit_line", "data_source", "rights",
+    "accession_number", "object_number", "record_id", "metadata_usage",
+    "guid", "related_resource",
+    "model_url",
+)
+DETAIL_FIELDS = CARD_FIELDS + METADATA_FIELDS
+FACETS = ("region", "object_type", "ich_domain")
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def api_view(view):
+    """GET/HEAD only, errors as JSON."""
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            response = JsonResponse({"error": "Method not allowed."}, status=405)
+            response["Allow"] = "GET, HEAD"
+            return response
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse({"error": exc.message}, status=exc.status)
+        except Http404:
+            return JsonResponse({"error": "Not found."}, status=404)
+
+    return wrapper
+
+
+# ---------- Parameters ----------
+
+def _language(request):
+    language = request.GET.get("lang")
+    if not language:
+        return request.LANGUAGE_CODE
+    codes = [code for code, _name in settings.LANGUAGES]
+    if language not in codes:
+        raise ApiError(f"Unknown lang {language!r}; use one of {', '.join(codes)}.")
+    return language
+
+
+def _fields(request, available, default):
+    requested = request.GET.get("fields")
+    if not requested:
+        return default
+    fields = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}.")
+    return fields
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError("limit must be a number.")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _encode_cursor(object_id):
+    return urlsafe_base64_encode(f"id:{object_id}".encode())
+
+
+def _decode_cursor(cursor):
+    try:
+        kind, value = urlsafe_base64_decode(cursor).decode().split(":")
+        if kind != "id":
+            raise ValueError
+        return int(value)
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError("Invalid cursor.")
+
+
+def _filtered_cards(request, language, exclude=None):
+    cards = HeritageCard.objects.filter(language=language)
+    filters = {"region": "region", "type": "object_type", "ich_domain": "ich_domain"}
+    for param, field in filters.items():
+        value = request.GET.get(param, "").strip().lower()
+        if value and field != exclude:
+            cards = cards.filter(**{field: value})
+    q = " ".join(request.GET.get("q", "").split())
+    if q:
+        cards = cards.filter(title__icontains=q)
+    return cards
+
+
+# ---------- Serialization ----------
+
+def _card(request, card, fields):
+    item = {}
+    for name in fields:
+        if name == "id":
+            item[name] = card.object_id
+        elif name == "url":
+            item[name] = request.build_absolute_uri(reverse("heritage-detail", args=[card.object_id]))
+        elif name.endswith("_url") and getattr(card, name):
+            item[name] = request.build_absolute_uri(getattr(card, name))
+        else:
+            item[name] = getattr(card, name) if name in CARD_FIELDS else None
+    return item
+
+
+def _respond(request, payload, language):
+    """Compact JSON with a strong ETag; 304 if the client has it already."""
+    body = json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")).encode()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    response["Content-Language"] = language
+    response["Cache-Control"] = f"public, max-age={MAX_AGE}"
+    response["API-Version"] = VERSION
+    patch_vary_headers(response, ("Accept-Language", "Cookie"))
+    return response
+
+
+# ---------- Views ----------
+
+@api_view
+def object_list(request):
+    language = _language(request)
+    fields = _fields(request, CARD_FIELDS, DEFAULT_LIST_FIELDS)
+    limit = _limit(request)
+
+    cards = _filtered_cards(request, language).order_by("object_id")
+    if request.GET.get("cursor"):
+        cards = cards.filter(object_id__gt=_decode_cursor(request.GET["cursor"]))
+    page = list(cards[:limit + 1])
+
+    next_url = None
+    if len(page) > limit:
+        page = page[:limit]
+        params = request.GET.copy()
+        params["cursor"] = _encode_cursor(page[-1].object_id)
+        next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    return _respond(request, {"data": [_card(request, card, fields) for card in page], "next": next_url}, language)
+
+
+@api_view
+def search(request):
+    if not request.GET.get("q", "").strip():
+        raise ApiError("q is required.")
+    return object_list.__wrapped__(request)
+
+
+@api_view
+def object_detail(request, pk: int):
+    language = _language(request)
+    fields = _fields(request, DETAIL_FIELDS, DETAIL_FIELDS)
+    card = HeritageCard.objects.filter(object_id=pk, language=language).first()
+    if card is None:
+        raise Http404
+
+    item = _card(request, card, [name for name in fields if name in CARD_FIELDS])
+    if any(name in METADATA_FIELDS for name in fields):
+        obj = get_cached(HeritageObject, pk)
+        if obj is None:
+            raise Http404
+        for name in fields:
+            if name == "model_url":
+                item[name] = request.build_absolute_uri(obj.model_3d.url) if obj.model_3d else None
+            elif name in METADATA_FIELDS:
+                item[name] = getattr(obj, name)
+    return _respond(request, {"data": {name: item[name] for name in fields}}, language)
+
+
+@api_view
+def facets(request):
+    language = _language(request)
+    data = {}
+    for field in FACETS:
+        # Each facet counts within the other filters, not its own, so a
+        # client can show the alternatives to the selected value.
+        rows = (
+            _filtered_cards(request, language, exclude=field)
+            .values(field, f"{field}_label")
+            .annotate(count=Count("pk"))
+            .order_by("-count", field)
+        )
+        data[field] = [
+            {"value": row[field], "label": row[f"{field}_label"], "count": row["count"]}
+            for row in rows
+        ]
+    return _respond(request, {"data": data}, language)
@@ -6,4 +6,5 @@ class ArchiveConfig(AppConfig):
     name = 'archive'
 
     def ready(self):
+        import archive.assets  # registers the asset bundle checks
         import archive.signals
@@ -0,0 +1,218 @@
+"""
+Self-hosted front-end asset bundle.
+
+The public pages need Tailwind, Alpine.js (+ persist), model-viewer and the
+IBM Plex fonts. Instead of pulling floating versions from three CDNs and
+compiling Tailwind in the browser, ``manage.py build_assets``:
+
+* downloads pinned copies of the libraries and fonts into
+  ``archive/static/vendor/`` and checks them against ``vendor.lock.json``;
+* writes ``vendor/fonts/fonts.css`` with ``@font-face`` rules for them;
+* runs the pinned Tailwind standalone CLI over the templates to produce
+  ``css/tailwind.css`` containing only the utility classes actually used.
+
+``collectstatic`` then fingerprints everything and writes ``.gz``/``.br``
+siblings (``CompressedManifestStaticFilesStorage``) and WhiteNoise serves
+them with immutable cache headers.
+
+The vendored files and the lock are meant to be committed with the code.
+A file is only pinned by an explicit ``build_assets --update-lock``, never
+on first download. Pages use the bundle only once every file of it is
+present; until then they keep loading the pinned CDN copies and the
+Tailwind Play CDN, so a checkout without a built bundle still renders, and
+``check --deploy`` warns about the missing bundle or lock entries.
+"""
+import hashlib
+import json
+import os
+import platform
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core import checks
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+STATIC_SRC = os.path.join(settings.BASE_DIR, "archive", "static")
+VENDOR_DIR = "vendor"
+LOCK_FILE = os.path.join(STATIC_SRC, VENDOR_DIR, "vendor.lock.json")
+
+TAILWIND_VERSION = "3.4.17"
+TAILWIND_CONFIG = os.path.join(STATIC_SRC, "js", "tailwind.config.js")
+TAILWIND_INPUT = os.path.join(settings.BASE_DIR, "archive", "static_src", "tailwind.css")
+TAILWIND_OUTPUT = "css/tailwind.css"
+TAILWIND_PLAY_URL = f"https://cdn.tailwindcss.com/{TAILWIND_VERSION}"
+
+JSDELIVR = "https://cdn.jsdelivr.net/npm"
+
+
+@dataclass(frozen=True)
+class VendorFile:
+    path: str  # relative to the static root
+    url: str
+
+
+SCRIPTS = {
+    "alpine": VendorFile(
+        f"{VENDOR_DIR}/alpinejs-3.14.8.min.js",
+        f"{JSDELIVR}/alpinejs@3.14.8/dist/cdn.min.js",
+    ),
+    "alpine-persist": VendorFile(
+        f"{VENDOR_DIR}/alpinejs-persist-3.14.8.min.js",
+        f"{JSDELIVR}/@alpinejs/persist@3.14.8/dist/cdn.min.js",
+    ),
+    "model-viewer": VendorFile(
+        f"{VENDOR_DIR}/model-viewer-4.0.0.min.js",
+        f"{JSDELIVR}/@google/model-viewer@4.0.0/dist/model-viewer.min.js",
+    ),
+}
+
+# Same subsets Google Fonts served before: Latin for Plex Mono, Arabic and
+# Latin for Plex Sans Arabic.
+UNICODE_RANGES = {
+    "latin": (
+        "U+0000-00FF, U+0131, U+0152-0153, U+02BB-02BC, U+02C6, U+02DA, U+02DC, "
+        "U+0304, U+0308, U+0329, U+2000-206F, U+20AC, U+2122, U+2191, U+2193, "
+        "U+2212, U+2215, U+FEFF, U+FFFD"
+    ),
+    "arabic": (
+        "U+0600-06FF, U+0750-077F, U+0870-088E, U+0890-0891, U+0897-08E1, "
+        "U+08E3-08FF, U+200C-200E, U+2010-2011, U+204F, U+2E41, U+FB50-FDFF, "
+        "U+FE70-FE74, U+FE76-FEFC"
+    ),
+}
+FONT_FAMILIES = {
+    "IBM Plex Mono": ("ibm-plex-mono", "5.1.0", ("latin",)),
+    "IBM Plex Sans Arabic": ("ibm-plex-sans-arabic", "5.1.0", ("arabic", "latin")),
+}
+FONT_WEIGHTS = (400, 500, 700)
+FONTS_CSS = f"{VENDOR_DIR}/fonts/fonts.css"
+GOOGLE_FONTS_URL = (
+    "https://fonts.googleapis.com/css2?family=IBM+Plex+Mono:wght@400;500;700"
+    "&family=IBM+Plex+Sans+Arabic:wght@400;500;700&display=swap"
+)
+
+
+def font_files():
+    """Yield (family, weight, subset, VendorFile) for every self-hosted font."""
+    for family, (package, version, subsets) in FONT_FAMILIES.items():
+        for subset in subsets:
+            for weight in FONT_WEIGHTS:
+                filename = f"{package}-{subset}-{weight}-normal.woff2"
+                yield family, weight, subset, VendorFile(
+                    f"{VENDOR_DIR}/fonts/{filename}",
+                    f"{JSDELIVR}/@fontsource/{package}@{version}/files/{filename}",
+                )
+
+
+def vendor_files():
+    return list(SCRIPTS.values()) + [vf for *_, vf in font_files()]
+
+
+def fonts_css():
+    """``@font-face`` rules for the vendored fonts, relative to fonts.css."""
+    rules = []
+    for family, weight, subset, vf in font_files():
+        rules.append(
+            "@font-face {\n"
+            f"  font-family: '{family}';\n"
+            "  font-style: normal;\n"
+            f"  font-weight: {weight};\n"
+            "  font-display: swap;\n"
+            f"  src: url('{os.path.basename(vf.path)}') format('woff2');\n"
+            f"  unicode-range: {UNICODE_RANGES[subset]};\n"
+            "}\n"
+        )
+    return "\n".join(rules)
+
+
+def tailwind_cli_url():
+    system = {"Linux": "linux", "Darwin": "macos", "Windows": "windows"}[platform.system()]
+    arch = "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "x64"
+    suffix = ".exe" if system == "windows" else ""
+    return (
+        "https://github.com/tailwindlabs/tailwindcss/releases/download/"
+        f"v{TAILWIND_VERSION}/tailwindcss-{system}-{arch}{suffix}"
+    )
+
+
+# ---------- Lock file ----------
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_lock():
+    try:
+        with open(LOCK_FILE) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+
+def write_lock(lock):
+    os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
+    with open(LOCK_FILE, "w") as fh:
+        json.dump(lock, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+# ---------- Template helpers ----------
+
+def _static_exists(path):
+    try:
+        if staticfiles_storage.exists(path):
+            return True
+    except NotImplementedError:
+        pass
+    return finders.find(path) is not None
+
+
+@lru_cache(maxsize=1)
+def bundle_ready():
+    """True once ``build_assets`` has produced every self-hosted file."""
+    paths = [TAILWIND_OUTPUT, FONTS_CSS] + [vf.path for vf in vendor_files()]
+    return all(_static_exists(path) for path in paths)
+
+
+def use_bundle():
+    """Whether pages load the self-hosted bundle rather than the CDNs.
+    Never before it is built: the manifest storage would fail on the
+    missing files."""
+    return bundle_ready()
+
+
+def script_url(name):
+    """Local URL of a vendored script, or its pinned CDN URL while the
+    bundle is not built."""
+    vf = SCRIPTS[name]
+    if use_bundle():
+        return staticfiles_storage.url(vf.path)
+    return vf.url
+
+
+# ---------- Checks ----------
+
+@checks.register(checks.Tags.staticfiles, deploy=True)
+def check_bundle(app_configs, **kwargs):
+    warnings = []
+    lock = read_lock()
+    unpinned = [vf.path for vf in vendor_files() if vf.path not in lock]
+    if unpinned:
+        warnings.append(checks.Warning(
+            f"{len(unpinned)} vendored files have no checksum in {LOCK_FILE}.",
+            hint="Run `manage.py build_assets --update-lock`, review and commit the lock file.",
+            id="archive.W001",
+        ))
+    if not bundle_ready():
+        warnings.append(checks.Warning(
+            "The self-hosted front-end bundle has not been built; pages load the pinned CDN copies.",
+            hint="Run `manage.py build_assets` and commit archive/static/vendor and css/tailwind.css.",
+            id="archive.W002",
+        ))
+    return warnings
@@ -0,0 +1,81 @@
+"""
+Cached result lists for the catalog filter page.
+
+``/filter/`` is requested over and over with the same region/type/search
+combinations, by crawlers following the quick-filter links as much as by
+people paging through results. For each normalized combination (and site
+language, since search matches the title in that language as well as the
+English one) we cache the ordered list of matching object ids; every page
+of that query is then a slice of the list plus one ``pk__in`` query for
+the cards on it.
+
+All lists share a generation token that is bumped whenever a heritage
+object is created, changed or deleted (see archive/signals.py), so one
+write invalidates every cached combination at once; the TTL only bounds
+how long an unused list occupies the cache.
+"""
+import hashlib
+import string
+import time
+
+from django.core.cache import cache
+from django.db.models import Q
+
+FILTER_TIMEOUT = 60 * 10
+PAGE_SIZE = 48
+
+GENERATION_KEY = "filter-ids:generation"
+
+
+# Only ASCII letters are folded for the cache key: SQLite's LIKE (and so
+# icontains) ignores case for ASCII only, so "Épée" and "épée" may match
+# different rows and must not share an entry.
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def normalize(region=None, obj_type=None, q=None):
+    """Canonical (region, type, q): trimmed, with the search text's
+    whitespace collapsed. The search keeps its case for the query."""
+    return (
+        (region or "").strip().lower(),
+        (obj_type or "").strip().lower(),
+        " ".join((q or "").split()),
+    )
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = time.time_ns()
+        cache.add(GENERATION_KEY, generation, None)
+        generation = cache.get(GENERATION_KEY, generation)
+    return generation
+
+
+def invalidate():
+    """Drop every cached result list."""
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def _key(language, params):
+    """Equivalent URLs share one entry, whatever the ASCII case of the search."""
+    digest = hashlib.sha1("\x1f".join(params).translate(_ASCII_LOWER).encode()).hexdigest()
+    return f"filter-ids:{_generation()}:{language}:{digest}"
+
+
+def matching_ids(cards, language, params):
+    """Ordered object ids of ``cards`` (HeritageCards in ``language``)
+    matching the normalized ``params``, from the cache when possible."""
+    key = _key(language, params)
+    ids = cache.get(key)
+    if ids is None:
+        region, obj_type, q = params
+        if region:
+            cards = cards.filter(region=region)
+        if obj_type:
+            cards = cards.filter(object_type=obj_type)
+        if q:
+            cards = cards.filter(Q(title__icontains=q) | Q(object__title__icontains=q))
+        ids = list(cards.values_list("object_id", flat=True))
+        cache.set(key, ids, FILTER_TIMEOUT)
+    return ids
@@ -0,0 +1,58 @@
+"""
+Version keys for cached template fragments.
+
+Object cards and comments are cached with ``{% cache %}`` under a key that
+includes a version token per object/comment/user (see the
+``fragment_version`` template tag). Anything that changes what a fragment
+shows calls ``bump()`` — the signals in archive/signals.py do this for
+saves, deletes and likes — so the next render misses and stale entries
+simply age out.
+
+Versions are nanosecond timestamps rather than counters, so a version that
+was evicted from the cache comes back as a new value instead of reusing an
+old one.
+
+A page that shows many fragments reads all their versions up front with
+``versions()`` (one ``get_many``) and passes them as the
+``fragment_versions`` context variable, which the tag uses before asking
+the cache itself.
+"""
+import time
+
+from django.core.cache import cache
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+def _key(kind, pk):
+    return f"fragment-version:{kind}:{pk}"
+
+
+def versions(pairs):
+    """{(kind, pk): version} for ``(kind, pk)`` pairs, in one cache read."""
+    keys = {(kind, pk): _key(kind, pk) for kind, pk in pairs}
+    if not keys:
+        return {}
+    found = cache.get_many(list(keys.values()))
+    missing = {key: time.time_ns() for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {pair: found[key] for pair, key in keys.items()}
+
+
+def fragment_version(*pairs, known=None):
+    """Combined version token for ``(kind, pk)`` pairs, e.g.
+    ``fragment_version(("comment", 3), ("user", 7))``; ``known`` holds
+    versions already read with ``versions()``."""
+    known = known or {}
+    found = versions([pair for pair in pairs if pair not in known])
+    return ".".join(str(known.get(pair) or found[pair]) for pair in pairs)
+
+
+def bump(kind, *pks):
+    """Invalidate every cached fragment that depends on these rows."""
+    pks = [pk for pk in pks if pk is not None]
+    if pks:
+        now = time.time_ns()
+        cache.set_many({_key(kind, pk): now for pk in pks}, None)
@@ -0,0 +1,342 @@
+"""
+OAI-PMH 2.0 harvesting of the catalog.
+
+Aggregators poll ``/oai/`` with the standard verbs (Identify,
+ListMetadataFormats, ListSets, ListIdentifiers, ListRecords, GetRecord)
+and receive Dublin Core (``oai_dc``) records. Harvests are incremental:
+
+* every HeritageObject carries ``updated_at`` and deleted objects leave a
+  ``HeritageTombstone`` (see archive/signals.py), so ``from``/``until``
+  select what changed in a window and deletions are reported as
+  ``status="deleted"`` headers;
+* lists are paged with keyset cursors over ``(datestamp, kind, id)``
+  rather than offsets, so each page is an indexed range scan however deep
+  the harvest goes, and rows changing mid-harvest never shift later pages;
+* the cursor and the harvest arguments travel in a signed, opaque
+  resumption token, so no per-harvest state is kept on the server and
+  tokens do not expire.
+"""
+import heapq
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Min, Q
+from django.urls import reverse
+
+from .models import HeritageObject, HeritageTombstone
+
+PAGE_SIZE = 100
+REPOSITORY_NAME = "Turath3D"
+GRANULARITY = "YYYY-MM-DDThh:mm:ssZ"
+TOKEN_SALT = "archive.harvest"
+
+METADATA_FORMATS = {
+    "oai_dc": {
+        "schema": "http://www.openarchives.org/OAI/2.0/oai_dc.xsd",
+        "namespace": "http://www.openarchives.org/OAI/2.0/oai_dc/",
+    },
+}
+
+VERBS = {
+    # verb: (required, optional, exclusive)
+    "Identify": ((), (), None),
+    "ListMetadataFormats": ((), ("identifier",), None),
+    "ListSets": ((), (), "resumptionToken"),
+    "ListIdentifiers": (("metadataPrefix",), ("from", "until", "set"), "resumptionToken"),
+    "ListRecords": (("metadataPrefix",), ("from", "until", "set"), "resumptionToken"),
+    "GetRecord": (("identifier", "metadataPrefix"), (), None),
+}
+
+RECORD, DELETED = 0, 1
+
+
+class OAIError(Exception):
+    """An OAI-PMH error condition; ``code`` is the protocol error code."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+# ---------- Arguments ----------
+
+def check_arguments(params):
+    """Validate the request arguments against the verb; returns the verb."""
+    verb = params.get("verb")
+    if isinstance(verb, list) or verb not in VERBS:
+        raise OAIError("badVerb", "Illegal or missing verb.")
+    required, optional, exclusive = VERBS[verb]
+    allowed = {"verb", *required, *optional} | ({exclusive} if exclusive else set())
+    for name, value in params.items():
+        if name not in allowed:
+            raise OAIError("badArgument", f"Illegal argument {name!r} for {verb}.")
+        if isinstance(value, list):
+            raise OAIError("badArgument", f"Repeated argument {name!r}.")
+    if exclusive and exclusive in params:
+        if len(params) > 2:
+            raise OAIError("badArgument", f"{exclusive} is an exclusive argument.")
+        return verb
+    missing = [name for name in required if not params.get(name)]
+    if missing:
+        raise OAIError("badArgument", f"Missing argument {', '.join(missing)}.")
+    return verb
+
+
+def parse_datestamp(value, until=False):
+    """A UTC datetime from a day or seconds granularity datestamp. An
+    ``until`` day covers the whole day."""
+    try:
+        if len(value) == 10:
+            day = datetime.strptime(value, "%Y-%m-%d").date()
+            moment = datetime.combine(day, time.max if until else time.min)
+        else:
+            moment = datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+            if until:
+                moment += timedelta(microseconds=999999)
+    except ValueError:
+        raise OAIError("badArgument", f"Bad datestamp {value!r}; use YYYY-MM-DD or {GRANULARITY}.")
+    return moment.replace(tzinfo=dt_timezone.utc)
+
+
+def format_datestamp(moment):
+    return moment.astimezone(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def check_metadata_prefix(prefix):
+    if prefix not in METADATA_FORMATS:
+        raise OAIError("cannotDisseminateFormat", f"Unsupported metadataPrefix {prefix!r}.")
+
+
+# ---------- Identifiers ----------
+
+def repository_identifier(request):
+    return getattr(settings, "OAI_REPOSITORY_IDENTIFIER", None) or request.get_host().split(":")[0]
+
+
+def identifier_for(request, pk):
+    return f"oai:{repository_identifier(request)}:{pk}"
+
+
+def pk_from_identifier(request, identifier):
+    prefix = f"oai:{repository_identifier(request)}:"
+    if identifier.startswith(prefix) and identifier[len(prefix):].isdigit():
+        return int(identifier[len(prefix):])
+    raise OAIError("idDoesNotExist", f"Unknown identifier {identifier!r}.")
+
+
+# ---------- Resumption tokens ----------
+
+def make_token(verb, harvest, cursor, delivered):
+    return signing.dumps(
+        {"v": verb, **harvest, "c": [cursor[0].isoformat(), cursor[1], cursor[2]], "n": delivered},
+        salt=TOKEN_SALT,
+        compress=True,
+    )
+
+
+def read_token(verb, token):
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT)
+        if data.pop("v") != verb:
+            raise ValueError
+        moment, kind, pk = data.pop("c")
+        cursor = (datetime.fromisoformat(moment), int(kind), int(pk))
+        delivered = int(data.pop("n"))
+    except (signing.BadSignature, ValueError, KeyError, TypeError):
+        raise OAIError("badResumptionToken", "The resumptionToken is invalid.")
+    return data, cursor, delivered
+
+
+# ---------- Lists ----------
+
+def _after(field, id_field, kind, cursor):
+    """Rows of ``kind`` that come after ``cursor`` in (datestamp, kind, id) order."""
+    moment, cursor_kind, pk = cursor
+    if kind > cursor_kind:
+        return Q(**{f"{field}__gte": moment})
+    if kind < cursor_kind:
+        return Q(**{f"{field}__gt": moment})
+    return Q(**{f"{field}__gt": moment}) | Q(**{field: moment, f"{id_field}__gt": pk})
+
+
+def _window(field, harvest):
+    q = Q()
+    if harvest.get("from"):
+        q &= Q(**{f"{field}__gte": datetime.fromisoformat(harvest["from"])})
+    if harvest.get("until"):
+        q &= Q(**{f"{field}__lte": datetime.fromisoformat(harvest["until"])})
+    return q
+
+
+def list_page(verb, params):
+    """One page of headers/records for ListIdentifiers or ListRecords.
+
+    Returns ``(entries, token, delivered, metadata_prefix)``: entries are
+    ``(datestamp, kind, pk, obj_or_tombstone)``, ``delivered`` counts the
+    entries sent on earlier pages, and ``token`` is None when the list fit
+    on one page and "" on the last page of a resumed list."""
+    if "resumptionToken" in params:
+        harvest, cursor, delivered = read_token(verb, params["resumptionToken"])
+    else:
+        check_metadata_prefix(params["metadataPrefix"])
+        if params.get("set"):
+            raise OAIError("noSetHierarchy", "This repository does not support sets.")
+        harvest = {"m": params["metadataPrefix"]}
+        start = parse_datestamp(params["from"]) if params.get("from") else None
+        end = parse_datestamp(params["until"], until=True) if params.get("until") else None
+        if start and end:
+            if len(params["from"]) != len(params["until"]):
+                raise OAIError("badArgument", "from and until must have the same granularity.")
+            if start > end:
+                raise OAIError("badArgument", "from is later than until.")
+        if start:
+            harvest["from"] = start.isoformat()
+        if end:
+            harvest["until"] = end.isoformat()
+        cursor, delivered = None, 0
+
+    records = HeritageObject.objects.filter(_window("updated_at", harvest))
+    tombstones = HeritageTombstone.objects.filter(_window("deleted_at", harvest))
+    if cursor is not None:
+        records = records.filter(_after("updated_at", "pk", RECORD, cursor))
+        tombstones = tombstones.filter(_after("deleted_at", "object_id", DELETED, cursor))
+    if verb == "ListIdentifiers":
+        records = records.only("pk", "updated_at")
+
+    entries = heapq.merge(
+        ((obj.updated_at, RECORD, obj.pk, obj) for obj in records.order_by("updated_at", "pk")[:PAGE_SIZE + 1]),
+        ((t.deleted_at, DELETED, t.object_id, t) for t in tombstones.order_by("deleted_at", "object_id")[:PAGE_SIZE + 1]),
+        key=lambda entry: entry[:3],
+    )
+    page = [entry for _i, entry in zip(range(PAGE_SIZE + 1), entries)]
+    if not page and cursor is None:
+        raise OAIError("noRecordsMatch", "No records match the request.")
+
+    token = None
+    if len(page) > PAGE_SIZE:
+        page = page[:PAGE_SIZE]
+        token = make_token(verb, harvest, page[-1][:3], delivered + len(page))
+    elif cursor is not None:
+        token = ""
+    return page, token, delivered, harvest["m"]
+
+
+def _find(request, identifier):
+    pk = pk_from_identifier(request, identifier)
+    obj = HeritageObject.objects.filter(pk=pk).first()
+    if obj is not None:
+        return (obj.updated_at, RECORD, pk, obj)
+    tombstone = HeritageTombstone.objects.filter(object_id=pk).first()
+    if tombstone is not None:
+        return (tombstone.deleted_at, DELETED, pk, tombstone)
+    raise OAIError("idDoesNotExist", f"Unknown identifier {identifier!r}.")
+
+
+def earliest_datestamp():
+    moments = [
+        HeritageObject.objects.aggregate(m=Min("updated_at"))["m"],
+        HeritageTombstone.objects.aggregate(m=Min("deleted_at"))["m"],
+    ]
+    moments = [moment for moment in moments if moment is not None]
+    return format_datestamp(min(moments)) if moments else "1970-01-01T00:00:00Z"
+
+
+def admin_emails():
+    return [email for _name, email in settings.ADMINS] or [settings.DEFAULT_FROM_EMAIL]
+
+
+# ---------- Dublin Core ----------
+
+def dublin_core(request, obj):
+    """``(element, value, language)`` triples describing ``obj`` in oai_dc.
+    Call with English active so that labels are not translated."""
+    elements = []
+
+    def add(element, value, language=None):
+        if value:
+            elements.append((element, str(value), language))
+
+    for language in ("en", "ar", "fr"):
+        suffix = "" if language == "en" else f"_{language}"
+        add("title", getattr(obj, f"title{suffix}"), language)
+    add("title", obj.alternate_name)
+    for name in ("maker", "attribution"):
+        add("creator", getattr(obj, name))
+    add("contributor", obj.collector)
+    add("subject", obj.get_ich_domain_display())
+    for language in ("en", "ar", "fr"):
+        suffix = "" if language == "en" else f"_{language}"
+        add("description", getattr(obj, f"description{suffix}"), language)
+    for name in ("provenance", "exhibition_history"):
+        add("description", getattr(obj, name))
+    add("date", obj.date_text or obj.origin_date.isoformat())
+    add("type", "PhysicalObject")
+    add("type", obj.get_object_type_display())
+    add("format", obj.materials)
+    add("format", obj.dimensions)
+    add("identifier", request.build_absolute_uri(reverse("heritage-detail", args=[obj.pk])))
+    for name in ("accession_number", "object_number", "record_id", "guid"):
+        add("identifier", getattr(obj, name))
+    add("source", obj.collection_name or obj.data_source)
+    add("relation", obj.related_resource)
+    add("coverage", obj.get_region_display())
+    for name in ("origin_place", "site_name", "period"):
+        add("coverage", getattr(obj, name))
+    add("rights", obj.rights)
+    add("rights", obj.credit_line)
+    add("rights", obj.metadata_usage)
+    return elements
+
+
+# ---------- Responses ----------
+
+def _entry(request, entry, with_metadata):
+    moment, kind, pk, item = entry
+    return {
+        "identifier": identifier_for(request, pk),
+        "datestamp": format_datestamp(moment),
+        "deleted": kind == DELETED,
+        "metadata": dublin_core(request, item) if with_metadata and kind == RECORD else (),
+    }
+
+
+def respond(request, params):
+    """Template context for one OAI-PMH request. ``params`` maps argument
+    names to a value, or to a list if the argument was repeated."""
+    context = {
+        "response_date": format_datestamp(datetime.now(dt_timezone.utc)),
+        "base_url": request.build_absolute_uri(request.path),
+        "request_args": [],
+    }
+    try:
+        verb = check_arguments(params)
+        context["verb"] = verb
+        context["request_args"] = sorted(params.items())
+        if verb == "Identify":
+            context.update(
+                repository_name=REPOSITORY_NAME,
+                admin_emails=admin_emails(),
+                earliest_datestamp=earliest_datestamp(),
+                granularity=GRANULARITY,
+            )
+        elif verb == "ListMetadataFormats":
+            if params.get("identifier"):
+                _find(request, params["identifier"])
+            context["metadata_formats"] = list(METADATA_FORMATS.items())
+        elif verb == "ListSets":
+            raise OAIError("noSetHierarchy", "This repository does not support sets.")
+        elif verb == "GetRecord":
+            check_metadata_prefix(params["metadataPrefix"])
+            context["entries"] = [_entry(request, _find(request, params["identifier"]), True)]
+        else:
+            page, token, delivered, _prefix = list_page(verb, params)
+            context["entries"] = [_entry(request, entry, verb == "ListRecords") for entry in page]
+            context["token"] = token
+            context["cursor"] = delivered
+    except OAIError as exc:
+        context["error"] = exc
+        if exc.code in ("badVerb", "badArgument"):
+            context["request_args"] = []
+    return context
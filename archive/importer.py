@@ -0,0 +1,402 @@
+"""
+Bulk import of catalog records from partner exports.
+
+``CatalogImporter`` reads CSV or JSON Lines one record at a time, so a
+file of any size is processed in constant memory, and writes it in chunks
+of ``CHUNK_SIZE`` rows, each in its own transaction:
+
+* column names are matched to ``HeritageObject`` fields case- and
+  punctuation-insensitively ("Accession Number" → ``accession_number``);
+  values are cleaned with the model fields themselves, and choice fields
+  accept either the stored value or its English label;
+* a record is identified by ``accession_number`` (or ``record_id`` when it
+  has none): existing objects are looked up for the whole chunk with one
+  query and updated with ``bulk_update`` — only the fields that differ —
+  new ones are inserted with ``bulk_create``, so re-running an import is
+  a no-op;
+* image/thumbnail/model_3d columns name files under a local media
+  directory; they are checked with the rest of the record but stored
+  (through the content-addressed storage) only once the record is
+  accepted, and their reference counts are kept by hand, since bulk writes
+  skip the model signals;
+* a record that fails validation is reported with its line number and
+  skipped; it never aborts the chunk.
+
+After each chunk commits, the cards, cached fragments and cached rows of
+the touched objects are refreshed, as the signals would for single saves,
+and posters for new 3D models are queued as a background job.
+"""
+import csv
+import json
+import os
+import re
+import time
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone, translation
+from django.utils.dateparse import parse_date
+from PIL import Image
+
+from . import filter_cache, object_cache
+from .fragments import bump
+from .models import HeritageObject, HeritageTombstone
+from .publishing import render_posters
+from .read_model import refresh_cards
+from .revisions import record
+from .storage import release, retain
+from .tasks import enqueue
+
+CHUNK_SIZE = 500
+
+KEY_FIELDS = ("accession_number", "record_id")
+REQUIRED_FIELDS = ("title", "description", "origin_date")
+MEDIA_FIELDS = ("image", "thumbnail", "model_3d")
+IMAGE_FIELDS = ("image", "thumbnail")
+
+COLUMN_ALIASES = {
+    "type": "object_type",
+    "ich": "ich_domain",
+    "model": "model_3d",
+    "3d_model": "model_3d",
+}
+
+FORMATS = ("csv", "jsonl")
+
+_YEAR_RE = re.compile(r"^(\d{1,4})(?:-(\d{1,2}))?$")
+
+
+def import_fields():
+    """Names of the HeritageObject fields an import may set."""
+    return [
+        f.name for f in HeritageObject._meta.concrete_fields
+        if f.editable and not f.primary_key and not getattr(f, "auto_now", False)
+    ]
+
+
+def normalize_column(name):
+    column = re.sub(r"[^a-z0-9]+", "_", (name or "").strip().lower()).strip("_")
+    return COLUMN_ALIASES.get(column, column)
+
+
+def read_records(path, fmt=None):
+    """Yield ``(line_number, record)`` from a CSV or JSON Lines file
+    without reading it into memory."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        if fmt == "csv":
+            reader = csv.DictReader(fh)
+            for record in reader:
+                # line_num is where the record ends; multi-line cells shift it
+                yield reader.line_num, record
+            return
+        for number, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+                continue
+            yield number, record if isinstance(record, dict) else ValueError("not a JSON object")
+
+
+class RowError(Exception):
+    pass
+
+
+class Row:
+    __slots__ = ("line", "values", "media")
+
+    def __init__(self, line, values, media):
+        self.line = line
+        self.values = values
+        self.media = media  # field name -> source path (None clears it)
+
+    @property
+    def key(self):
+        # Tagged, so accession "X" and record id "X" stay distinct records
+        if self.values.get("accession_number"):
+            return ("accession", self.values["accession_number"])
+        return ("record", self.values["record_id"])
+
+
+class CatalogImporter:
+    """Validate and upsert records; see the module docstring."""
+
+    def __init__(self, media_dir=None, chunk_size=CHUNK_SIZE, dry_run=False,
+                 render_posters=True, on_error=None, on_chunk=None):
+        self.media_dir = os.path.realpath(media_dir) if media_dir else None
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.render_posters = render_posters
+        self.on_error = on_error or (lambda line, message: None)
+        self.on_chunk = on_chunk or (lambda importer: None)
+
+        self.fields = {name: HeritageObject._meta.get_field(name) for name in import_fields()}
+        self.choices = {}
+        with translation.override("en"):
+            for name, field in self.fields.items():
+                if field.choices:
+                    lookup = {}
+                    for value, label in field.flatchoices:
+                        lookup[str(label).lower()] = value
+                        lookup[str(value).lower()] = value
+                    self.choices[name] = lookup
+        self._checked = set()  # (field, source path) already validated
+        self._stored = {}  # source path -> storage name, for files shared by rows
+        self.unknown_columns = set()
+
+        self.rows = self.created = self.updated = self.unchanged = self.errors = 0
+        self.started = time.monotonic()
+
+    # ---------- Validation ----------
+
+    def _clean(self, name, raw):
+        field = self.fields[name]
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw in ("", None):
+            if field.null:
+                return None
+            if field.blank:
+                return ""
+            raise ValidationError("This field is required.")
+        if name in self.choices:
+            value = self.choices[name].get(str(raw).lower())
+            if value is None:
+                raise ValidationError(
+                    f"{raw!r} is not one of: {', '.join(sorted(set(self.choices[name].values())))}."
+                )
+            return value
+        if isinstance(field, models.DateField):
+            return self._date(raw)
+        return field.clean(raw if not isinstance(raw, (int, float)) else str(raw), None)
+
+    def _date(self, raw):
+        raw = str(raw)
+        try:
+            value = parse_date(raw) if len(raw) > 7 else None
+            if value is None:
+                match = _YEAR_RE.match(raw)
+                if match:
+                    value = date(int(match.group(1)) or 1, int(match.group(2) or 1), 1)
+        except ValueError:
+            value = None
+        if value is None:
+            raise ValidationError(f"{raw!r} is not a date (YYYY-MM-DD, YYYY-MM or YYYY).")
+        return value
+
+    def _media(self, name, relative):
+        """Check the file a media column names; returns its real path."""
+        if self.media_dir is None:
+            raise ValidationError("media columns need a media directory")
+        path = os.path.realpath(os.path.join(self.media_dir, relative))
+        if os.path.commonpath([path, self.media_dir]) != self.media_dir:
+            raise ValidationError(f"{relative!r} is outside the media directory")
+        if (name, path) in self._checked:
+            return path
+        if not os.path.isfile(path):
+            raise ValidationError(f"{relative!r} not found")
+        if name in IMAGE_FIELDS:
+            try:
+                with open(path, "rb") as fh:
+                    Image.open(fh).verify()
+            except Exception:
+                raise ValidationError(f"{relative!r} is not a readable image")
+        self._checked.add((name, path))
+        return path
+
+    def _store(self, name, path):
+        """Storage name of the file at ``path``, saving it on first use."""
+        if path is None:
+            return None
+        stored = self._stored.get(path)
+        if stored is None:
+            if self.dry_run:
+                stored = os.path.relpath(path, self.media_dir)
+            else:
+                upload_name = self.fields[name].generate_filename(None, os.path.basename(path))
+                with open(path, "rb") as fh:
+                    stored = default_storage.save(upload_name, File(fh))
+            self._stored[path] = stored
+        return stored
+
+    def parse(self, line, record):
+        """Turn one raw record into a Row, or raise RowError."""
+        if isinstance(record, Exception):
+            raise RowError(f"unreadable record: {record}")
+        values, media, problems = {}, {}, []
+        for column, raw in record.items():
+            name = normalize_column(column)
+            if name not in self.fields:
+                if name:
+                    self.unknown_columns.add(column)
+                continue
+            try:
+                if name in MEDIA_FIELDS:
+                    raw = (raw or "").strip()
+                    media[name] = self._media(name, raw) if raw else None
+                else:
+                    values[name] = self._clean(name, raw)
+            except ValidationError as exc:
+                problems.append(f"{name}: {' '.join(exc.messages)}")
+        if problems:
+            raise RowError("; ".join(problems))
+        if not any(values.get(field) for field in KEY_FIELDS):
+            raise RowError("needs an accession_number or record_id")
+        return Row(line, values, media)
+
+    # ---------- Writing ----------
+
+    def run(self, records):
+        """Import ``(line_number, record)`` pairs, e.g. from read_records()."""
+        chunk = {}
+        for line, record in records:
+            self.rows += 1
+            try:
+                row = self.parse(line, record)
+            except RowError as exc:
+                self.error(line, str(exc))
+                continue
+            previous = chunk.get(row.key)
+            if previous is not None:
+                # The same record twice in one chunk: the later values win.
+                previous.values.update(row.values)
+                previous.media.update(row.media)
+                previous.line = row.line
+            else:
+                chunk[row.key] = row
+            if len(chunk) >= self.chunk_size:
+                self.write(list(chunk.values()))
+                chunk = {}
+        if chunk:
+            self.write(list(chunk.values()))
+        return self
+
+    def error(self, line, message):
+        self.errors += 1
+        self.on_error(line, message)
+
+    def _existing(self, rows):
+        lookups = {field: {row.values[field] for row in rows if row.values.get(field)} for field in KEY_FIELDS}
+        found = {field: {} for field in KEY_FIELDS}
+        query = models.Q()
+        for field, keys in lookups.items():
+            if keys:
+                query |= models.Q(**{f"{field}__in": keys})
+        for obj in HeritageObject.objects.filter(query).order_by("pk"):
+            for field in KEY_FIELDS:
+                value = getattr(obj, field)
+                if value in lookups[field]:
+                    found[field].setdefault(value, []).append(obj)
+        return found
+
+    def _match(self, row, found):
+        matches = {}
+        for field in KEY_FIELDS:
+            value = row.values.get(field)
+            objs = found[field].get(value, []) if value else []
+            if len(objs) > 1:
+                raise RowError(f"{field} {value!r} matches {len(objs)} objects")
+            if objs:
+                matches[field] = objs[0]
+        if len({obj.pk for obj in matches.values()}) > 1:
+            raise RowError("accession_number and record_id match different objects")
+        return next(iter(matches.values()), None)
+
+    def write(self, rows):
+        found = self._existing(rows)
+        new, changed, fields = [], [], set()
+        retained, released = [], []
+        posters = []
+
+        for row in rows:
+            try:
+                obj = self._match(row, found)
+            except RowError as exc:
+                self.error(row.line, str(exc))
+                continue
+
+            if obj is None:
+                missing = [f for f in REQUIRED_FIELDS if row.values.get(f) in (None, "")]
+                if missing:
+                    self.error(row.line, f"new record is missing {', '.join(missing)}")
+                    continue
+                obj = HeritageObject(**row.values)
+                for name, path in row.media.items():
+                    stored = self._store(name, path)
+                    setattr(obj, name, stored)
+                    retained.append(stored)
+                new.append(obj)
+                if obj.model_3d:
+                    posters.append(obj)
+                continue
+
+            diff = [name for name, value in row.values.items() if getattr(obj, name) != value]
+            for name, value in row.values.items():
+                setattr(obj, name, value)
+            for name, path in row.media.items():
+                stored = self._store(name, path)
+                old = getattr(obj, name).name or None
+                if old != stored:
+                    setattr(obj, name, stored)
+                    retained.append(stored)
+                    released.append(old)
+                    diff.append(name)
+                    if name == "model_3d":
+                        # The poster shows the old model; render a new one.
+                        if obj.poster:
+                            released.append(obj.poster.name)
+                            obj.poster = None
+                            diff.append("poster")
+                        if stored:
+                            posters.append(obj)
+            if diff:
+                changed.append(obj)
+                fields.update(diff)
+            else:
+                self.unchanged += 1
+
+        if not self.dry_run and (new or changed):
+            now = timezone.now()
+            for obj in changed:
+                obj.updated_at = now  # bulk_update() skips auto_now
+                obj.version = F("version") + 1
+            with transaction.atomic():
+                HeritageObject.objects.bulk_create(new)
+                HeritageTombstone.objects.filter(object_id__in=[obj.pk for obj in new]).delete()
+                if changed:
+                    HeritageObject.objects.bulk_update(changed, [*sorted(fields), "updated_at", "version"])
+                for name in retained:
+                    retain(name)
+                for name in released:
+                    release(name)
+            record(*[obj.pk for obj in new], source="import", new=True)
+            record(*[obj.pk for obj in changed], source="import")
+            self._refresh([obj.pk for obj in new + changed], [obj.pk for obj in changed])
+            if self.render_posters and posters:
+                enqueue(render_posters, [obj.pk for obj in posters])
+
+        self.created += len(new)
+        self.updated += len(changed)
+        self.on_chunk(self)
+
+    def _refresh(self, pks, updated_pks):
+        refresh_cards(*pks)
+        bump("card", *pks)
+        object_cache.invalidate(HeritageObject, *updated_pks)
+        filter_cache.invalidate()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed else 0.0
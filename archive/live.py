@@ -0,0 +1,333 @@
+"""
+Live updates for the object detail page over Server-Sent Events.
+
+``heritage_events`` (an async view, so it only ties up a coroutine under
+ASGI) streams the events published for one object to every visitor on its
+detail page: new comments and replies, deletions, and like counts. The
+views publish with ``publish()`` after each change; events carry absolute
+counts rather than deltas, so a client that missed one is corrected by the
+next.
+
+Events go through a broker chosen by ``settings.LIVE_EVENTS_BROKER``:
+
+* ``InProcessBroker`` (default) delivers to the streams of the same
+  process — enough for a single ASGI worker;
+* ``LogFileBroker`` appends events to a file shared by every worker on the
+  host (``settings.LIVE_EVENTS_LOG``) and each worker tails it, so a
+  comment posted through one worker reaches streams held by the others.
+  Each worker also lists what its streams watch in a file next to the log.
+
+Nothing is rendered or written for an object nobody is watching, and a new
+comment is rendered only in the languages its watchers browse in.
+
+Each stream has a bounded queue. A client that cannot keep up (the queue
+fills while the server waits to write to it) gets a ``reset`` event and is
+disconnected; EventSource reconnects by itself. A worker holds at most
+``MAX_STREAMS`` streams and answers further ones with 503.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+MAX_STREAMS = 200
+QUEUE_SIZE = 64
+KEEPALIVE = 15
+STREAM_LIFETIME = 60 * 10
+RECONNECT_MS = 5000
+
+LOG_POLL = 0.25
+LOG_MAX_BYTES = 8 * 1024 * 1024
+
+RESET = ("reset", {})
+
+
+class TooManyStreams(Exception):
+    pass
+
+
+class Subscription:
+    """One SSE connection: a bounded queue fed from any thread."""
+
+    def __init__(self, object_id, language):
+        self.object_id = object_id
+        self.language = language
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def offer(self, event):
+        # Runs on the subscription's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self.offer, event)
+        except RuntimeError:
+            pass  # the loop is closed; the stream is going away
+
+
+class InProcessBroker:
+    """Delivers events to the subscriptions of this process only."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self.streams = 0
+
+    def subscribe(self, object_id, language=None):
+        with self._lock:
+            if self.streams >= MAX_STREAMS:
+                raise TooManyStreams
+            self.streams += 1
+            subscription = Subscription(object_id, language or settings.LANGUAGE_CODE)
+            self._subscriptions[object_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.streams -= 1
+            subscribers = self._subscriptions.get(subscription.object_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.object_id]
+
+    def _watching(self):
+        """{object_id: set of languages} for this process's streams."""
+        with self._lock:
+            return {
+                object_id: {subscription.language for subscription in subscribers}
+                for object_id, subscribers in self._subscriptions.items()
+            }
+
+    def languages(self, object_id):
+        """Languages of the streams watching ``object_id`` (empty if none)."""
+        return self._watching().get(object_id, set())
+
+    def deliver(self, object_id, event):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(object_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def publish(self, object_id, event):
+        self.deliver(object_id, event)
+
+
+class LogFileBroker(InProcessBroker):
+    """Shares events between the workers on a host through an append-only
+    file; a daemon thread in each worker tails it while anyone listens."""
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or getattr(settings, "LIVE_EVENTS_LOG", None) or os.path.join(
+            settings.BASE_DIR, "cache", "live-events.log"
+        )
+        self.listeners_dir = f"{self.path}.listeners"
+        self._tailer = None
+        self._listeners_lock = threading.Lock()
+
+    def publish(self, object_id, event):
+        line = json.dumps({"object": object_id, "event": event}, separators=(",", ":")) + "\n"
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > LOG_MAX_BYTES:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            open(tmp_path, "wb").close()
+            os.replace(tmp_path, self.path)
+
+    def subscribe(self, object_id, language=None):
+        subscription = super().subscribe(object_id, language)
+        with self._lock:
+            if self._tailer is None or not self._tailer.is_alive():
+                self._tailer = threading.Thread(target=self._tail, name="live-events", daemon=True)
+                self._tailer.start()
+        return subscription
+
+    def languages(self, object_id):
+        languages = super().languages(object_id)
+        try:
+            names = os.listdir(self.listeners_dir)
+        except FileNotFoundError:
+            return languages
+        for name in names:
+            pid = name.partition(".")[0]
+            if not pid.isdigit() or int(pid) == os.getpid() or not _alive(int(pid)):
+                continue
+            try:
+                with open(os.path.join(self.listeners_dir, name)) as fh:
+                    watching = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            languages.update(watching.get(str(object_id), ()))
+        return languages
+
+    def _write_listeners(self):
+        """Publish this worker's streams to the other workers; the file is
+        removed once nothing is watched."""
+        path = os.path.join(self.listeners_dir, f"{os.getpid()}.json")
+        with self._listeners_lock:
+            watching = self._watching()
+            if not watching:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                return watching
+            os.makedirs(self.listeners_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as fh:
+                json.dump({str(object_id): sorted(languages) for object_id, languages in watching.items()}, fh)
+            os.replace(tmp_path, path)
+            return watching
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None, 0
+        return st.st_ino, st.st_size
+
+    def _tail(self):
+        inode, offset = self._stat()
+        written = None
+        while self.streams > 0:
+            if self._watching() != written:
+                written = self._write_listeners()
+            time.sleep(LOG_POLL)
+            current_inode, size = self._stat()
+            if current_inode != inode:
+                inode, offset = current_inode, 0
+            if size <= offset:
+                continue
+            try:
+                with open(self.path, "rb") as fh:
+                    fh.seek(offset)
+                    data = fh.read(size - offset)
+            except FileNotFoundError:
+                continue
+            data = data[:data.rfind(b"\n") + 1]
+            offset += len(data)
+            for line in data.splitlines():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                self.deliver(message["object"], tuple(message["event"]))
+        self._write_listeners()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@lru_cache(maxsize=1)
+def broker():
+    path = getattr(settings, "LIVE_EVENTS_BROKER", "archive.live.InProcessBroker")
+    return import_string(path)()
+
+
+def _send(object_id, name, data):
+    try:
+        broker().publish(object_id, (name, data))
+    except OSError:
+        logger.exception("Could not publish %s event for object %s", name, object_id)
+
+
+def publish(object_id, name, data):
+    """Send event ``name`` with JSON-serializable ``data`` to everyone
+    watching ``object_id``. Never fails the request that triggered it.
+    Brokers may block on file I/O: call it through ``sync_to_async`` from
+    async views."""
+    if broker().languages(object_id):
+        _send(object_id, name, data)
+
+
+def _format(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def stream(subscription):
+    """The SSE body for one subscription; ends after STREAM_LIFETIME."""
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        deadline = time.monotonic() + STREAM_LIFETIME
+        while time.monotonic() < deadline:
+            try:
+                name, data = await asyncio.wait_for(subscription.queue.get(), KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield _format(name, data)
+            if (name, data) == RESET:
+                break
+    finally:
+        broker().unsubscribe(subscription)
+
+
+# ---------- Event payloads ----------
+
+class _Member:
+    """A signed-in viewer who is neither staff nor the comment's author."""
+    is_authenticated = True
+    is_staff = False
+    id = pk = None
+
+
+def comment_posted(comment, comment_user_stats, reply_count=None):
+    """Publish a new comment or reply, rendered for guests and for
+    signed-in viewers (who get like and reply buttons) in each language
+    someone is watching the object in."""
+    languages = broker().languages(comment.object_id)
+    if not languages:
+        return
+    if comment.parent_id:
+        template, name = "archive/reply_partial.html", "reply"
+    else:
+        template, name = "archive/comment_partial.html", "c"
+    html = {}
+    for language in languages:
+        with translation.override(language):
+            html[language] = {
+                viewer: render_to_string(template, {
+                    name: comment,
+                    "comment_user_stats": comment_user_stats,
+                    "request": SimpleNamespace(user=user),
+                })
+                for viewer, user in (("guest", AnonymousUser()), ("member", _Member()))
+            }
+    _send(comment.object_id, "comment", {
+        "id": comment.pk,
+        "parent_id": comment.parent_id,
+        "reply_count": reply_count,
+        "html": html,
+    })
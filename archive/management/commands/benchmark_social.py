@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from archive.models import Comment, CommentLike, HeritageLike
+
+AJAX = {"X-Requested-With": "XMLHttpRequest"}
+
+
+def _percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the like/comment AJAX endpoints through Django's "
+        "WSGI handler (a thread per concurrent request, as with gunicorn's gthread "
+        "workers) and its ASGI handler (one event loop, as with an ASGI worker). "
+        "Runs in-process against the configured database; every like it toggles "
+        "and every comment it posts is undone afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to act as (default: the first active user).")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per handler.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once.")
+        parser.add_argument(
+            "--comments",
+            action="store_true",
+            help="Also post comments and replies, not only toggle likes.",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(is_active=True)
+        if options["user"]:
+            users = users.filter(username=options["user"])
+        user = users.order_by("pk").first()
+        comment = Comment.objects.filter(is_deleted=False, parent=None).order_by("pk").first()
+        if user is None or comment is None:
+            raise CommandError("Need an active user and at least one comment to benchmark with.")
+
+        targets = [
+            ("post", reverse("comment-like", args=[comment.pk]), {}),
+            ("get", reverse("heritage-like", args=[comment.object_id]), {}),
+        ]
+        if options["comments"]:
+            targets += [
+                ("post", reverse("post-comment", args=[comment.object_id]), {"body": "Benchmark comment"}),
+                ("post", reverse("comment-reply", args=[comment.pk]), {"body": "Benchmark reply"}),
+            ]
+
+        login = Client()
+        login.force_login(user)
+        cookies = login.cookies
+
+        liked = HeritageLike.objects.filter(user=user, object_id=comment.object_id).exists()
+        comment_liked = CommentLike.objects.filter(user=user, comment=comment).exists()
+        newest_comment = Comment.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        try:
+            for name, run in (("WSGI", self.run_wsgi), ("ASGI", self.run_asgi)):
+                started = time.monotonic()
+                results = run(cookies, targets, options["requests"], options["concurrency"])
+                self.report(name, results, time.monotonic() - started)
+        finally:
+            self.restore(user, comment, liked, comment_liked, newest_comment)
+            login.logout()
+
+    def run_wsgi(self, cookies, targets, total, concurrency):
+        local = threading.local()
+
+        def one(i):
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = Client()
+                client.cookies.load(cookies)
+            method, url, data = targets[i % len(targets)]
+            started = time.monotonic()
+            try:
+                response = getattr(client, method)(url, data, headers=AJAX)
+                return time.monotonic() - started, response.status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(one, range(total)))
+
+    def run_asgi(self, cookies, targets, total, concurrency):
+        async def run():
+            client = AsyncClient()
+            client.cookies.load(cookies)
+            slots = asyncio.Semaphore(concurrency)
+
+            async def one(i):
+                method, url, data = targets[i % len(targets)]
+                async with slots:
+                    started = time.monotonic()
+                    response = await getattr(client, method)(url, data, headers=AJAX)
+                    return time.monotonic() - started, response.status_code
+
+            return await asyncio.gather(*(one(i) for i in range(total)))
+
+        return async_to_sync(run)()
+
+    def report(self, name, results, elapsed):
+        latencies = sorted(latency for latency, _status in results)
+        errors = sum(1 for _latency, status in results if status >= 400)
+        self.stdout.write(
+            f"{name}: {len(results)} requests in {elapsed:.2f}s = {len(results) / elapsed:.1f} req/s, "
+            f"p50 {_percentile(latencies, 0.5) * 1000:.1f} ms, "
+            f"p95 {_percentile(latencies, 0.95) * 1000:.1f} ms, "
+            f"{errors} errors"
+        )
+
+    def restore(self, user, comment, liked, comment_liked, newest_comment):
+        if not liked:
+            HeritageLike.objects.filter(user=user, object_id=comment.object_id).delete()
+        elif not HeritageLike.objects.filter(user=user, object_id=comment.object_id).exists():
+            HeritageLike.objects.create(user=user, object_id=comment.object_id)
+        if not comment_liked:
+            CommentLike.objects.filter(user=user, comment=comment).delete()
+        elif not CommentLike.objects.filter(user=user, comment=comment).exists():
+            CommentLike.objects.create(user=user, comment=comment)
+        for posted in Comment.objects.filter(user=user, pk__gt=newest_comment).order_by("-pk"):
+            posted.delete()
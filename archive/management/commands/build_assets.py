@@ -0,0 +1,143 @@
+import os
+import stat
+import subprocess
+import tempfile
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from archive import assets
+
+DOWNLOAD_TIMEOUT = 60
+
+
+def download(url, dest):
+    """Download ``url`` to ``dest`` atomically and return its SHA-256."""
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest))
+    try:
+        with os.fdopen(fd, "wb") as out, urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+            for block in iter(lambda: response.read(64 * 1024), b""):
+                out.write(block)
+        digest = assets.file_sha256(tmp_path)
+        os.replace(tmp_path, dest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return digest
+
+
+class Command(BaseCommand):
+    help = (
+        "Vendor pinned front-end libraries and fonts into archive/static/vendor "
+        "and build css/tailwind.css with only the utility classes the templates use. "
+        "Run collectstatic afterwards to fingerprint and precompress them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--update-lock",
+            action="store_true",
+            help="Pin checksums for new or changed files instead of failing; review and commit "
+                 "the lock file afterwards.",
+        )
+        parser.add_argument("--skip-vendor", action="store_true", help="Only rebuild the Tailwind CSS.")
+        parser.add_argument("--skip-css", action="store_true", help="Only vendor libraries and fonts.")
+
+    def handle(self, *args, **options):
+        self.update_lock = options["update_lock"]
+        if not options["skip_vendor"]:
+            self.vendor(options["update_lock"])
+        if not options["skip_css"]:
+            self.build_css()
+        assets.bundle_ready.cache_clear()
+        self.stdout.write(self.style.SUCCESS("Assets built; run collectstatic to publish them."))
+
+    def vendor(self, update_lock):
+        lock = assets.read_lock()
+        fetched = 0
+        for vf in assets.vendor_files():
+            dest = os.path.join(assets.STATIC_SRC, vf.path)
+            entry = lock.get(vf.path)
+            if entry and entry["url"] == vf.url and os.path.exists(dest):
+                if assets.file_sha256(dest) == entry["sha256"]:
+                    continue
+
+            if not update_lock and (not entry or entry["url"] != vf.url):
+                raise CommandError(
+                    f"{vf.url} is not pinned in {assets.LOCK_FILE}. "
+                    "Use --update-lock to pin it after changing a version."
+                )
+            self.stdout.write(f"  ↓ {vf.url}")
+            try:
+                digest = download(vf.url, dest)
+            except OSError as exc:
+                raise CommandError(f"Could not download {vf.url}: {exc}")
+            fetched += 1
+
+            if not update_lock and entry["sha256"] != digest:
+                os.remove(dest)
+                raise CommandError(
+                    f"{vf.url} does not match the checksum in {assets.LOCK_FILE}. "
+                    "Use --update-lock if the change is expected."
+                )
+            lock[vf.path] = {"url": vf.url, "sha256": digest}
+
+        known = {vf.path for vf in assets.vendor_files()}
+        for path in set(lock) - known - {key for key in lock if key.startswith("cli/")}:
+            del lock[path]
+        assets.write_lock(lock)
+
+        fonts_css = os.path.join(assets.STATIC_SRC, assets.FONTS_CSS)
+        with open(fonts_css, "w") as fh:
+            fh.write(assets.fonts_css())
+        self.stdout.write(f"Vendored files up to date ({fetched} downloaded).")
+
+    def tailwind_cli(self):
+        configured = getattr(settings, "TAILWIND_CLI", None)
+        if configured:
+            return configured
+
+        # The CLI is executed, so it is pinned in the lock like the vendored
+        # files, per platform.
+        url = assets.tailwind_cli_url()
+        key = f"cli/{os.path.basename(url)}-{assets.TAILWIND_VERSION}"
+        lock = assets.read_lock()
+        entry = lock.get(key)
+        path = os.path.join(settings.BASE_DIR, ".cache", f"tailwindcss-{assets.TAILWIND_VERSION}")
+        if os.path.exists(path) and entry and assets.file_sha256(path) == entry["sha256"]:
+            return path
+        if not entry and not self.update_lock:
+            raise CommandError(
+                f"{url} is not pinned in {assets.LOCK_FILE}. Use --update-lock to pin it."
+            )
+        self.stdout.write(f"  ↓ {url}")
+        try:
+            digest = download(url, path)
+        except OSError as exc:
+            raise CommandError(f"Could not download the Tailwind CLI: {exc}")
+        if entry and entry["sha256"] != digest and not self.update_lock:
+            os.remove(path)
+            raise CommandError(
+                f"{url} does not match the checksum in {assets.LOCK_FILE}. "
+                "Use --update-lock if the change is expected."
+            )
+        lock[key] = {"url": url, "sha256": digest}
+        assets.write_lock(lock)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        return path
+
+    def build_css(self):
+        output = os.path.join(assets.STATIC_SRC, assets.TAILWIND_OUTPUT)
+        command = [
+            self.tailwind_cli(),
+            "--config", assets.TAILWIND_CONFIG,
+            "--input", assets.TAILWIND_INPUT,
+            "--output", output,
+            "--minify",
+        ]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(f"Tailwind build failed:\n{result.stderr}")
+        self.stdout.write(f"Built {assets.TAILWIND_OUTPUT} ({os.path.getsize(output) / 1024:.1f} KB).")
@@ -0,0 +1,37 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from archive import revisions
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold the revision history older than --days into one snapshot per "
+        "object and drop the history of objects deleted before then."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Keep every revision from the last DAYS days.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=revisions.CHUNK_SIZE,
+            help="Objects compacted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        compacted, removed = revisions.compact(cutoff, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted the history of {compacted} objects before {cutoff:%Y-%m-%d}: "
+            f"{removed} revisions removed in {time.monotonic() - started:.1f}s."
+        ))
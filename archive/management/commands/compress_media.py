@@ -0,0 +1,36 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from archive.serving import COMPRESSIBLE_EXTENSIONS, brotli, precompress
+
+
+class Command(BaseCommand):
+    help = "Write precompressed .gz/.br siblings for text media files (e.g. .gltf, .obj)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Recompress even if the siblings are newer than the source file.",
+        )
+
+    def handle(self, *args, **options):
+        if brotli is None:
+            self.stderr.write("brotli is not installed; only gzip siblings will be written.")
+
+        written = 0
+        for root, _dirs, files in os.walk(settings.MEDIA_ROOT):
+            for name in files:
+                if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                for target in precompress(path, force=options["force"]):
+                    written += 1
+                    ratio = os.path.getsize(target) / max(os.path.getsize(path), 1)
+                    self.stdout.write(
+                        f"  {os.path.relpath(target, settings.MEDIA_ROOT)} ({ratio:.0%} of original)"
+                    )
+
+        self.stdout.write(self.style.SUCCESS(f"{written} compressed files written."))
@@ -0,0 +1,89 @@
+import gzip
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from archive import export
+
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".npz": "columnar"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the whole catalog to a CSV, JSON Lines or compressed columnar "
+        "(.npz) file in constant memory. Use '-' to write CSV/JSON Lines to "
+        "stdout; a .gz suffix compresses text formats."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file, or '-' for stdout.")
+        parser.add_argument(
+            "--format",
+            choices=[*export.FORMATS, "columnar"],
+            help="Output format (default: from the file extension, else csv).",
+        )
+        parser.add_argument("--fields", help="Comma-separated columns (default: all).")
+        parser.add_argument("--language", help="Translate titles, descriptions and labels.")
+        parser.add_argument("--chunk-size", type=int, default=export.CHUNK_SIZE, help="Rows fetched per query.")
+        parser.add_argument(
+            "--row-group-size",
+            type=int,
+            default=export.ROW_GROUP_SIZE,
+            help="Rows per row group in columnar files.",
+        )
+        parser.add_argument("--list-fields", action="store_true", help="Print the available columns and exit.")
+
+    def handle(self, *args, **options):
+        if options["list_fields"]:
+            self.stdout.write("\n".join(export.columns()))
+            return
+
+        path = options["path"]
+        compressed = path.endswith(".gz")
+        fmt = options["format"]
+        if fmt is None:
+            stem = path[:-3] if compressed else path
+            fmt = next((f for ext, f in EXTENSIONS.items() if stem.endswith(ext)), "csv")
+        if fmt == "columnar" and (path == "-" or compressed):
+            raise CommandError("Columnar output is already compressed and needs a file path.")
+
+        try:
+            fields = export.resolve_fields(options["fields"])
+            language = export.resolve_language(options["language"])
+        except export.ExportError as exc:
+            raise CommandError(exc)
+        rows = export.export_rows(fields, language, chunk_size=options["chunk_size"])
+
+        counted = _Counter(rows)
+        started = time.monotonic()
+        if fmt == "columnar":
+            export.write_columnar(path, fields, counted, options["row_group_size"])
+        elif path == "-":
+            for block in export.encode(fmt, fields, counted):
+                sys.stdout.write(block)
+            sys.stdout.flush()
+        else:
+            opener = gzip.open if compressed else open
+            with opener(path, "wt", encoding="utf-8", newline="") as fh:
+                for block in export.encode(fmt, fields, counted):
+                    fh.write(block)
+
+        elapsed = time.monotonic() - started
+        # Keep stdout clean when it carries the export itself.
+        out = self.stderr if path == "-" else self.stdout
+        out.write(self.style.SUCCESS(
+            f"Exported {counted.count} objects ({len(fields)} columns, {fmt}) in {elapsed:.1f}s"
+            f" ({counted.count / elapsed if elapsed else 0:.0f} rows/s)."
+        ))
+
+
+class _Counter:
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
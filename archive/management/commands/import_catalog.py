@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from archive.importer import CHUNK_SIZE, FORMATS, CatalogImporter, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update heritage objects from a partner's CSV or JSON Lines "
+        "export, keyed on accession_number (or record_id). Rows are streamed and "
+        "written in chunked transactions; invalid rows are reported and skipped, "
+        "and re-running the same file changes nothing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSON Lines file.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format (default: from the extension; .jsonl/.ndjson/.json are JSON Lines).",
+        )
+        parser.add_argument(
+            "--media-dir",
+            help="Directory that image/thumbnail/model_3d values are relative to.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows written per transaction.")
+        parser.add_argument(
+            "--no-posters",
+            action="store_true",
+            help="Do not render posters for imported 3D models (run render_posters later).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate and report without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        try:
+            records = read_records(options["path"], options["format"])
+            importer = CatalogImporter(
+                media_dir=options["media_dir"],
+                chunk_size=options["chunk_size"],
+                dry_run=options["dry_run"],
+                render_posters=not options["no_posters"],
+                on_error=lambda line, message: self.stderr.write(f"  line {line}: {message}"),
+                on_chunk=self.progress,
+            )
+            importer.run(records)
+        except OSError as exc:
+            raise CommandError(exc)
+
+        if importer.unknown_columns:
+            self.stderr.write(f"Ignored unknown columns: {', '.join(sorted(importer.unknown_columns))}")
+        summary = (
+            f"{importer.rows} rows in {importer.elapsed:.1f}s "
+            f"({importer.rate:.0f} rows/s): {importer.created} created, {importer.updated} updated, "
+            f"{importer.unchanged} unchanged, {importer.errors} rejected"
+        )
+        if options["dry_run"]:
+            summary += " (dry run, nothing written)"
+        self.stdout.write(self.style.SUCCESS(summary) if not importer.errors else self.style.WARNING(summary))
+
+    def progress(self, importer):
+        self.stdout.write(
+            f"  {importer.rows} rows ({importer.rate:.0f} rows/s): {importer.created} created, "
+            f"{importer.updated} updated, {importer.unchanged} unchanged, {importer.errors} rejected"
+        )
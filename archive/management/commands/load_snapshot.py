@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from archive.snapshots import CHUNK_SIZE, SnapshotError, apply_bundle, local_version, read_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        "Load catalog snapshot bundles written by snapshot_catalog: a full "
+        "snapshot and/or the deltas after it, in order. Bundles this "
+        "installation already has are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("bundles", nargs="+", help="Bundle files, oldest first.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Objects written per transaction.")
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Apply bundles even if this installation is already at or past their version.",
+        )
+        parser.add_argument(
+            "--noinput", "--no-input",
+            action="store_false",
+            dest="interactive",
+            help="Do not ask before a full snapshot deletes local objects it does not contain.",
+        )
+
+    def handle(self, *args, **options):
+        for path in sorted(options["bundles"], key=lambda path: self.manifest(path)["version"]):
+            started = time.monotonic()
+            try:
+                applied = apply_bundle(
+                    path,
+                    chunk_size=options["chunk_size"],
+                    force=options["force"],
+                    on_progress=lambda written: self.stdout.write(f"  {written} objects written"),
+                    confirm_delete=(lambda count: self.confirm(path, count)) if options["interactive"] else None,
+                )
+            except (SnapshotError, OSError) as exc:
+                raise CommandError(f"{path}: {exc}")
+            if applied is None:
+                self.stdout.write(f"{path}: already applied, skipped.")
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{path}: {applied} — {applied.objects_written} objects written, "
+                f"{applied.objects_deleted} deleted in {time.monotonic() - started:.1f}s."
+            ))
+        version = local_version()
+        self.stdout.write(f"Local catalog version: {version.isoformat() if version else 'none'}")
+
+    def confirm(self, path, count):
+        answer = input(
+            f"{path} is a full snapshot: loading it will DELETE {count} objects of this "
+            f"catalog that it does not contain.\nType 'yes' to continue, or 'no' to cancel: "
+        )
+        return answer == "yes"
+
+    def manifest(self, path):
+        try:
+            return read_manifest(path)
+        except (SnapshotError, OSError) as exc:
+            raise CommandError(f"{path}: {exc}")
@@ -0,0 +1,76 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.utils import timezone
+
+from archive.models import ChunkedUpload, HeritageObject, MediaBlob, Submission
+from archive.storage import hash_from_name
+from archive.uploads import discard_upload
+
+REFERENCING_MODELS = (HeritageObject, Submission)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount references to content-addressed media files, delete the ones "
+        "nothing points at and drop abandoned chunked uploads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=int,
+            default=24,
+            help="Keep unreferenced files younger than this (uploads not yet attached).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        counts = Counter()
+        for model in REFERENCING_MODELS:
+            fields = [f.name for f in model._meta.get_fields() if isinstance(f, models.FileField)]
+            for row in model.objects.values_list(*fields).iterator(chunk_size=2000):
+                for name in row:
+                    digest = hash_from_name(name)
+                    if digest:
+                        counts[digest] += 1
+
+        fixed = 0
+        for blob in MediaBlob.objects.only("pk", "sha256", "ref_count").iterator(chunk_size=2000):
+            actual = counts.get(blob.sha256, 0)
+            if blob.ref_count != actual:
+                fixed += 1
+                if not options["dry_run"]:
+                    MediaBlob.objects.filter(pk=blob.pk).update(ref_count=actual)
+
+        cutoff = timezone.now() - timedelta(hours=options["grace_hours"])
+
+        abandoned = ChunkedUpload.objects.filter(updated_at__lt=cutoff)
+        dropped = abandoned.count()
+        if not options["dry_run"]:
+            for upload in abandoned.iterator(chunk_size=500):
+                discard_upload(upload)
+
+        orphans = MediaBlob.objects.filter(ref_count=0, stored_at__lt=cutoff)
+        if options["dry_run"]:
+            orphans = orphans.exclude(sha256__in=list(counts))
+        freed = removed = 0
+        for blob in orphans.iterator(chunk_size=500):
+            removed += 1
+            freed += blob.size
+            self.stdout.write(f"  - {blob.name}")
+            if not options["dry_run"]:
+                default_storage.delete(blob.name)
+
+        verb = "would be" if options["dry_run"] else "were"
+        self.stdout.write(self.style.SUCCESS(
+            f"{fixed} reference counts {verb} corrected; {removed} files ({freed / 1e6:.1f} MB) "
+            f"and {dropped} abandoned uploads {verb} removed."
+        ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from archive import filter_cache, read_model
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-language HeritageCard read model for every object."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=read_model.CHUNK_SIZE,
+            help="Objects rebuilt per query/upsert.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = read_model.rebuild(chunk_size=options["chunk_size"])
+        filter_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} cards in {time.monotonic() - started:.1f}s."
+        ))
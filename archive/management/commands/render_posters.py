@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from archive.models import HeritageObject
+
+
+class Command(BaseCommand):
+    help = "Render poster images for heritage objects that have a 3D model."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-render posters that already exist, and retry models that failed before, "
+                 "instead of only missing ones.",
+        )
+        parser.add_argument("ids", nargs="*", type=int, help="Limit to these object IDs.")
+
+    def handle(self, *args, **options):
+        qs = HeritageObject.objects.exclude(model_3d="").exclude(model_3d__isnull=True)
+        if options["ids"]:
+            qs = qs.filter(pk__in=options["ids"])
+        if not options["all"]:
+            qs = qs.filter(Q(poster="") | Q(poster__isnull=True)).exclude(poster_failed=F("model_3d"))
+
+        rendered = failed = 0
+        for obj in qs.only("pk", "model_3d", "poster", "poster_failed").iterator(chunk_size=100):
+            if obj.render_poster():
+                rendered += 1
+                self.stdout.write(f"  #{obj.pk}: {obj.poster.name}")
+            else:
+                failed += 1
+                self.stderr.write(f"  #{obj.pk}: could not render {obj.model_3d.name}")
+
+        self.stdout.write(self.style.SUCCESS(f"{rendered} posters rendered, {failed} skipped."))
@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from archive.snapshots import SnapshotError, read_manifest, write_bundle
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a portable snapshot of the public catalog (objects plus their "
+        "images, thumbnails and posters) for offline kiosks, or with --since/--base "
+        "a delta holding only what changed after an earlier snapshot. Load it "
+        "with load_snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Bundle file to write (.zip).")
+        base = parser.add_mutually_exclusive_group()
+        base.add_argument("--since", help="Write a delta after this version (from an earlier manifest).")
+        base.add_argument("--base", help="Write a delta on top of this earlier bundle.")
+        parser.add_argument("--with-models", action="store_true", help="Include 3D model files.")
+        parser.add_argument("--no-media", action="store_true", help="Leave media files out.")
+
+    def handle(self, *args, **options):
+        since = options["since"]
+        try:
+            if options["base"]:
+                since = read_manifest(options["base"])["version"]
+            started = time.monotonic()
+            manifest = write_bundle(
+                options["path"],
+                since=since,
+                with_media=not options["no_media"],
+                with_models=options["with_models"],
+            )
+        except (SnapshotError, OSError) as exc:
+            raise CommandError(exc)
+
+        for name in manifest["missing_media"]:
+            self.stderr.write(f"  missing media file: {name}")
+        kind = f"delta since {manifest['base_version']}" if manifest["base_version"] else "full snapshot"
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {kind} at version {manifest['version']}: {manifest['objects']} objects, "
+            f"{manifest['deleted']} deletions, {len(manifest['media'])} media files, "
+            f"{os.path.getsize(options['path']) / 1024 / 1024:.1f} MB in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,115 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count, F
+from django.test import Client
+from django.urls import reverse
+
+from archive.models import HeritageCard
+from archive.resilience import forget_page
+
+
+def _host():
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*" and not host.startswith("."):
+            return host
+    return "localhost"
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the most requested pages in every site language so the first "
+        "visitors after a deploy or cache flush get cached pages, fragments and "
+        "objects. Run it after collectstatic/migrate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--objects", type=int, default=50, help="Detail pages of this many top objects.")
+        parser.add_argument("--facets", type=int, default=20, help="This many region/type combinations.")
+        parser.add_argument("--workers", type=int, default=4, help="Pages rendered concurrently.")
+        parser.add_argument("--host", default=_host(), help="Host header sent with each request.")
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-render pages that already have a cached copy.",
+        )
+
+    def urls(self, objects, facets):
+        urls = [reverse("home"), reverse("heritage-list")]
+
+        cards = HeritageCard.objects.filter(language=settings.LANGUAGE_CODE)
+        # No page-view counts are kept; likes and comments stand in for traffic.
+        top = cards.annotate(activity=F("like_count") + F("comment_count")).order_by(
+            "-activity", "-like_count", "object_id"
+        )
+        urls += [reverse("heritage-detail", args=[pk]) for pk in top.values_list("object_id", flat=True)[:objects]]
+
+        filtered = reverse("heritage-filtered")
+        for field, param in (("region", "region"), ("object_type", "type")):
+            for value in cards.values_list(field, flat=True).distinct().order_by(field):
+                urls.append(f"{filtered}?{urlencode({param: value})}")
+        combinations = (
+            cards.values("region", "object_type")
+            .annotate(n=Count("pk"))
+            .order_by("-n", "region", "object_type")[:facets]
+        )
+        for row in combinations:
+            urls.append(f"{filtered}?{urlencode({'region': row['region'], 'type': row['object_type']})}")
+
+        urls += [reverse("about"), reverse("sponsors"), reverse("donate")]
+        return urls
+
+    def fetch(self, host, language, url, force):
+        if force:
+            forget_page(language, url)
+        client = Client(HTTP_HOST=host)
+        client.cookies[settings.LANGUAGE_COOKIE_NAME] = language
+        started = time.monotonic()
+        try:
+            response = client.get(url)
+            return response.status_code, len(response.content), time.monotonic() - started
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        languages = [code for code, _name in settings.LANGUAGES]
+        urls = self.urls(options["objects"], options["facets"])
+        jobs = [(language, url) for url in urls for language in languages]
+        self.stdout.write(f"Warming {len(urls)} pages in {len(languages)} languages ({len(jobs)} requests)…")
+
+        started = time.monotonic()
+        timings = []
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(options["workers"], 1)) as pool:
+            futures = {
+                pool.submit(self.fetch, options["host"], language, url, options["force"]): (language, url)
+                for language, url in jobs
+            }
+            for future in as_completed(futures):
+                language, url = futures[future]
+                try:
+                    status, size, elapsed = future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"  {language}  ERR  {url}: {exc}")
+                    continue
+                timings.append(elapsed)
+                line = f"  {language}  {status}  {elapsed * 1000:7.1f} ms  {size / 1024:6.1f} KB  {url}"
+                if status != 200:
+                    failed += 1
+                    self.stderr.write(line)
+                else:
+                    self.stdout.write(line)
+
+        timings.sort()
+        summary = f"{len(jobs) - failed}/{len(jobs)} pages warmed in {time.monotonic() - started:.1f}s"
+        if timings:
+            summary += (
+                f" (median {timings[len(timings) // 2] * 1000:.0f} ms,"
+                f" slowest {timings[-1] * 1000:.0f} ms)"
+            )
+        self.stdout.write(self.style.SUCCESS(summary) if not failed else self.style.WARNING(summary))
@@ -0,0 +1,190 @@
+"""
+Technical checks for files uploaded with a Submission.
+
+Runs in the background (see archive/tasks.py) after a submission's media
+changes: decodes images and parses 3D models, records their technical
+metadata and any problems on the Submission, and rewrites photos with
+their EXIF orientation applied and the EXIF block (GPS, camera serials…)
+removed. Moderators see the result in SubmissionAdmin.
+"""
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import filter_cache
+from .fragments import bump
+from .models import HeritageObject, Submission
+from .object_cache import invalidate
+from .read_model import refresh_cards
+from .rendering import MeshError, SUPPORTED_EXTENSIONS, load_mesh
+from .revisions import record
+from .storage import release, retain
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MIN_EDGE = 300
+IMAGE_MAX_PIXELS = 80_000_000
+MODEL_MAX_TRIANGLES = 2_000_000
+MODEL_MAX_BYTES = 500 * 1024 * 1024
+
+EXIF_ORIENTATION = 0x0112
+
+
+def _problem(level, field, message):
+    return {"level": level, "field": field, "message": message}
+
+
+def inspect_image(field_file):
+    """Return (info, problems, normalized_bytes_or_None) for an image file."""
+    info = {"file_size": field_file.size}
+    problems = []
+
+    field_file.open("rb")
+    try:
+        data = field_file.read()
+    finally:
+        field_file.close()
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            info.update(format=img.format, mode=img.mode, width=img.width, height=img.height)
+            if img.width * img.height > IMAGE_MAX_PIXELS:
+                problems.append(_problem("error", "image", f"Image has more than {IMAGE_MAX_PIXELS:,} pixels."))
+                return info, problems, None
+            img.load()
+
+            exif = img.getexif()
+            orientation = exif.get(EXIF_ORIENTATION, 1)
+            info["exif_orientation"] = orientation
+            info["had_exif"] = bool(exif)
+
+            normalized = None
+            if exif:
+                fixed = ImageOps.exif_transpose(img)
+                out = io.BytesIO()
+                params = {"icc_profile": img.info["icc_profile"]} if "icc_profile" in img.info else {}
+                if img.format == "JPEG":
+                    params["quality"] = 95
+                fixed.save(out, format=img.format, **params)
+                normalized = out.getvalue()
+                info.update(width=fixed.width, height=fixed.height, normalized=True)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as exc:
+        problems.append(_problem("error", "image", f"Image could not be decoded: {exc}"))
+        return info, problems, None
+
+    if min(info["width"], info["height"]) < IMAGE_MIN_EDGE:
+        problems.append(_problem(
+            "warning", "image", f"Image is only {info['width']}×{info['height']} pixels."
+        ))
+    return info, problems, normalized
+
+
+def inspect_model(field_file):
+    """Return (info, problems) for a 3D model file."""
+    ext = os.path.splitext(field_file.name)[1].lower()
+    info = {"file_size": field_file.size, "format": ext.lstrip(".")}
+    problems = []
+
+    if field_file.size > MODEL_MAX_BYTES:
+        problems.append(_problem("warning", "model_3d", "Model file is larger than 500 MB."))
+    if ext not in SUPPORTED_EXTENSIONS:
+        problems.append(_problem("warning", "model_3d", f"{ext} files are not inspected; check the model manually."))
+        return info, problems
+
+    try:
+        base_dir = os.path.dirname(field_file.path)
+    except NotImplementedError:
+        base_dir = None
+    field_file.open("rb")
+    try:
+        data = field_file.read()
+    finally:
+        field_file.close()
+
+    try:
+        vertices, faces, _colors = load_mesh(data, field_file.name, base_dir)
+    except MeshError as exc:
+        problems.append(_problem("error", "model_3d", str(exc)))
+        return info, problems
+
+    extent = vertices.max(axis=0) - vertices.min(axis=0)
+    info.update(
+        vertices=int(len(vertices)),
+        triangles=int(len(faces)),
+        bounding_box=[round(float(v), 4) for v in extent],
+    )
+    if len(faces) > MODEL_MAX_TRIANGLES:
+        problems.append(_problem(
+            "warning", "model_3d", f"Model has {len(faces):,} triangles; it may be slow to view."
+        ))
+    return info, problems
+
+
+def _replace_image(old_name, data):
+    """Store normalized image bytes and point every row using ``old_name`` at
+    them, keeping media reference counts in step. Objects are changed like
+    any other write: new version and updated_at, a revision, fresh cards
+    and caches (QuerySet.update() skips the signals)."""
+    new_name = default_storage.save(os.path.basename(old_name), ContentFile(data))
+    if new_name == old_name:
+        return old_name
+    now = timezone.now()
+    with transaction.atomic():
+        submissions = list(Submission.objects.filter(image=old_name).values_list("pk", flat=True))
+        Submission.objects.filter(pk__in=submissions).update(image=new_name, updated_at=now)
+        objects = list(HeritageObject.objects.filter(image=old_name).values_list("pk", flat=True))
+        HeritageObject.objects.filter(pk__in=objects).update(
+            image=new_name, updated_at=now, version=F("version") + 1
+        )
+        for _ in range(len(submissions) + len(objects)):
+            retain(new_name)
+            release(old_name)
+    if objects:
+        record(*objects, source="media check")
+        refresh_cards(*objects)
+        bump("card", *objects)
+        invalidate(HeritageObject, *objects)
+        filter_cache.invalidate()
+    return new_name
+
+
+def check_submission_media(submission_id):
+    """Inspect a submission's image and model and store the report on it."""
+    submission = Submission.objects.filter(pk=submission_id).first()
+    if submission is None:
+        return None
+
+    report = {"problems": []}
+    if submission.image:
+        try:
+            info, problems, normalized = inspect_image(submission.image)
+        except OSError as exc:
+            info, problems, normalized = {}, [_problem("error", "image", f"File is missing: {exc}")], None
+        if normalized is not None:
+            info["stored_as"] = _replace_image(submission.image.name, normalized)
+        report["image"] = info
+        report["problems"] += problems
+
+    if submission.model_3d:
+        try:
+            info, problems = inspect_model(submission.model_3d)
+        except OSError as exc:
+            info, problems = {}, [_problem("error", "model_3d", f"File is missing: {exc}")]
+        report["model_3d"] = info
+        report["problems"] += problems
+
+    levels = {p["level"] for p in report["problems"]}
+    status = "error" if "error" in levels else "warning" if "warning" in levels else "ok"
+
+    Submission.objects.filter(pk=submission_id).update(
+        media_status=status, media_report=report, media_checked_at=timezone.now()
+    )
+    logger.info("Media check for submission %s: %s", submission_id, status)
+    return status
@@ -1,17 +1,95 @@
 # archive/middleware.py
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.utils import translation
+from whitenoise.middleware import WhiteNoiseMiddleware
+
 
 class ForceEnglishAdminMiddleware:
     """
     Forces Django Admin to render in English regardless of the user's chosen site language.
     Apply *after* LocaleMiddleware so it can override per-request language.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         # Adjust the prefix if you mount admin somewhere else
         if request.path.startswith("/admin/"):
             with translation.override("en"):
                 return self.get_response(request)
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path.startswith("/admin/"):
+            with translation.override("en"):
+                return await self.get_response(request)
+        return await self.get_response(request)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also runs natively under ASGI. WhiteNoise 6 is sync-only,
+    which would make Django run every request below it (including the async
+    views) on a thread; here only actual static file responses do.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class QueryLanguageMiddleware:
+    """
+    Lets ``?lang=ar`` (any code in LANGUAGES) pick the page language, so each
+    translation of a page has its own URL for sitemaps and hreflang links
+    (see archive/sitemaps.py). Apply *after* LocaleMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.languages = {code for code, _name in settings.LANGUAGES}
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def activate(self, request):
+        language = request.GET.get("lang")
+        if language in self.languages:
+            translation.activate(language)
+            request.LANGUAGE_CODE = language
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.activate(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.activate(request)
+        return await self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0011_heritageobject_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='heritageobject',
+            name='poster',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='posters/', verbose_name='3D Preview Poster'),
+        ),
+    ]
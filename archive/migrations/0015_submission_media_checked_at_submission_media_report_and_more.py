@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0014_chunkedupload_uploadchunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='media_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='media_report',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='media_status',
+            field=models.CharField(choices=[('pending', 'Not checked yet'), ('ok', 'OK'), ('warning', 'Warnings'), ('error', 'Problems')], default='pending', max_length=16),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0015_submission_media_checked_at_submission_media_report_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeritageCard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=8)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('region', models.CharField(max_length=50)),
+                ('region_label', models.CharField(max_length=100)),
+                ('object_type', models.CharField(max_length=50)),
+                ('object_type_label', models.CharField(max_length=100)),
+                ('ich_domain', models.CharField(max_length=50)),
+                ('ich_domain_label', models.CharField(max_length=100)),
+                ('origin_date', models.DateField()),
+                ('image_url', models.CharField(blank=True, max_length=500)),
+                ('thumbnail_url', models.CharField(blank=True, max_length=500)),
+                ('poster_url', models.CharField(blank=True, max_length=500)),
+                ('has_model', models.BooleanField(default=False)),
+                ('like_count', models.PositiveIntegerField(default=0)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cards', to='archive.heritageobject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['language', 'object'], name='archive_her_languag_876cd6_idx'), models.Index(fields=['language', 'region', 'object_type'], name='archive_her_languag_d3344a_idx')],
+                'unique_together': {('object', 'language')},
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Q
+from django.utils import translation
+from django.utils.translation import gettext
+
+# A frozen copy of archive.read_model.rebuild() as it was when cards were
+# introduced, so that replaying this migration does not depend on the
+# current application code.
+
+CHUNK_SIZE = 500
+
+CARD_FIELDS = (
+    'title', 'description',
+    'region', 'region_label',
+    'object_type', 'object_type_label',
+    'ich_domain', 'ich_domain_label',
+    'origin_date',
+    'image_url', 'thumbnail_url', 'poster_url', 'has_model',
+    'like_count', 'comment_count',
+)
+
+
+def _localized(obj, field, language):
+    if language != settings.LANGUAGE_CODE:
+        value = getattr(obj, f'{field}_{language}', None)
+        if value:
+            return value
+    return getattr(obj, field)
+
+
+def _label(obj, field):
+    # Historical choices carry the untranslated labels, which are the msgids
+    value = getattr(obj, field)
+    label = dict(obj._meta.get_field(field).flatchoices).get(value, value)
+    return gettext(str(label)) if label else ''
+
+
+def _url(field_file):
+    return field_file.url if field_file else ''
+
+
+def _card_values(obj, language):
+    with translation.override(language):
+        return {
+            'title': _localized(obj, 'title', language),
+            'description': _localized(obj, 'description', language) or '',
+            'region': obj.region,
+            'region_label': _label(obj, 'region'),
+            'object_type': obj.object_type,
+            'object_type_label': _label(obj, 'object_type'),
+            'ich_domain': obj.ich_domain,
+            'ich_domain_label': _label(obj, 'ich_domain'),
+            'origin_date': obj.origin_date,
+            'image_url': _url(obj.image),
+            'thumbnail_url': _url(obj.thumbnail),
+            'poster_url': _url(obj.poster),
+            'has_model': bool(obj.model_3d),
+            'like_count': obj.like_count,
+            'comment_count': obj.comment_count,
+        }
+
+
+def build_cards(apps, schema_editor):
+    HeritageObject = apps.get_model('archive', 'HeritageObject')
+    HeritageCard = apps.get_model('archive', 'HeritageCard')
+    languages = [code for code, _name in settings.LANGUAGES]
+
+    pks = list(HeritageObject.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pks), CHUNK_SIZE):
+        objects = HeritageObject.objects.filter(pk__in=pks[start:start + CHUNK_SIZE]).annotate(
+            like_count=Count('likes', distinct=True),
+            comment_count=Count('comments', filter=Q(comments__is_deleted=False), distinct=True),
+        )
+        HeritageCard.objects.bulk_create(
+            [
+                HeritageCard(object_id=obj.pk, language=language, **_card_values(obj, language))
+                for obj in objects
+                for language in languages
+            ],
+            update_conflicts=True,
+            unique_fields=['object', 'language'],
+            update_fields=[*CARD_FIELDS, 'updated_at'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0016_heritagecard'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_cards, migrations.RunPython.noop),
+    ]
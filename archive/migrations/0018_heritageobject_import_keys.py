@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0017_build_heritage_cards'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='heritageobject',
+            name='accession_number',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='heritageobject',
+            name='record_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
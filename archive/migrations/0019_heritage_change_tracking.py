@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0018_heritageobject_import_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeritageTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField(unique=True)),
+                ('accession_number', models.CharField(blank=True, max_length=255, null=True)),
+                ('record_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('deleted_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='heritageobject',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='heritageobject',
+            index=models.Index(fields=['updated_at', 'id'], name='archive_her_updated_244660_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='heritagetombstone',
+            index=models.Index(fields=['deleted_at', 'object_id'], name='archive_her_deleted_79c67c_idx'),
+        ),
+    ]
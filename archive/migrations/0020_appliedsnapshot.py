@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0019_heritage_change_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppliedSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.DateTimeField()),
+                ('base_version', models.DateTimeField(blank=True, null=True)),
+                ('objects_written', models.PositiveIntegerField(default=0)),
+                ('objects_deleted', models.PositiveIntegerField(default=0)),
+                ('applied_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-version'],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def _same_file(field, name):
+    if name:
+        return Q(**{field: name})
+    return Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+
+
+def link_published_submissions(apps, schema_editor):
+    """Link submissions published before the link existed to the object
+    create_heritage_object() made from them, when that is unambiguous,
+    so approving them again does not publish a duplicate."""
+    Submission = apps.get_model('archive', 'Submission')
+    HeritageObject = apps.get_model('archive', 'HeritageObject')
+    linked = set()
+    for submission in Submission.objects.filter(status='approved').order_by('pk').iterator():
+        candidates = [
+            pk for pk in HeritageObject.objects.filter(
+                _same_file('image', submission.image.name),
+                _same_file('model_3d', submission.model_3d.name),
+                title=submission.title,
+                origin_date=submission.origin_date,
+                region=submission.region,
+                object_type=submission.object_type,
+            ).values_list('pk', flat=True)
+            if pk not in linked
+        ]
+        if len(candidates) == 1:
+            Submission.objects.filter(pk=submission.pk).update(heritage_object_id=candidates[0])
+            linked.add(candidates[0])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0020_appliedsnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='heritage_object',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submission', to='archive.heritageobject'),
+        ),
+        migrations.CreateModel(
+            name='PublicationBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submission_ids', models.JSONField(default=list)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('published', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'publication batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.RunPython(link_published_submissions, migrations.RunPython.noop),
+    ]
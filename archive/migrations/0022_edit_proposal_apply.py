@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:39
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_auto_approved_applied(apps, schema_editor):
+    """Inline edits by trusted users were written straight to the object;
+    only proposals approved in the admin still need applying."""
+    EditProposal = apps.get_model('archive', 'EditProposal')
+    EditProposal.objects.filter(status='approved', note__startswith='Auto-approved edit by').update(
+        applied_at=F('updated_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0021_submission_publishing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='editproposal',
+            name='applied_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='editproposal',
+            name='base',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='editproposal',
+            name='conflicts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='editproposal',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('conflict', 'Conflict')], default='pending', max_length=16),
+        ),
+        migrations.RunPython(mark_auto_approved_applied, migrations.RunPython.noop),
+    ]
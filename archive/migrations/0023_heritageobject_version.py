@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0022_edit_proposal_apply'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='heritageobject',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
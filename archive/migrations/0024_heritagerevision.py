@@ -0,0 +1,74 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:45
+
+from datetime import date, datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+CHUNK_SIZE = 500
+
+
+def snapshot_existing_objects(apps, schema_editor):
+    # A frozen copy of archive.revisions.baseline() for objects that have
+    # no history yet: one snapshot revision each, as JSON-ready values.
+    HeritageObject = apps.get_model('archive', 'HeritageObject')
+    HeritageRevision = apps.get_model('archive', 'HeritageRevision')
+    fields = [
+        f for f in HeritageObject._meta.concrete_fields
+        if f.editable and not f.primary_key and not getattr(f, 'auto_now', False)
+    ]
+
+    def values(obj):
+        result = {}
+        for field in fields:
+            value = field.value_from_object(obj)
+            if isinstance(field, models.FileField):
+                value = value.name or None if value else None
+            elif isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            result[field.name] = value
+        return result
+
+    now = django.utils.timezone.now()
+    pks = list(HeritageObject.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pks), CHUNK_SIZE):
+        HeritageRevision.objects.bulk_create([
+            HeritageRevision(
+                object_id=obj.pk, number=1, kind='snapshot', data=values(obj),
+                source='baseline', created_at=now,
+            )
+            for obj in HeritageObject.objects.filter(pk__in=pks[start:start + CHUNK_SIZE])
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0023_heritageobject_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeritageRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('number', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('snapshot', 'Snapshot'), ('delta', 'Delta')], max_length=8)),
+                ('data', models.JSONField()),
+                ('source', models.CharField(blank=True, max_length=32)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['object_id', 'number'],
+                'indexes': [models.Index(fields=['object_id', 'created_at'], name='archive_her_object__b492cf_idx'), models.Index(fields=['created_at'], name='archive_her_created_3adc17_idx')],
+                'constraints': [models.UniqueConstraint(fields=('object_id', 'number'), name='unique_revision_number')],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_objects, migrations.RunPython.noop),
+    ]
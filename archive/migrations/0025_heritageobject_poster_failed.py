@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0024_heritagerevision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='heritageobject',
+            name='poster_failed',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
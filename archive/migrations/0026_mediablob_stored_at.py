@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_created_at(apps, schema_editor):
+    MediaBlob = apps.get_model('archive', 'MediaBlob')
+    MediaBlob.objects.update(stored_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0025_heritageobject_poster_failed'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='mediablob',
+            name='archive_med_ref_cou_8be296_idx',
+        ),
+        migrations.AddField(
+            model_name='mediablob',
+            name='stored_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='mediablob',
+            index=models.Index(fields=['ref_count', 'stored_at'], name='archive_med_ref_cou_664c1d_idx'),
+        ),
+    ]
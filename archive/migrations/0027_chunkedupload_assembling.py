@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0026_mediablob_stored_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chunkedupload',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'Uploading'), ('assembling', 'Assembling'), ('complete', 'Complete'), ('attached', 'Attached')], default='uploading', max_length=16),
+        ),
+    ]
@@ -1,5 +1,8 @@
+import uuid
+
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -60,6 +63,13 @@ class HeritageObject(models.Model):
     image = models.ImageField(upload_to='images/', null=True, blank=True)
     thumbnail = models.ImageField(upload_to='thumbnails/', null=True, blank=True, verbose_name=_("Thumbnail Image"))
     model_3d = models.FileField(upload_to='models/', null=True, blank=True, verbose_name=_("Model 3D"))
+    poster = models.ImageField(
+        upload_to='posters/', null=True, blank=True, editable=False,
+        verbose_name=_("3D Preview Poster"),
+    )  # rendered from model_3d by archive.rendering
+    # model_3d file a poster could not be rendered from; not tried again
+    # until the model is replaced (or by ``render_posters --all``).
+    poster_failed = models.CharField(max_length=255, blank=True, default='', editable=False)
 
     # ---------- Optional Smithsonian-style metadata ----------
     alternate_name   = models.CharField(max_length=255, blank=True, null=True)
@@ -90,14 +100,48 @@ class HeritageObject(models.Model):
     data_source  = models.CharField(max_length=255, blank=True, null=True)
     rights       = models.CharField(_("Restrictions & Rights"), max_length=255, blank=True, null=True)
 
-    accession_number = models.CharField(max_length=255, blank=True, null=True)
+    accession_number = models.CharField(max_length=255, blank=True, null=True, db_index=True)
     object_number    = models.CharField(max_length=255, blank=True, null=True)
-    record_id        = models.CharField(max_length=255, blank=True, null=True)
+    record_id        = models.CharField(max_length=255, blank=True, null=True, db_index=True)
     metadata_usage   = models.CharField(max_length=255, blank=True, null=True)
 
     guid             = models.URLField(blank=True, null=True)
     related_resource = models.URLField(blank=True, null=True)
 
+    # Last change to the record, for incremental harvesting (archive/harvest.py).
+    # auto_now is skipped by QuerySet.update() and bulk_update(): set it there.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Edit version, moved on by every write of the record's fields; inline
+    # edits are written only if the object is still at the version they
+    # were made against (archive/proposals.py).
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at", "id"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or kwargs.get("force_insert"):
+            return super().save(*args, **kwargs)
+        self._loaded_version, self.version = self.version, models.F("version") + 1
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self.version = self._loaded_version
+            raise
+
+    def _save_table(self, *args, **kwargs):
+        updated = super()._save_table(*args, **kwargs)
+        if isinstance(self.version, models.expressions.Combinable):
+            # The UPDATE incremented the stored version; give post_save
+            # receivers (revisions, caches) the number without re-reading
+            # the row. It lags only if this instance was already stale.
+            self.version = self._loaded_version + 1
+        return updated
+
     def get_title_display(self, language_code=None):
         """Return appropriate title based on language"""
         from django.utils import translation
@@ -123,11 +167,172 @@ class HeritageObject(models.Model):
         elif language_code == 'fr' and self.description_fr:
             return self.description_fr
         return self.description
-    
+
+    def render_poster(self):
+        """Render a still preview of model_3d into the poster field.
+
+        Returns True if a poster was written. Unparseable and unsupported
+        models are logged and recorded in ``poster_failed`` so that they are
+        not tried again on every save.
+        """
+        import logging
+        import os
+        from django.core.files.base import ContentFile
+        from .fragments import bump
+        from .object_cache import invalidate
+        from .read_model import refresh_cards
+        from .rendering import MeshError, SUPPORTED_EXTENSIONS, render_poster
+        from .storage import release, retain
+
+        if not self.model_3d:
+            return False
+
+        def failed():
+            self.poster_failed = self.model_3d.name
+            HeritageObject.objects.filter(pk=self.pk).update(poster_failed=self.poster_failed)
+            return False
+
+        if os.path.splitext(self.model_3d.name)[1].lower() not in SUPPORTED_EXTENSIONS:
+            return failed()
+
+        try:
+            png = render_poster(self.model_3d)
+        except (MeshError, OSError) as exc:
+            logging.getLogger(__name__).warning(
+                "Could not render poster for %s (%s): %s", self.pk, self.model_3d.name, exc
+            )
+            return failed()
+
+        previous = self.poster.name if self.poster else None
+        stem = os.path.splitext(os.path.basename(self.model_3d.name))[0]
+        self.poster.save(f"{stem}.png", ContentFile(png), save=False)
+        # Bypass save() so post_save does not fire again; keep the media
+        # reference counts in step by hand. It is still a change to the
+        # record: updated_at and version move on so snapshot deltas and
+        # harvesters pick the poster up.
+        self.poster_failed = ''
+        self.updated_at = timezone.now()
+        HeritageObject.objects.filter(pk=self.pk).update(
+            poster=self.poster.name, poster_failed='',
+            updated_at=self.updated_at, version=models.F("version") + 1,
+        )
+        self.refresh_from_db(fields=["version"])
+        if previous != self.poster.name:
+            retain(self.poster.name)
+            release(previous)
+        bump("card", self.pk)
+        invalidate(HeritageObject, self.pk)
+        refresh_cards(self.pk)
+        return True
+
     def __str__(self):
         return self.title
 
 
+class HeritageTombstone(models.Model):
+    """Marks a deleted HeritageObject so harvesters learn about the deletion
+    (see archive/harvest.py). Removed again if the id is reused."""
+    object_id = models.PositiveBigIntegerField(unique=True)
+    accession_number = models.CharField(max_length=255, blank=True, null=True)
+    record_id = models.CharField(max_length=255, blank=True, null=True)
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at", "object_id"]),
+        ]
+
+    def __str__(self):
+        return f"Deleted object #{self.object_id}"
+
+
+class HeritageRevision(models.Model):
+    """One change to a HeritageObject's fields (see archive/revisions.py):
+    the full record for a snapshot, only the changed fields for a delta.
+    Kept by object id so history outlives the object."""
+    SNAPSHOT = "snapshot"
+    DELTA = "delta"
+    KIND_CHOICES = [
+        (SNAPSHOT, _("Snapshot")),
+        (DELTA,    _("Delta")),
+    ]
+
+    object_id = models.PositiveBigIntegerField()
+    number = models.PositiveIntegerField()
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    data = models.JSONField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    source = models.CharField(max_length=32, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["object_id", "number"]
+        constraints = [
+            models.UniqueConstraint(fields=["object_id", "number"], name="unique_revision_number"),
+        ]
+        indexes = [
+            models.Index(fields=["object_id", "created_at"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.number} of object {self.object_id}"
+
+
+class AppliedSnapshot(models.Model):
+    """A catalog snapshot or delta bundle loaded into this installation
+    (see archive/snapshots.py); the latest row is the local version."""
+    version = models.DateTimeField()
+    base_version = models.DateTimeField(null=True, blank=True)
+    objects_written = models.PositiveIntegerField(default=0)
+    objects_deleted = models.PositiveIntegerField(default=0)
+    applied_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-version"]
+
+    def __str__(self):
+        kind = "delta" if self.base_version else "full"
+        return f"{kind} snapshot {self.version:%Y-%m-%d %H:%M:%S}"
+
+
+class HeritageCard(models.Model):
+    """Denormalized per-language projection of a HeritageObject for list,
+    search, API and sitemap reads (see archive.read_model). Rebuilt whenever
+    the object or its counters change; never edited directly."""
+    object = models.ForeignKey(HeritageObject, on_delete=models.CASCADE, related_name="cards")
+    language = models.CharField(max_length=8)
+
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    region = models.CharField(max_length=50)
+    region_label = models.CharField(max_length=100)
+    object_type = models.CharField(max_length=50)
+    object_type_label = models.CharField(max_length=100)
+    ich_domain = models.CharField(max_length=50)
+    ich_domain_label = models.CharField(max_length=100)
+    origin_date = models.DateField()
+
+    image_url = models.CharField(max_length=500, blank=True)
+    thumbnail_url = models.CharField(max_length=500, blank=True)
+    poster_url = models.CharField(max_length=500, blank=True)
+    has_model = models.BooleanField(default=False)
+
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (("object", "language"),)
+        indexes = [
+            models.Index(fields=["language", "object"]),
+            models.Index(fields=["language", "region", "object_type"]),
+        ]
+
+    def __str__(self):
+        return f"{self.title} [{self.language}]"
+
+
 # ============================
 # Community / social models
 # ============================
@@ -191,12 +396,18 @@ class EditProposal(models.Model):
         ("pending",  _("Pending")),
         ("approved", _("Approved")),
         ("rejected", _("Rejected")),
+        ("conflict", _("Conflict")),
     ]
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     object = models.ForeignKey(HeritageObject, on_delete=models.CASCADE, related_name="proposals")
     note = models.TextField(blank=True, null=True)
     data = models.JSONField()  # JSON of proposed changes
+    # Values of the proposed fields when the edit was proposed, so applying
+    # it can tell whether someone else changed them since (archive/proposals.py)
+    base = models.JSONField(default=dict, blank=True)
+    conflicts = models.JSONField(default=dict, blank=True)
+    applied_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="pending")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -246,6 +457,32 @@ class Submission(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Filled in by the background media checks (archive/media_checks.py)
+    MEDIA_STATUS_CHOICES = [
+        ("pending", _("Not checked yet")),
+        ("ok",      _("OK")),
+        ("warning", _("Warnings")),
+        ("error",   _("Problems")),
+    ]
+    media_status = models.CharField(max_length=16, choices=MEDIA_STATUS_CHOICES, default="pending")
+    media_report = models.JSONField(default=dict, blank=True)
+    media_checked_at = models.DateTimeField(null=True, blank=True)
+
+    # The object this submission was published as (see archive/publishing.py)
+    heritage_object = models.OneToOneField(
+        HeritageObject, on_delete=models.SET_NULL, null=True, blank=True, related_name="submission"
+    )
+
+    # Copied onto the HeritageObject when the submission is published
+    PUBLISHED_FIELDS = (
+        "title", "title_ar", "title_fr",
+        "description", "description_ar", "description_fr",
+        "region", "object_type", "ich_domain", "origin_date",
+        "image", "model_3d",
+        "alternate_name", "maker", "attribution", "period", "origin_place",
+        "materials", "dimensions", "weight",
+    )
+
     class Meta:
         ordering = ["-created_at"]
 
@@ -266,36 +503,56 @@ class Submission(models.Model):
             profile.rank >= 997  # Expert (999), Consultant (998), Moderator (997)
         )
     
+    def build_heritage_object(self):
+        """Unsaved HeritageObject carrying this submission's catalog fields"""
+        return HeritageObject(**{name: getattr(self, name) for name in self.PUBLISHED_FIELDS})
+
     def create_heritage_object(self):
         """Convert approved submission to HeritageObject"""
         if self.status != 'approved':
             raise ValueError("Can only create HeritageObject from approved submissions")
-            
-        heritage_obj = HeritageObject.objects.create(
-            title=self.title,
-            title_ar=self.title_ar,
-            title_fr=self.title_fr,
-            description=self.description,
-            description_ar=self.description_ar,
-            description_fr=self.description_fr,
-            region=self.region,
-            object_type=self.object_type,
-            ich_domain=self.ich_domain,
-            origin_date=self.origin_date,
-            image=self.image,
-            model_3d=self.model_3d,
-            alternate_name=self.alternate_name,
-            maker=self.maker,
-            attribution=self.attribution,
-            period=self.period,
-            origin_place=self.origin_place,
-            materials=self.materials,
-            dimensions=self.dimensions,
-            weight=self.weight,
-        )
+        if self.heritage_object_id:
+            raise ValueError("This submission has already been published")
+
+        heritage_obj = self.build_heritage_object()
+        heritage_obj.save()
+        self.heritage_object = heritage_obj
+        Submission.objects.filter(pk=self.pk).update(heritage_object=heritage_obj)
         return heritage_obj
 
 
+class PublicationBatch(models.Model):
+    """A moderation batch of submissions published in the background
+    (see archive/publishing.py); progress is shown in the admin."""
+    STATUS_CHOICES = [
+        ("queued",  _("Queued")),
+        ("running", _("Running")),
+        ("done",    _("Done")),
+        ("failed",  _("Failed")),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    submission_ids = models.JSONField(default=list)
+    total = models.PositiveIntegerField(default=0)
+    published = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)  # already published or deleted
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="queued")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name_plural = "publication batches"
+
+    @property
+    def processed(self):
+        return self.published + self.skipped
+
+    def __str__(self):
+        return f"Publication batch #{self.pk} ({self.processed}/{self.total}, {self.status})"
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     bio = models.TextField(blank=True, null=True)
@@ -379,4 +636,76 @@ class UserProfile(models.Model):
             return str(self.rank)
     
     def __str__(self):
-        return f"Profile: {self.user}"
\ No newline at end of file
+        return f"Profile: {self.user}"
+
+
+class MediaBlob(models.Model):
+    """A content-addressed media file (see archive.storage) and how many
+    file fields currently point at it."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time this content was stored, by a first or a repeated upload:
+    # younger files are not deleted when their references drop to zero,
+    # as an upload's reference is only counted once its row is saved.
+    stored_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ref_count", "stored_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class ChunkedUpload(models.Model):
+    """A large file uploaded in chunks (see archive/uploads.py) before it is
+    attached to a Submission."""
+    FIELD_CHOICES = [
+        ("image",    _("Image")),
+        ("model_3d", _("Model 3D")),
+    ]
+    STATUS_CHOICES = [
+        ("uploading",  _("Uploading")),
+        ("assembling", _("Assembling")),
+        ("complete",   _("Complete")),
+        ("attached",   _("Attached")),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    field = models.CharField(max_length=16, choices=FIELD_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)  # expected, then verified
+    stored_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="uploading")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def __str__(self):
+        return f"Upload {self.filename} ({self.status})"
+
+
+class UploadChunk(models.Model):
+    upload = models.ForeignKey(ChunkedUpload, on_delete=models.CASCADE, related_name="chunks")
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = (("upload", "index"),)
+
+    def __str__(self):
+        return f"Chunk {self.index} of {self.upload_id}"
@@ -0,0 +1,278 @@
+"""
+Two-tier read-through cache for hot row lookups.
+
+Views look up the same heritage objects, comments and user profiles on
+nearly every request, often only to check that they exist. ``get_cached``
+answers those lookups from
+
+1. a small in-process LRU (per gunicorn worker, no I/O at all), then
+2. the shared Django cache (``CACHES['default']``), then
+3. the database, storing the row in both tiers on the way back.
+
+Rows are stored pickled and unpickled on every hit, so callers get their
+own instance and can modify it without affecting other requests. Missing
+rows are cached too (briefly), so a flood of requests for a bad id does
+not reach the database either.
+
+When a row changes, ``invalidate()`` deletes it from the shared cache and
+this worker's LRU and appends its key to an invalidation log, a plain
+append-only file next to the file cache. Every worker checks the log's
+size before a lookup (one ``stat`` call) and evicts the keys appended since
+it last looked, so no worker serves a row that was changed elsewhere. The
+signals in archive/signals.py invalidate on save and delete; code that
+bypasses them with ``QuerySet.update()`` calls ``invalidate()`` itself.
+
+Hot keys are protected against stampedes: within a worker only one thread
+loads a given key while the others wait for it, and across workers a
+short-lived lock in the shared cache lets one worker hit the database while
+the rest poll the shared cache for its result.
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import Http404
+
+KEY_PREFIX = "object-cache:v1"
+
+LOCAL_MAX_ENTRIES = 1000
+# Safety net in case an invalidation is ever missed
+LOCAL_TIMEOUT = 60
+SHARED_TIMEOUT = 60 * 5
+MISSING_TIMEOUT = 30
+
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.02
+
+# Rotate the invalidation log once it grows past this size
+LOG_MAX_BYTES = 1024 * 1024
+
+MISSING = b"-"
+
+# Model label -> the field lookups are keyed by
+CACHED_MODELS = {
+    "archive.HeritageObject": "pk",
+    "archive.Comment": "pk",
+    "archive.UserProfile": "user_id",
+}
+
+
+def _key(model, value):
+    return f"{KEY_PREFIX}:{model._meta.label_lower}:{value}"
+
+
+class LocalCache:
+    """Thread-safe LRU of pickled rows with a per-entry expiry."""
+
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES, timeout=LOCAL_TIMEOUT):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, data)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class InvalidationLog:
+    """Append-only file of invalidated keys shared by the workers on a host.
+
+    Writers append whole lines with a single ``O_APPEND`` write, which the
+    OS does not interleave. Readers remember how far they have read; when
+    the file is rotated (a new inode) they cannot know what they missed and
+    report that everything must go.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._inode, self._offset = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None, 0
+        return st.st_ino, st.st_size
+
+    def publish(self, keys):
+        line = "".join(f"{key}\n" for key in keys).encode()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > LOG_MAX_BYTES:
+            self._rotate()
+
+    def _rotate(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        open(tmp_path, "wb").close()
+        os.replace(tmp_path, self.path)
+
+    def poll(self):
+        """Keys invalidated since the last poll, or None if the log was
+        rotated and every local entry must be dropped."""
+        inode, size = self._stat()
+        if inode == self._inode and size == self._offset:
+            return []
+        with self._lock:
+            if inode != self._inode or size < self._offset:
+                self._inode, self._offset = self._stat()
+                return None
+            try:
+                with open(self.path, "rb") as fh:
+                    fh.seek(self._offset)
+                    data = fh.read(size - self._offset)
+            except FileNotFoundError:
+                self._inode, self._offset = None, 0
+                return None
+            # Leave a partially written line for the next poll
+            data = data[:data.rfind(b"\n") + 1]
+            self._offset += len(data)
+            return data.decode().splitlines()
+
+
+def _log_path():
+    return getattr(settings, "OBJECT_CACHE_LOG", None) or os.path.join(
+        settings.BASE_DIR, "cache", "object-cache.log"
+    )
+
+
+local = LocalCache()
+channel = InvalidationLog(_log_path())
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def sync():
+    """Apply invalidations published by other workers to the local tier."""
+    keys = channel.poll()
+    if keys is None:
+        local.clear()
+    elif keys:
+        local.delete(*keys)
+
+
+def _load(model, field, value, key):
+    """Read one row from the database into the shared cache, letting only
+    one thread per worker and (best effort) one worker per host do so."""
+    with _flights_lock:
+        flight = _flights.setdefault(key, threading.Lock())
+    with flight:
+        try:
+            data = cache.get(key)
+            if data is not None:
+                return data
+
+            lock_key = f"{key}:lock"
+            locked = cache.add(lock_key, os.getpid(), LOCK_TIMEOUT)
+            if not locked:
+                deadline = time.monotonic() + LOCK_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL)
+                    data = cache.get(key)
+                    if data is not None:
+                        return data
+                # The other worker is slow or gone; load it ourselves.
+            try:
+                row = model._default_manager.filter(**{field: value}).first()
+                if row is None:
+                    data = MISSING
+                    cache.set(key, data, MISSING_TIMEOUT)
+                else:
+                    data = pickle.dumps(row, pickle.HIGHEST_PROTOCOL)
+                    cache.set(key, data, SHARED_TIMEOUT)
+                return data
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+        finally:
+            with _flights_lock:
+                _flights.pop(key, None)
+
+
+def get_cached(model, value):
+    """The row of ``model`` whose lookup field equals ``value``, or None."""
+    field = CACHED_MODELS[model._meta.label]
+    key = _key(model, value)
+    sync()
+    data = local.get(key)
+    if data is None:
+        data = cache.get(key)
+        if data is None:
+            data = _load(model, field, value, key)
+        local.set(key, data)
+    if data == MISSING:
+        return None
+    return pickle.loads(data)
+
+
+def get_cached_or_404(model, value, **conditions):
+    """Like ``get_object_or_404(model, pk=value, **conditions)`` where the
+    conditions are plain field values checked on the cached row."""
+    obj = get_cached(model, value)
+    if obj is None or any(getattr(obj, name) != expected for name, expected in conditions.items()):
+        raise Http404(f"No {model._meta.object_name} matches the given query.")
+    return obj
+
+
+def profile_for(user):
+    """The user's UserProfile, created if they do not have one yet."""
+    from .models import UserProfile
+
+    profile = get_cached(UserProfile, user.pk)
+    if profile is None:
+        profile, _ = UserProfile.objects.get_or_create(user=user)
+    return profile
+
+
+def _evict(keys):
+    cache.delete_many(keys)
+    local.delete(*keys)
+    channel.publish(keys)
+
+
+def invalidate(model, *values):
+    """Drop these rows (by lookup field value) from every tier and worker."""
+    keys = [_key(model, value) for value in values if value is not None]
+    if not keys:
+        return
+    _evict(keys)
+    if connection.in_atomic_block:
+        # Another worker may re-read the old row before the change commits.
+        transaction.on_commit(lambda: _evict(keys))
@@ -0,0 +1,246 @@
+"""
+Applying approved EditProposals to their objects.
+
+A proposal carries the new values (``data``) and the values the proposer
+saw (``base``). ``apply_proposals()`` takes the selected proposals
+grouped by object, oldest first, and for each field compares three
+values: the proposed one, the base, and the current one (the row as
+stored, plus the changes of earlier proposals in the same run).
+
+* proposed == current: nothing to do;
+* current == base: nobody touched the field since, take the proposal;
+* otherwise someone else changed it in the meantime: conflict.
+
+A proposal is applied whole or not at all; one with a conflicting or
+invalid field is marked ``conflict`` with the details (``kind`` tells
+the two apart) for a moderator to resolve, or to apply anyway with
+``force``, which ignores ``base``. Proposals recorded before ``base``
+existed are compared with the row as it is when they are applied.
+
+Objects are processed in chunks, one transaction each: the rows are
+locked, the merged changes written with ``bulk_update`` restricted to
+the fields that changed (objects are grouped by their set of changed
+fields, so a title fix does not rewrite descriptions), and the
+proposals marked in bulk. Revisions (archive/revisions.py), cards,
+caches and fragment versions are handled afterwards, as bulk_update
+skips the signals that would.
+
+Every write moves ``HeritageObject.version`` on. ``write_fields()`` is
+the single-object path used by inline edits: one ``UPDATE … WHERE
+version = %s`` of just the edited columns, which fails with
+StaleVersion instead of overwriting a concurrent edit.
+"""
+from collections import defaultdict
+from itertools import groupby
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import filter_cache, object_cache
+from .fragments import bump
+from .importer import import_fields
+from .models import EditProposal, HeritageObject
+from .read_model import refresh_cards
+from .revisions import record
+
+CHUNK_SIZE = 200  # objects per transaction
+
+APPLICABLE_STATUSES = ("pending", "approved", "conflict")
+
+
+def editable_fields():
+    """HeritageObject fields a proposal may change, by name."""
+    names = set(import_fields())
+    return {
+        field.name: field for field in HeritageObject._meta.concrete_fields
+        if field.name in names and not isinstance(field, models.FileField)
+    }
+
+
+def base_values(obj, names):
+    """The current values of ``names`` on ``obj``, for EditProposal.base."""
+    fields = editable_fields()
+    values = {}
+    for name in names:
+        if name in fields:
+            value = fields[name].value_from_object(obj)
+            values[name] = None if value is None else str(value)
+    return values
+
+
+def _to_python(field, value):
+    if value in ("", None) and field.null:
+        return None
+    return field.to_python(value)
+
+
+class ApplyResult:
+    def __init__(self):
+        self.applied = 0
+        self.conflicts = 0
+        self.objects = 0
+        self.fields_written = 0
+
+    def __str__(self):
+        return (
+            f"{self.applied} applied to {self.objects} objects "
+            f"({self.fields_written} fields written), {self.conflicts} conflicts"
+        )
+
+
+def clean_values(data, obj, fields=None):
+    """Validate proposed raw values. Returns (values, problems)."""
+    fields = fields or editable_fields()
+    values, problems = {}, {}
+    for name, raw in data.items():
+        field = fields.get(name)
+        if field is None:
+            problems[name] = {"kind": "invalid", "reason": "not an editable field", "proposed": raw}
+            continue
+        try:
+            value = _to_python(field, raw)
+            if value is None:
+                if not field.null:
+                    raise ValidationError("This field cannot be empty.")
+            else:
+                value = field.clean(value, obj)
+        except ValidationError as exc:
+            problems[name] = {"kind": "invalid", "reason": "; ".join(exc.messages), "proposed": raw}
+            continue
+        values[name] = value
+    return values, problems
+
+
+def _merge(proposal, obj, working, fields, force):
+    """Return (changes, problems) for one proposal against ``working``."""
+    changes = {}
+    data = proposal.data if isinstance(proposal.data, dict) else {}
+    values, problems = clean_values(data, obj, fields)
+    for name, proposed in values.items():
+        field, raw = fields[name], data[name]
+        current = working.get(name, getattr(obj, name))
+        if proposed == current:
+            continue
+        if name in proposal.base and not force:
+            try:
+                base = _to_python(field, proposal.base[name])
+            except ValidationError:
+                base = proposal.base[name]
+        else:
+            base = getattr(obj, name)
+        if current != base and not force:
+            problems[name] = {
+                "kind": "conflict",
+                "reason": "changed since the edit was proposed",
+                "base": proposal.base.get(name),
+                "current": None if current is None else str(current),
+                "proposed": raw,
+            }
+            continue
+        changes[name] = proposed
+    return changes, problems
+
+
+def _apply_chunk(proposal_ids, object_ids, result, force, user):
+    fields = editable_fields()
+    now = timezone.now()
+    with transaction.atomic():
+        objects = HeritageObject.objects.select_for_update().in_bulk(object_ids)
+        proposals = (
+            EditProposal.objects.select_for_update()
+            .filter(pk__in=proposal_ids, status__in=APPLICABLE_STATUSES, applied_at__isnull=True)
+            .order_by("object_id", "created_at", "pk")
+        )
+        changed = {}  # object id -> {field: value}
+        marked = []
+        for object_id, group in groupby(proposals, key=lambda p: p.object_id):
+            obj = objects[object_id]
+            working = {}
+            for proposal in group:
+                changes, problems = _merge(proposal, obj, working, fields, force)
+                if problems:
+                    proposal.status = "conflict"
+                    proposal.conflicts = problems
+                    result.conflicts += 1
+                else:
+                    working.update(changes)
+                    proposal.status = "approved"
+                    proposal.conflicts = {}
+                    proposal.applied_at = now
+                    result.applied += 1
+                proposal.updated_at = now
+                marked.append(proposal)
+            # Drop changes that a later proposal set back to the stored value
+            working = {name: value for name, value in working.items() if value != getattr(obj, name)}
+            if working:
+                changed[object_id] = working
+
+        by_fields = defaultdict(list)
+        for object_id, working in changed.items():
+            obj = objects[object_id]
+            for name, value in working.items():
+                setattr(obj, name, value)
+            obj.updated_at = now  # bulk_update() skips auto_now
+            obj.version = F("version") + 1
+            by_fields[tuple(sorted(working))].append(obj)
+        for names, objs in by_fields.items():
+            HeritageObject.objects.bulk_update(objs, [*names, "updated_at", "version"])
+            result.fields_written += len(names) * len(objs)
+        EditProposal.objects.bulk_update(marked, ["status", "conflicts", "applied_at", "updated_at"])
+
+    pks = list(changed)
+    if pks:
+        record(*pks, user=user, source="proposal")
+        refresh_cards(*pks)
+        bump("card", *pks)
+        object_cache.invalidate(HeritageObject, *pks)
+    result.objects += len(pks)
+    return pks
+
+
+def apply_proposals(queryset, chunk_size=CHUNK_SIZE, force=False, user=None):
+    """Apply the proposals in ``queryset`` that have not been applied yet,
+    on behalf of moderator ``user``. Returns an ApplyResult."""
+    result = ApplyResult()
+    rows = (
+        queryset.filter(status__in=APPLICABLE_STATUSES, applied_at__isnull=True)
+        .order_by("object_id", "pk")
+        .values_list("object_id", "pk")
+    )
+    by_object = defaultdict(list)
+    for object_id, pk in rows:
+        by_object[object_id].append(pk)
+
+    object_ids = sorted(by_object)
+    touched = False
+    for start in range(0, len(object_ids), chunk_size):
+        chunk = object_ids[start:start + chunk_size]
+        proposal_ids = [pk for object_id in chunk for pk in by_object[object_id]]
+        touched |= bool(_apply_chunk(proposal_ids, chunk, result, force, user))
+    if touched:
+        filter_cache.invalidate()
+    return result
+
+
+# ---------- Single versioned edits ----------
+
+class StaleVersion(Exception):
+    """The object was changed after the version an edit was made against."""
+
+
+def write_fields(pk, version, values, user=None):
+    """Write ``values`` to object ``pk`` with one UPDATE of only those
+    columns, if it is still at ``version``. Returns the new version."""
+    updated = HeritageObject.objects.filter(pk=pk, version=version).update(
+        **values, version=F("version") + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        raise StaleVersion(pk)
+    record(pk, user=user, source="inline edit")
+    refresh_cards(pk)
+    bump("card", pk)
+    object_cache.invalidate(HeritageObject, pk)
+    transaction.on_commit(filter_cache.invalidate)
+    return version + 1
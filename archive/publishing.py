@@ -0,0 +1,138 @@
+"""
+Publishing approved submissions as HeritageObjects in bulk.
+
+``publish_submissions()`` walks the selected submissions in chunks. Each
+chunk is one transaction: the submissions are locked, their objects are
+written with a single ``bulk_create``, and the submissions are marked
+approved and linked to their object with a single ``bulk_update``. A
+submission that already has an object is skipped, so running a batch
+again (after a failure, or a double click) never publishes twice.
+
+bulk_create skips the model signals, so what they would have done is
+done here: media reference counts (the object shares the submission's
+stored files), tombstones for reused ids, revision history, cards,
+fragment versions and the filter cache. Posters for 3D models are rendered afterwards as
+background jobs, one per chunk, so the chunk's transaction does not wait
+on mesh rendering.
+
+Small selections are published inside the admin request; larger ones
+are recorded as a PublicationBatch and run by ``run_batch()`` in the
+background (archive/tasks.py), updating the batch after every chunk so
+moderators can follow progress in the admin.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import filter_cache
+from .fragments import bump
+from .models import HeritageObject, HeritageTombstone, PublicationBatch, Submission
+from .read_model import refresh_cards
+from .revisions import record
+from .storage import retain
+from .tasks import enqueue
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 200
+INLINE_LIMIT = 25  # selections up to this size are published in the request
+
+FILE_FIELDS = ("image", "model_3d")
+
+
+def _publish_chunk(submission_ids):
+    """Publish one chunk; returns the created objects."""
+    now = timezone.now()
+    with transaction.atomic():
+        submissions = list(
+            Submission.objects.select_for_update()
+            .filter(pk__in=submission_ids, heritage_object__isnull=True)
+            .order_by("pk")
+        )
+        objs = HeritageObject.objects.bulk_create(
+            [submission.build_heritage_object() for submission in submissions]
+        )
+        for submission, obj in zip(submissions, objs):
+            submission.heritage_object = obj
+            submission.status = "approved"
+            submission.updated_at = now  # bulk_update() skips auto_now
+            for field in FILE_FIELDS:
+                retain(getattr(obj, field).name or None)
+        Submission.objects.bulk_update(submissions, ["heritage_object", "status", "updated_at"])
+        HeritageTombstone.objects.filter(object_id__in=[obj.pk for obj in objs]).delete()
+
+    pks = [obj.pk for obj in objs]
+    record(*pks, source="publish", new=True)
+    refresh_cards(*pks)
+    bump("card", *pks)
+    with_models = [obj.pk for obj in objs if obj.model_3d]
+    if with_models:
+        enqueue(render_posters, with_models)
+    return objs
+
+
+def publish_submissions(submission_ids, chunk_size=CHUNK_SIZE, on_chunk=None):
+    """Publish the given submissions. Returns (published, skipped)."""
+    submission_ids = sorted(set(submission_ids))
+    on_chunk = on_chunk or (lambda published, skipped: None)
+    published = skipped = 0
+    try:
+        for start in range(0, len(submission_ids), chunk_size):
+            chunk = submission_ids[start:start + chunk_size]
+            created = len(_publish_chunk(chunk))
+            published += created
+            skipped += len(chunk) - created
+            on_chunk(published, skipped)
+    finally:
+        if published:
+            filter_cache.invalidate()
+    return published, skipped
+
+
+def render_posters(pks):
+    """Posters for those of these objects that have a 3D model but no
+    poster, skipping models that already failed to render. Run as a
+    background job after publishing, importing and saving objects."""
+    missing = (
+        HeritageObject.objects.filter(pk__in=pks)
+        .exclude(Q(model_3d="") | Q(model_3d__isnull=True))
+        .filter(Q(poster="") | Q(poster__isnull=True))
+        .exclude(poster_failed=F("model_3d"))
+    )
+    for obj in missing:
+        obj.render_poster()
+
+
+# ---------- Background batches ----------
+
+def start_batch(user, submission_ids):
+    """Record a PublicationBatch and publish it in the background."""
+    submission_ids = sorted(set(submission_ids))
+    batch = PublicationBatch.objects.create(
+        user=user, submission_ids=submission_ids, total=len(submission_ids)
+    )
+    enqueue(run_batch, batch.pk)
+    return batch
+
+
+def run_batch(batch_id):
+    batch = PublicationBatch.objects.filter(pk=batch_id).first()
+    if batch is None:
+        return
+    rows = PublicationBatch.objects.filter(pk=batch_id)
+    rows.update(status="running", published=0, skipped=0, error="", finished_at=None)
+
+    def progress(published, skipped):
+        rows.update(published=published, skipped=skipped)
+
+    try:
+        published, skipped = publish_submissions(batch.submission_ids, on_chunk=progress)
+    except Exception as exc:
+        # Chunks committed so far stay published; running the batch
+        # again picks up where this run stopped.
+        rows.update(status="failed", error=str(exc), finished_at=timezone.now())
+        raise
+    rows.update(status="done", finished_at=timezone.now())
+    logger.info("Publication batch %s: %s published, %s skipped", batch_id, published, skipped)
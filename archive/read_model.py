@@ -0,0 +1,140 @@
+"""
+Per-language read model for heritage objects.
+
+``HeritageCard`` holds one row per object per site language with
+everything a catalog card or listing needs already resolved: the title
+and description in that language, translated region/type/domain labels,
+media URLs and like/comment counters. Lists, search, the API and
+sitemaps read it with a single indexed query instead of recomputing the
+projection per object on every render.
+
+Rows are rebuilt by the signals in archive/signals.py whenever an object,
+its likes or its comments change, and in bulk by
+``manage.py rebuild_cards``.
+"""
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import translation
+
+CHUNK_SIZE = 500
+
+CARD_FIELDS = (
+    "title", "description",
+    "region", "region_label",
+    "object_type", "object_type_label",
+    "ich_domain", "ich_domain_label",
+    "origin_date",
+    "image_url", "thumbnail_url", "poster_url", "has_model",
+    "like_count", "comment_count",
+)
+
+
+def languages():
+    return [code for code, _name in settings.LANGUAGES]
+
+
+def _localized(obj, field, language):
+    if language != settings.LANGUAGE_CODE:
+        value = getattr(obj, f"{field}_{language}", None)
+        if value:
+            return value
+    return getattr(obj, field)
+
+
+def _label(obj, field):
+    # Labels come from the current model so they translate even when ``obj``
+    # is a historical model instance inside a migration.
+    from .models import HeritageObject
+
+    value = getattr(obj, field)
+    return str(dict(HeritageObject._meta.get_field(field).flatchoices).get(value, value))
+
+
+def _url(field_file):
+    return field_file.url if field_file else ""
+
+
+def card_values(obj, language):
+    """The projection of ``obj`` in ``language`` as HeritageCard field values.
+    ``obj`` must carry ``like_count``/``comment_count`` annotations."""
+    with translation.override(language):
+        return {
+            "title": _localized(obj, "title", language),
+            "description": _localized(obj, "description", language) or "",
+            "region": obj.region,
+            "region_label": _label(obj, "region"),
+            "object_type": obj.object_type,
+            "object_type_label": _label(obj, "object_type"),
+            "ich_domain": obj.ich_domain,
+            "ich_domain_label": _label(obj, "ich_domain"),
+            "origin_date": obj.origin_date,
+            "image_url": _url(obj.image),
+            "thumbnail_url": _url(obj.thumbnail),
+            "poster_url": _url(obj.poster),
+            "has_model": bool(obj.model_3d),
+            "like_count": obj.like_count,
+            "comment_count": obj.comment_count,
+        }
+
+
+def with_counters(queryset):
+    return queryset.annotate(
+        like_count=Count("likes", distinct=True),
+        comment_count=Count("comments", filter=Q(comments__is_deleted=False), distinct=True),
+    )
+
+
+def write_cards(objects, card_model=None):
+    """Upsert the cards of every object in ``objects`` (annotated with
+    ``with_counters``) for every site language."""
+    if card_model is None:
+        from .models import HeritageCard as card_model
+
+    rows = [
+        card_model(object_id=obj.pk, language=language, **card_values(obj, language))
+        for obj in objects
+        for language in languages()
+    ]
+    card_model.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["object", "language"],
+        update_fields=[*CARD_FIELDS, "updated_at"],
+    )
+    return len(rows)
+
+
+def refresh_cards(*pks):
+    """Rebuild the cards of the given objects."""
+    from .models import HeritageObject
+
+    pks = [pk for pk in pks if pk is not None]
+    if pks:
+        write_cards(with_counters(HeritageObject.objects.filter(pk__in=pks)))
+
+
+def refresh_counters(pk):
+    """Update only the like/comment counters of one object's cards."""
+    from .models import Comment, HeritageCard, HeritageLike
+
+    HeritageCard.objects.filter(object_id=pk).update(
+        like_count=HeritageLike.objects.filter(object_id=pk).count(),
+        comment_count=Comment.objects.filter(object_id=pk, is_deleted=False).count(),
+    )
+
+
+def rebuild(object_model=None, card_model=None, chunk_size=CHUNK_SIZE):
+    """Rebuild every card in chunks and drop cards for languages that are no
+    longer configured. Returns the number of rows written."""
+    if object_model is None:
+        from .models import HeritageObject as object_model
+    if card_model is None:
+        from .models import HeritageCard as card_model
+
+    written = 0
+    pks = list(object_model.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(pks), chunk_size):
+        chunk = with_counters(object_model.objects.filter(pk__in=pks[start:start + chunk_size]))
+        written += write_cards(chunk, card_model)
+    card_model.objects.exclude(language__in=languages()).delete()
+    return written
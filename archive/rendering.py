@@ -0,0 +1,390 @@
+"""
+CPU-only software renderer for 3D model posters.
+
+Loads the triangle mesh of a glTF / GLB / OBJ file, rasterizes it with a
+NumPy z-buffer and returns a PNG still that can be shown instead of the
+interactive <model-viewer> until the visitor asks for the real model.
+"""
+import base64
+import io
+import json
+import logging
+import math
+import os
+import struct
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+POSTER_SIZE = 640          # final poster edge in pixels (square)
+SUPERSAMPLE = 2            # render at 2x and downscale for anti-aliasing
+MAX_BATCH_PIXELS = 4_000_000
+
+# Warm clay tone used when the mesh carries no material colour
+DEFAULT_COLOR = (0.82, 0.72, 0.58)
+LIGHT_DIR = np.array([-0.4, 0.6, 0.7], dtype=np.float64)
+AMBIENT = 0.28
+
+SUPPORTED_EXTENSIONS = ('.gltf', '.glb', '.obj')
+
+_COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+_TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT4': 16}
+
+
+class MeshError(ValueError):
+    """Raised when a model file cannot be turned into a triangle mesh."""
+
+
+# ---------- Mesh loading ----------
+
+def _node_matrix(node):
+    if 'matrix' in node:
+        return np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T
+
+    t = np.eye(4)
+    t[:3, 3] = node.get('translation', [0, 0, 0])
+
+    x, y, z, w = node.get('rotation', [0, 0, 0, 1])
+    r = np.eye(4)
+    r[:3, :3] = [
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ]
+
+    s = np.diag(list(node.get('scale', [1, 1, 1])) + [1])
+    return t @ r @ s
+
+
+def _read_accessor(gltf, buffers, index):
+    accessor = gltf['accessors'][index]
+    dtype = np.dtype(_COMPONENT_DTYPES[accessor['componentType']]).newbyteorder('<')
+    width = _TYPE_SIZES[accessor['type']]
+    count = accessor['count']
+
+    if 'bufferView' not in accessor:
+        return np.zeros((count, width), dtype=dtype)
+
+    view = gltf['bufferViews'][accessor['bufferView']]
+    data = buffers[view['buffer']]
+    offset = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+    item_size = dtype.itemsize * width
+    stride = view.get('byteStride') or item_size
+
+    if stride == item_size:
+        out = np.frombuffer(data, dtype=dtype, count=count * width, offset=offset)
+        return out.reshape(count, width)
+
+    rows = np.lib.stride_tricks.as_strided(
+        np.frombuffer(data, dtype=np.uint8, offset=offset),
+        shape=(count, item_size),
+        strides=(stride, 1),
+    )
+    return np.ascontiguousarray(rows).view(dtype).reshape(count, width)
+
+
+def _load_buffers(gltf, base_dir, glb_chunk=None):
+    buffers = []
+    for i, buf in enumerate(gltf.get('buffers', [])):
+        uri = buf.get('uri')
+        if uri is None:
+            if glb_chunk is None or i != 0:
+                raise MeshError("Buffer without URI outside of a GLB container")
+            buffers.append(glb_chunk)
+        elif uri.startswith('data:'):
+            buffers.append(base64.b64decode(uri.split(',', 1)[1]))
+        else:
+            if base_dir is None:
+                raise MeshError(f"External buffer '{uri}' cannot be resolved")
+            path = os.path.normpath(os.path.join(base_dir, uri))
+            if not path.startswith(os.path.normpath(base_dir) + os.sep):
+                raise MeshError(f"External buffer '{uri}' escapes the model directory")
+            with open(path, 'rb') as fh:
+                buffers.append(fh.read())
+    return buffers
+
+
+def _gltf_mesh(gltf, buffers):
+    vertices, faces, colors = [], [], []
+    offset = 0
+
+    def visit(node_index, parent):
+        nonlocal offset
+        node = gltf['nodes'][node_index]
+        matrix = parent @ _node_matrix(node)
+
+        if 'mesh' in node:
+            for prim in gltf['meshes'][node['mesh']].get('primitives', []):
+                if prim.get('mode', 4) != 4 or 'POSITION' not in prim.get('attributes', {}):
+                    continue
+                pos = _read_accessor(gltf, buffers, prim['attributes']['POSITION']).astype(np.float64)
+                pos = pos @ matrix[:3, :3].T + matrix[:3, 3]
+
+                if 'indices' in prim:
+                    idx = _read_accessor(gltf, buffers, prim['indices']).astype(np.int64).ravel()
+                else:
+                    idx = np.arange(len(pos), dtype=np.int64)
+                tris = idx[: len(idx) - len(idx) % 3].reshape(-1, 3)
+
+                color = DEFAULT_COLOR
+                material = prim.get('material')
+                if material is not None:
+                    pbr = gltf['materials'][material].get('pbrMetallicRoughness', {})
+                    if 'baseColorFactor' in pbr and 'baseColorTexture' not in pbr:
+                        color = tuple(pbr['baseColorFactor'][:3])
+
+                vertices.append(pos)
+                faces.append(tris + offset)
+                colors.append(np.tile(color, (len(tris), 1)))
+                offset += len(pos)
+
+        for child in node.get('children', []):
+            visit(child, matrix)
+
+    scenes = gltf.get('scenes') or [{'nodes': list(range(len(gltf.get('nodes', []))))}]
+    scene = scenes[gltf.get('scene', 0)]
+    for root in scene.get('nodes', []):
+        visit(root, np.eye(4))
+
+    if not faces:
+        raise MeshError("Model contains no triangle geometry")
+    return np.vstack(vertices), np.vstack(faces), np.vstack(colors)
+
+
+def _load_gltf(data, base_dir):
+    gltf = json.loads(data.decode('utf-8'))
+    return _gltf_mesh(gltf, _load_buffers(gltf, base_dir))
+
+
+def _load_glb(data, base_dir):
+    magic, version, length = struct.unpack_from('<4sII', data, 0)
+    if magic != b'glTF' or version != 2:
+        raise MeshError("Not a glTF 2.0 binary file")
+
+    gltf, bin_chunk = None, None
+    pos = 12
+    while pos < min(length, len(data)):
+        chunk_len, chunk_type = struct.unpack_from('<II', data, pos)
+        chunk = data[pos + 8: pos + 8 + chunk_len]
+        if chunk_type == 0x4E4F534A:    # JSON
+            gltf = json.loads(chunk.decode('utf-8'))
+        elif chunk_type == 0x004E4942:  # BIN
+            bin_chunk = bytes(chunk)
+        pos += 8 + chunk_len
+
+    if gltf is None:
+        raise MeshError("GLB file has no JSON chunk")
+    return _gltf_mesh(gltf, _load_buffers(gltf, base_dir, bin_chunk))
+
+
+def _load_obj(data, base_dir):
+    vertices, faces = [], []
+    for line in data.decode('utf-8', errors='ignore').splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == 'v' and len(parts) >= 4:
+            vertices.append([float(p) for p in parts[1:4]])
+        elif parts[0] == 'f' and len(parts) >= 4:
+            idx = []
+            for p in parts[1:]:
+                i = int(p.split('/')[0])
+                idx.append(i - 1 if i > 0 else len(vertices) + i)
+            # Fan-triangulate polygons
+            for k in range(1, len(idx) - 1):
+                faces.append([idx[0], idx[k], idx[k + 1]])
+
+    if not faces:
+        raise MeshError("Model contains no triangle geometry")
+    faces = np.array(faces, dtype=np.int64)
+    return (
+        np.array(vertices, dtype=np.float64),
+        faces,
+        np.tile(DEFAULT_COLOR, (len(faces), 1)),
+    )
+
+
+_LOADERS = {'.gltf': _load_gltf, '.glb': _load_glb, '.obj': _load_obj}
+
+
+def load_mesh(data, name, base_dir=None):
+    """
+    Parse model bytes into ``(vertices, faces, face_colors)`` arrays.
+
+    ``base_dir`` is used to resolve external ``.bin`` buffers of ``.gltf``
+    files; pass ``None`` when the file does not live on local disk.
+    """
+    ext = os.path.splitext(name)[1].lower()
+    loader = _LOADERS.get(ext)
+    if loader is None:
+        raise MeshError(f"Unsupported model format '{ext}'")
+    try:
+        vertices, faces, colors = loader(data, base_dir)
+    except MeshError:
+        raise
+    except (KeyError, IndexError, ValueError, struct.error, OSError) as exc:
+        raise MeshError(f"Could not parse model: {exc}") from exc
+
+    if len(vertices) == 0 or faces.max() >= len(vertices) or faces.min() < 0:
+        raise MeshError("Model has out-of-range face indices")
+    return vertices, faces, colors
+
+
+# ---------- Rasterization ----------
+
+def _camera_rotation(yaw_deg=-35.0, pitch_deg=20.0):
+    yaw, pitch = math.radians(yaw_deg), math.radians(pitch_deg)
+    ry = np.array([
+        [math.cos(yaw), 0, math.sin(yaw)],
+        [0, 1, 0],
+        [-math.sin(yaw), 0, math.cos(yaw)],
+    ])
+    rx = np.array([
+        [1, 0, 0],
+        [0, math.cos(pitch), -math.sin(pitch)],
+        [0, math.sin(pitch), math.cos(pitch)],
+    ])
+    return rx @ ry
+
+
+def _rasterize(tri, shade, size):
+    """
+    Z-buffer rasterization of screen-space triangles.
+
+    ``tri`` is (M, 3, 3) with x/y in pixels and z as depth (smaller is
+    nearer); ``shade`` is (M, 3) RGB in 0..1. Triangles are bucketed by
+    bounding-box extent so that each bucket is evaluated as one vectorised
+    batch of candidate pixels.
+    """
+    zbuf = np.full(size * size, np.inf)
+    color = np.zeros((size * size, 3))
+
+    xy = tri[:, :, :2]
+    lo = np.clip(np.floor(xy.min(axis=1)).astype(np.int64), 0, size - 1)
+    hi = np.clip(np.ceil(xy.max(axis=1)).astype(np.int64), 0, size - 1)
+    extent = (hi - lo).max(axis=1) + 1
+
+    # Drop triangles fully outside the frame or degenerate in screen space
+    x0, y0 = tri[:, 0, 0], tri[:, 0, 1]
+    area = (tri[:, 1, 0] - x0) * (tri[:, 2, 1] - y0) - (tri[:, 2, 0] - x0) * (tri[:, 1, 1] - y0)
+    visible = np.abs(area) > 1e-12
+
+    prev = 0
+    bucket = 1
+    while prev < size:
+        sel = np.nonzero(visible & (extent > prev) & (extent <= bucket))[0]
+        step = max(1, MAX_BATCH_PIXELS // (bucket * bucket))
+        for start in range(0, len(sel), step):
+            _raster_batch(tri, shade, lo, area, sel[start:start + step], bucket, size, zbuf, color)
+        prev, bucket = bucket, bucket * 2
+
+    return zbuf.reshape(size, size), color.reshape(size, size, 3)
+
+
+def _raster_batch(tri, shade, lo, area, sel, bucket, size, zbuf, color):
+    t = tri[sel]
+    offs = np.arange(bucket)
+    px = lo[sel, 0][:, None, None] + offs[None, None, :]
+    py = lo[sel, 1][:, None, None] + offs[None, :, None]
+    px, py = np.broadcast_arrays(px, py)
+    cx, cy = px + 0.5, py + 0.5
+
+    a = area[sel][:, None, None]
+    ax, ay = t[:, 0, 0, None, None], t[:, 0, 1, None, None]
+    bx, by = t[:, 1, 0, None, None], t[:, 1, 1, None, None]
+    qx, qy = t[:, 2, 0, None, None], t[:, 2, 1, None, None]
+
+    w0 = ((bx - cx) * (qy - cy) - (qx - cx) * (by - cy)) / a
+    w1 = ((qx - cx) * (ay - cy) - (ax - cx) * (qy - cy)) / a
+    w2 = 1.0 - w0 - w1
+
+    inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0) & (px < size) & (py < size)
+    if not inside.any():
+        return
+
+    z = w0 * t[:, 0, 2, None, None] + w1 * t[:, 1, 2, None, None] + w2 * t[:, 2, 2, None, None]
+    face = np.broadcast_to(np.arange(len(sel))[:, None, None], inside.shape)
+
+    pix = (py * size + px)[inside]
+    z = z[inside]
+    face = face[inside]
+
+    # Keep the nearest fragment per pixel, then merge into the z-buffer
+    order = np.lexsort((z, pix))
+    pix, z, face = pix[order], z[order], face[order]
+    first = np.ones(len(pix), dtype=bool)
+    first[1:] = pix[1:] != pix[:-1]
+    pix, z, face = pix[first], z[first], face[first]
+
+    closer = z < zbuf[pix]
+    zbuf[pix[closer]] = z[closer]
+    color[pix[closer]] = shade[sel[face[closer]]]
+
+
+def render_mesh(vertices, faces, face_colors, size=POSTER_SIZE):
+    """Render a mesh to an RGBA PIL image with a transparent background."""
+    center = (vertices.min(axis=0) + vertices.max(axis=0)) / 2.0
+    v = (vertices - center) @ _camera_rotation().T
+    radius = np.sqrt((v ** 2).sum(axis=1)).max() or 1.0
+
+    full = size * SUPERSAMPLE
+    scale = full / (2.0 * radius * 1.08)
+    screen = np.empty_like(v)
+    screen[:, 0] = v[:, 0] * scale + full / 2.0
+    screen[:, 1] = full / 2.0 - v[:, 1] * scale
+    screen[:, 2] = -v[:, 2]  # camera looks down -z; nearer is smaller
+
+    tri = screen[faces]
+    world = v[faces]
+    normals = np.cross(world[:, 1] - world[:, 0], world[:, 2] - world[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1.0
+    normals /= lengths[:, None]
+
+    light = LIGHT_DIR / np.linalg.norm(LIGHT_DIR)
+    diffuse = np.abs(normals @ light)  # treat all faces as double sided
+    intensity = AMBIENT + (1.0 - AMBIENT) * diffuse
+    shade = np.clip(face_colors * intensity[:, None], 0.0, 1.0)
+
+    zbuf, rgb = _rasterize(tri, shade, full)
+
+    alpha = np.isfinite(zbuf).astype(np.uint8) * 255
+    rgba = np.dstack([(rgb * 255).astype(np.uint8), alpha])
+    image = Image.fromarray(rgba, 'RGBA')
+    if SUPERSAMPLE > 1:
+        image = image.resize((size, size), Image.LANCZOS)
+    return image
+
+
+def render_poster(field_file, size=POSTER_SIZE):
+    """
+    Render a poster for a ``FileField`` value and return PNG bytes.
+
+    Raises ``MeshError`` if the file cannot be parsed.
+    """
+    try:
+        base_dir = os.path.dirname(field_file.path)
+    except NotImplementedError:
+        base_dir = None
+
+    field_file.open('rb')
+    try:
+        data = field_file.read()
+    finally:
+        field_file.close()
+
+    vertices, faces, colors = load_mesh(data, field_file.name, base_dir)
+    image = render_mesh(vertices, faces, colors, size=size)
+
+    out = io.BytesIO()
+    image.save(out, format='PNG', optimize=True)
+    return out.getvalue()
@@ -0,0 +1,310 @@
+"""
+Keep public pages up while the database is locked or slow.
+
+SQLite allows one writer at a time; during a long write (bulk admin
+actions, imports) other connections wait up to the lock timeout and then
+fail with ``OperationalError``, and every worker stuck waiting is one that
+cannot serve anything else. Two pieces deal with that:
+
+``serve_stale`` (a view decorator) keeps the last good rendering of public
+read pages for anonymous visitors. A fresh copy is served as-is; an older
+one is served immediately while a single background job re-renders it, and
+stays in place if that job fails on the database; any other failure (the
+object was deleted, the view raised) drops it. Pages are keyed on their
+path plus the query parameters the view declares, normalized, so arbitrary
+query strings all share one entry. Cached pages carry a placeholder instead
+of a CSRF token, which is filled in per visitor when the page is served.
+
+``db_breaker`` counts database failures across all workers (through the
+shared cache). After ``FAILURE_THRESHOLD`` failures within
+``FAILURE_WINDOW`` seconds it opens for ``COOLDOWN`` seconds: reads get
+stale pages without touching the database, and ``DatabaseBreakerMiddleware``
+answers writes with 503 and a ``Retry-After`` instead of letting them queue
+for the lock. After the cool-down one request is let through as a probe;
+its success closes the breaker, its failure opens it again.
+"""
+import functools
+import logging
+import math
+import re
+import time
+from urllib.parse import urlencode, urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib import messages
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db import OperationalError
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse, QueryDict
+from django.middleware.csrf import get_token
+from django.utils import translation
+from django.utils.translation import gettext
+
+from .tasks import enqueue
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 5
+FAILURE_WINDOW = 30
+COOLDOWN = 15
+
+FRESH_FOR = 30
+KEEP_FOR = 60 * 60 * 24
+REFRESH_LOCK_TIMEOUT = 60
+
+CSRF_INPUT = re.compile(r'(<input type="hidden" name="csrfmiddlewaretoken" value=")[^"]*(">)')
+CSRF_PLACEHOLDER = "__csrf_token__"
+
+UNSAFE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class CircuitBreaker:
+    """Failure counter and open/half-open state kept in the shared cache."""
+
+    def __init__(self, name, threshold=FAILURE_THRESHOLD, window=FAILURE_WINDOW, cooldown=COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+
+    def _key(self, part):
+        return f"breaker:{self.name}:{part}"
+
+    def retry_after(self):
+        """Seconds until the breaker closes (0 if requests may proceed).
+        Once the cool-down is over, the first caller gets 0 as the probe."""
+        open_until = cache.get(self._key("open-until"))
+        if open_until is None:
+            return 0
+        remaining = open_until - time.time()
+        if remaining > 0:
+            return math.ceil(remaining)
+        if cache.add(self._key("probe"), 1, self.cooldown):
+            return 0
+        return self.cooldown
+
+    def record_failure(self):
+        half_open = cache.get(self._key("open-until")) is not None
+        key = self._key(f"failures:{int(time.time() // self.window)}")
+        cache.add(key, 0, self.window * 2)
+        try:
+            failures = cache.incr(key)
+        except ValueError:
+            failures = 1
+        if half_open or failures >= self.threshold:
+            cache.set(self._key("open-until"), time.time() + self.cooldown, None)
+            cache.delete(self._key("probe"))
+            logger.warning("Circuit breaker %s opened for %ss", self.name, self.cooldown)
+
+    def record_success(self):
+        if cache.get(self._key("open-until")) is not None:
+            cache.delete_many([self._key("open-until"), self._key("probe")])
+            logger.info("Circuit breaker %s closed", self.name)
+
+
+db_breaker = CircuitBreaker("db")
+
+
+def unavailable(request, retry_after):
+    """503 telling the client to retry shortly."""
+    message = gettext("The archive is busy right now. Please try again in a few seconds.")
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        response = JsonResponse({"success": False, "message": message}, status=503)
+    else:
+        response = HttpResponse(message, status=503, content_type="text/plain; charset=utf-8")
+    response["Retry-After"] = str(max(retry_after, 1))
+    return response
+
+
+class DatabaseBreakerMiddleware:
+    """Turn writes away while the breaker is open and count database
+    failures from any view. Place it before SessionMiddleware so rejected
+    requests never touch the session table."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method in UNSAFE_METHODS:
+            retry_after = db_breaker.retry_after()
+            if retry_after:
+                return unavailable(request, retry_after)
+            response = self.get_response(request)
+            if response.status_code < 500:
+                db_breaker.record_success()
+            return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.method in UNSAFE_METHODS:
+            retry_after = await sync_to_async(db_breaker.retry_after)()
+            if retry_after:
+                return unavailable(request, retry_after)
+            response = await self.get_response(request)
+            if response.status_code < 500:
+                await sync_to_async(db_breaker.record_success)()
+            return response
+        return await self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, OperationalError):
+            db_breaker.record_failure()
+            return unavailable(request, db_breaker.cooldown)
+        return None
+
+
+# ---------- Stale-while-revalidate pages ----------
+
+def _page_query(query, params):
+    """Canonical query string for the ``params`` of ``query`` (a QueryDict):
+    first value of each, whitespace collapsed, empty ones left out, sorted."""
+    pairs = []
+    for name in sorted(params):
+        value = " ".join(query.get(name, "").split())
+        if value:
+            pairs.append((name, value))
+    return urlencode(pairs)
+
+
+def _page_key(language, full_path):
+    return f"page:{language}:{full_path}"
+
+
+def forget_page(language, full_path):
+    """Drop the stored rendering of a page so the next request renders it.
+    ``full_path`` should only carry parameters its view is keyed on."""
+    parts = urlsplit(full_path)
+    query = QueryDict(parts.query)
+    query = _page_query(query, query.keys())
+    cache.delete(_page_key(language, f"{parts.path}?{query}" if query else parts.path))
+
+
+def _canonical(request, params):
+    """Reduce ``request``'s query string to its canonical ``params`` so the
+    rendering (pagination links, echoed search, ``next``) matches its key."""
+    query = _page_query(request.GET, params)
+    request.GET = QueryDict(query)
+    request.META["QUERY_STRING"] = query
+
+
+def _store(key, response):
+    content = CSRF_INPUT.sub(rf"\g<1>{CSRF_PLACEHOLDER}\g<2>", response.content.decode(response.charset))
+    cache.set(key, {
+        "content": content,
+        "content_type": response["Content-Type"],
+        "stored_at": time.time(),
+    }, KEEP_FOR)
+
+
+def _serve(request, page):
+    response = HttpResponse(
+        page["content"].replace(CSRF_PLACEHOLDER, get_token(request)),
+        content_type=page["content_type"],
+    )
+    response["Age"] = str(int(time.time() - page["stored_at"]))
+    return response
+
+
+def _cacheable(request):
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
+
+def _anonymous_copy(request):
+    """A bare anonymous GET request equivalent to ``request`` for rendering
+    the page outside the request cycle."""
+    clone = HttpRequest()
+    clone.method = "GET"
+    clone.path = request.path
+    clone.path_info = request.path_info
+    clone.META = {
+        name: value for name, value in request.META.items()
+        if isinstance(value, str) and name not in ("HTTP_COOKIE", "CSRF_COOKIE")
+    }
+    clone.GET = request.GET.copy()
+    clone.user = AnonymousUser()
+    clone.LANGUAGE_CODE = request.LANGUAGE_CODE
+    clone.resolver_match = request.resolver_match
+    return clone
+
+
+def _render(view, request, args, kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, "render") and callable(response.render):
+        response = response.render()
+    return response
+
+
+def _refresh(view, key, request, args, kwargs):
+    try:
+        with translation.override(request.LANGUAGE_CODE):
+            response = _render(view, request, args, kwargs)
+    except OperationalError:
+        db_breaker.record_failure()
+        logger.warning("Background refresh of %s failed on the database", key)
+    except (Http404, PermissionDenied):
+        cache.delete(key)
+    except Exception:
+        cache.delete(key)
+        logger.exception("Background refresh of %s failed; dropped the stored page", key)
+    else:
+        db_breaker.record_success()
+        if response.status_code == 200:
+            _store(key, response)
+        else:
+            cache.delete(key)
+    finally:
+        cache.delete(f"{key}:refreshing")
+
+
+def serve_stale(fresh_for=FRESH_FOR, params=()):
+    """Serve anonymous GETs of a read view from its last good rendering,
+    re-rendering in the background once it is older than ``fresh_for``
+    seconds and falling back to it when the database is unavailable.
+    ``params`` names the query parameters the view reads; others are
+    dropped from the request before rendering."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+
+            _canonical(request, params)
+            key = _page_key(request.LANGUAGE_CODE, request.get_full_path())
+            page = cache.get(key)
+            if page is not None and time.time() - page["stored_at"] < fresh_for:
+                return _serve(request, page)
+
+            retry_after = db_breaker.retry_after()
+            if page is not None:
+                if not retry_after and cache.add(f"{key}:refreshing", 1, REFRESH_LOCK_TIMEOUT):
+                    enqueue(_refresh, view, key, _anonymous_copy(request), args, kwargs)
+                return _serve(request, page)
+            if retry_after:
+                return unavailable(request, retry_after)
+
+            try:
+                response = _render(view, request, args, kwargs)
+            except OperationalError:
+                db_breaker.record_failure()
+                return unavailable(request, db_breaker.cooldown)
+            db_breaker.record_success()
+            if response.status_code == 200:
+                _store(key, response)
+            return response
+
+        return wrapper
+
+    return decorator
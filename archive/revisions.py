@@ -0,0 +1,239 @@
+"""
+Revision history of HeritageObjects.
+
+Every change to an object's fields is a HeritageRevision, numbered per
+object. Most revisions are deltas holding only the fields that changed
+(as JSON: text, ISO dates, stored file names). The first revision and
+every ``SNAPSHOT_EVERY``-th one are snapshots of all tracked fields
+instead, so rebuilding any version reads one snapshot and fewer than
+``SNAPSHOT_EVERY`` deltas from a single index range, however long the
+history is.
+
+``record()`` compares objects as stored with their latest revision
+(rebuilt for a whole chunk of objects in one query) and writes a
+revision only for objects whose tracked fields changed, so calling it
+after a write that changed nothing costs nothing. The post_save signal
+calls it, and so do the bulk paths that skip signals: inline edits and
+applied proposals (archive/proposals.py), imports, publishing,
+snapshot loading and images rewritten by the media checks. Two writers racing for the same revision number keep
+one revision; the other change is folded into the next one.
+
+``state()``, ``as_of()`` and ``diff()`` read history. ``compact()``
+folds the revisions older than a cutoff into one snapshot per object,
+and drops the history of objects deleted before it, in chunked
+transactions; times before the cutoff then read as that snapshot.
+
+Only field values are kept: media files named by old revisions may
+have been deleted since (archive/storage.py counts live rows only).
+"""
+from datetime import date, datetime
+
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import HeritageObject, HeritageRevision, HeritageTombstone
+
+SNAPSHOT_EVERY = 20
+CHUNK_SIZE = 500
+
+
+def tracked_fields(object_model=HeritageObject):
+    """The fields whose history is kept."""
+    return [
+        f for f in object_model._meta.concrete_fields
+        if f.editable and not f.primary_key and not getattr(f, "auto_now", False)
+    ]
+
+
+def values(obj, fields=None):
+    """JSON-ready values of the tracked fields of ``obj``."""
+    result = {}
+    for field in fields or tracked_fields(type(obj)):
+        value = field.value_from_object(obj)
+        if isinstance(field, models.FileField):
+            value = value.name or None if value else None
+        elif isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        result[field.name] = value
+    return result
+
+
+def _fold(revisions):
+    state = None
+    for revision in revisions:
+        if revision.kind == HeritageRevision.SNAPSHOT:
+            state = dict(revision.data)
+        elif state is not None:
+            state.update(revision.data)
+    return state
+
+
+def _from_last_snapshot(revision_model, **filters):
+    """Revisions from each object's last snapshot on, within ``filters``."""
+    within = {name: value for name, value in filters.items() if name != "object_id"}
+    last_snapshot = (
+        revision_model.objects.filter(
+            object_id=OuterRef("object_id"), kind=HeritageRevision.SNAPSHOT, **within
+        )
+        .order_by("-number")
+        .values("number")[:1]
+    )
+    return (
+        revision_model.objects.filter(number__gte=Subquery(last_snapshot), **filters)
+        .order_by("object_id", "number")
+    )
+
+
+def _heads(pks, revision_model):
+    """{object id: (latest number, state)} for the given objects."""
+    grouped = {}
+    for revision in _from_last_snapshot(revision_model).filter(object_id__in=pks):
+        grouped.setdefault(revision.object_id, []).append(revision)
+    return {pk: (revisions[-1].number, _fold(revisions)) for pk, revisions in grouped.items()}
+
+
+# ---------- Recording ----------
+
+def record(*pks, user=None, source="", new=False, object_model=HeritageObject,
+           revision_model=HeritageRevision, chunk_size=CHUNK_SIZE):
+    """Record a revision for each of these objects that changed since its
+    last one; ``new`` objects start a fresh history (SQLite may reuse the
+    id of a deleted object). Returns the number of revisions written."""
+    pks = sorted({pk for pk in pks if pk is not None})
+    fields = tracked_fields(object_model)
+    written = 0
+    for start in range(0, len(pks), chunk_size):
+        chunk = pks[start:start + chunk_size]
+        if new:
+            revision_model.objects.filter(object_id__in=chunk).delete()
+        heads = _heads(chunk, revision_model)
+        now = timezone.now()
+        revisions = []
+        for obj in object_model.objects.filter(pk__in=chunk).only(*(f.name for f in fields)):
+            current = values(obj, fields)
+            number, state = heads.get(obj.pk, (0, None))
+            number += 1
+            if state is None or (number - 1) % SNAPSHOT_EVERY == 0:
+                if current == state:
+                    continue
+                kind, data = HeritageRevision.SNAPSHOT, current
+            else:
+                data = {name: value for name, value in current.items() if state.get(name) != value}
+                if not data:
+                    continue
+                kind = HeritageRevision.DELTA
+            revisions.append(revision_model(
+                object_id=obj.pk, number=number, kind=kind, data=data,
+                user=user, source=source, created_at=now,
+            ))
+        revision_model.objects.bulk_create(revisions, ignore_conflicts=True)
+        written += len(revisions)
+    return written
+
+
+def baseline(object_model=HeritageObject, revision_model=HeritageRevision, chunk_size=CHUNK_SIZE):
+    """Snapshot every object that has no history yet."""
+    pks = (
+        object_model.objects.exclude(pk__in=revision_model.objects.values("object_id"))
+        .order_by("pk").values_list("pk", flat=True)
+    )
+    return record(*pks, source="baseline", object_model=object_model,
+                  revision_model=revision_model, chunk_size=chunk_size)
+
+
+# ---------- Reading ----------
+
+def state(pk, number=None):
+    """The tracked values of object ``pk`` at revision ``number`` (the
+    latest by default), or None if it has no such revision."""
+    filters = {"object_id": pk}
+    if number is not None:
+        filters["number__lte"] = number
+    return _fold(_from_last_snapshot(HeritageRevision, **filters))
+
+
+def as_of(pk, when):
+    """Object ``pk`` as it was at ``when``: an unsaved HeritageObject, or
+    None if it did not exist then."""
+    if HeritageTombstone.objects.filter(object_id=pk, deleted_at__lte=when).exists():
+        return None
+    number = (
+        HeritageRevision.objects.filter(object_id=pk, created_at__lte=when)
+        .order_by("-number").values_list("number", flat=True).first()
+    )
+    if number is None:
+        return None
+    fields = {field.name: field for field in tracked_fields()}
+    data = state(pk, number)
+    return HeritageObject(pk=pk, **{
+        name: fields[name].to_python(value) if not isinstance(fields[name], models.FileField) else value
+        for name, value in data.items() if name in fields
+    })
+
+
+def diff(pk, old, new):
+    """{field: (value at ``old``, value at ``new``)} for the fields that
+    differ between two revisions of object ``pk``. Reads the range from
+    the snapshot before ``old`` to ``new`` once, folding it as it goes."""
+    low, high = sorted((old, new))
+    revisions = list(_from_last_snapshot(HeritageRevision, object_id=pk, number__lte=low))
+    revisions += list(HeritageRevision.objects.filter(object_id=pk, number__gt=low, number__lte=high)
+                      .order_by("number"))
+    before = _fold(r for r in revisions if r.number <= low) or {}
+    after = _fold(revisions) or {}
+    if old > new:
+        before, after = after, before
+    return {
+        name: (before.get(name), after.get(name))
+        for name in sorted(set(before) | set(after))
+        if before.get(name) != after.get(name)
+    }
+
+
+# ---------- Compaction ----------
+
+def compact(before, chunk_size=CHUNK_SIZE):
+    """Fold revisions older than ``before`` into one snapshot per object.
+    Returns (objects compacted, revisions removed)."""
+    deleted = HeritageTombstone.objects.filter(deleted_at__lt=before).values("object_id")
+    pks = list(
+        HeritageRevision.objects.filter(models.Q(created_at__lt=before) | models.Q(object_id__in=deleted))
+        .order_by("object_id").values_list("object_id", flat=True).distinct()
+    )
+    compacted = removed = 0
+    for start in range(0, len(pks), chunk_size):
+        chunk = pks[start:start + chunk_size]
+        with transaction.atomic():
+            gone = set(
+                HeritageTombstone.objects.filter(object_id__in=chunk, deleted_at__lt=before)
+                .values_list("object_id", flat=True)
+            ) - set(HeritageObject.objects.filter(pk__in=chunk).values_list("pk", flat=True))
+            if gone:
+                removed += HeritageRevision.objects.filter(object_id__in=gone).delete()[0]
+
+            grouped = {}
+            old = HeritageRevision.objects.filter(
+                object_id__in=[pk for pk in chunk if pk not in gone], created_at__lt=before
+            ).order_by("object_id", "number")
+            for revision in old:
+                grouped.setdefault(revision.object_id, []).append(revision)
+
+            folded, dropped = [], []
+            for revisions in grouped.values():
+                if len(revisions) == 1 and revisions[0].kind == HeritageRevision.SNAPSHOT:
+                    continue
+                data = _fold(revisions)
+                if data is None:
+                    continue  # history that never had a snapshot
+                last = revisions[-1]
+                last.data = data
+                last.kind = HeritageRevision.SNAPSHOT
+                last.created_at = revisions[0].created_at
+                folded.append(last)
+                dropped += [revision.pk for revision in revisions[:-1]]
+            if dropped:
+                removed += HeritageRevision.objects.filter(pk__in=dropped).delete()[0]
+            HeritageRevision.objects.bulk_update(folded, ["data", "kind", "created_at"])
+            compacted += len(folded)
+    return compacted, removed
@@ -0,0 +1,306 @@
+"""
+Media file serving with HTTP caching and partial-content support.
+
+Django's ``django.views.static.serve`` is development-only: it has no Range
+support, no strong validators and no compression. 3D models are tens of MB,
+so this view adds:
+
+- strong ETags derived from a SHA-256 of the file content (taken from the
+  name for content-addressed files, see archive/storage.py),
+- ``If-None-Match`` / ``If-Modified-Since`` / ``If-Range`` handling,
+- single ``Range: bytes=`` requests (206 / 416),
+- precompressed ``.br`` / ``.gz`` siblings for text formats such as
+  ``.gltf`` and ``.obj`` (see the ``compress_media`` command).
+
+Uploads are served from the site's origin, so only image and 3D model
+types the site displays itself are served inline; anything else (an
+uploaded ``.html`` or ``.svg``) is a download. Every response carries
+``X-Content-Type-Options: nosniff`` and a sandboxing CSP, so a file the
+browser does open cannot run script against the site.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import (
+    content_disposition_header,
+    http_date,
+    parse_http_date_safe,
+    quote_etag,
+)
+
+from .storage import hash_from_name
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip siblings are always available
+    brotli = None
+
+mimetypes.add_type("model/gltf+json", ".gltf")
+mimetypes.add_type("model/gltf-binary", ".glb")
+mimetypes.add_type("model/obj", ".obj")
+mimetypes.add_type("model/stl", ".stl")
+mimetypes.add_type("application/ply", ".ply")
+
+# Served inline; every other type is sent as an attachment
+INLINE_TYPES = frozenset({
+    "image/jpeg", "image/png", "image/gif", "image/webp", "image/avif",
+    "model/gltf+json", "model/gltf-binary", "model/obj", "model/stl", "application/ply",
+})
+
+# Text formats that compress well and are worth storing precompressed
+COMPRESSIBLE_EXTENSIONS = (".gltf", ".obj", ".ply", ".svg", ".json", ".txt")
+
+# (content-coding, file suffix) in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+CACHE_CONTROL = "public, max-age=86400"
+# Content-addressed files never change under the same name
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+# ---------- Content hashing ----------
+
+@lru_cache(maxsize=2048)
+def _hash_file(path, size, mtime_ns):
+    """SHA-256 of a file. Size and mtime are part of the cache key so that a
+    replaced file is re-hashed."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_etag(path, stat=None):
+    digest = hash_from_name(os.path.relpath(path, settings.MEDIA_ROOT))
+    if digest is None:
+        stat = stat or os.stat(path)
+        digest = _hash_file(path, stat.st_size, stat.st_mtime_ns)
+    return digest[:32]
+
+
+# ---------- Precompression ----------
+
+def _accepted_encodings(request):
+    header = request.headers.get("Accept-Encoding", "")
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+def _pick_variant(request, path, stat):
+    """Return (path, stat, content_coding) for the best precompressed sibling
+    the client accepts, or the original file."""
+    if not path.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+        return path, stat, None
+    accepted = _accepted_encodings(request)
+    for coding, suffix in ENCODINGS:
+        if coding not in accepted and "*" not in accepted:
+            continue
+        try:
+            sibling = os.stat(path + suffix)
+        except OSError:
+            continue
+        # Ignore siblings left over from an older version of the file
+        if sibling.st_mtime_ns >= stat.st_mtime_ns:
+            return path + suffix, sibling, coding
+    return path, stat, None
+
+
+def precompress(path, force=False):
+    """
+    Write ``.gz`` (and ``.br`` if brotli is installed) siblings next to
+    ``path``. Returns the list of sibling paths that were (re)written.
+    Siblings that turn out larger than the original are removed.
+    """
+    written = []
+    source = os.stat(path)
+    for coding, suffix in ENCODINGS:
+        if coding == "br" and brotli is None:
+            continue
+        target = path + suffix
+        try:
+            if not force and os.stat(target).st_mtime_ns >= source.st_mtime_ns:
+                continue
+        except OSError:
+            pass
+
+        tmp = target + ".tmp"
+        if coding == "gzip":
+            with open(path, "rb") as src, open(tmp, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        else:
+            compressor = brotli.Compressor(quality=11)
+            with open(path, "rb") as src, open(tmp, "wb") as dst:
+                for block in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    dst.write(compressor.process(block))
+                dst.write(compressor.finish())
+
+        if os.path.getsize(tmp) >= source.st_size:
+            os.remove(tmp)
+            if os.path.exists(target):
+                os.remove(target)
+            continue
+        os.replace(tmp, target)
+        written.append(target)
+    return written
+
+
+# ---------- Range handling ----------
+
+def _parse_range(header, size):
+    """Parse a single ``bytes=`` range. Returns (start, end) inclusive, None if
+    the header should be ignored, or False if it is unsatisfiable."""
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None  # multi-range and unknown units: serve the full body
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _range_iterator(path, start, length):
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = fh.read(min(CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.headers.get("If-Range")
+    if value is None:
+        return True
+    value = value.strip()
+    if value.startswith('"'):
+        return value == etag
+    parsed = parse_http_date_safe(value)
+    return parsed is not None and int(last_modified) <= parsed
+
+
+# ---------- View ----------
+
+def serve_media(request, path):
+    """Serve a file below ``MEDIA_ROOT``."""
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except (SuspiciousFileOperation, ValueError):
+        raise Http404("Invalid path")
+    if fullpath.endswith((".gz", ".br", ".tmp")):
+        raise Http404("Not found")
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        raise Http404("Not found")
+    if not os.path.isfile(fullpath):
+        raise Http404("Not found")
+
+    served_path, served_stat, coding = _pick_variant(request, fullpath, stat)
+    etag = content_etag(fullpath, stat)
+    if coding:
+        etag = f"{etag}-{coding}"
+    etag = quote_etag(etag)
+    last_modified = stat.st_mtime
+    content_type = mimetypes.guess_type(fullpath)[0] or "application/octet-stream"
+    as_attachment = content_type not in INLINE_TYPES
+
+    headers = HttpResponse()
+    headers["Content-Disposition"] = content_disposition_header(
+        as_attachment, os.path.basename(fullpath)
+    )
+    headers["X-Content-Type-Options"] = "nosniff"
+    headers["Content-Security-Policy"] = "sandbox"
+    headers["ETag"] = etag
+    headers["Last-Modified"] = http_date(last_modified)
+    headers["Cache-Control"] = (
+        IMMUTABLE_CACHE_CONTROL if hash_from_name(path) else CACHE_CONTROL
+    )
+    headers["Accept-Ranges"] = "bytes"
+    if fullpath.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+        patch_vary_headers(headers, ("Accept-Encoding",))
+
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified), response=headers
+    )
+    if conditional is not headers:
+        return conditional  # 304 Not Modified / 412 Precondition Failed
+
+    size = served_stat.st_size
+    byte_range = None
+    if "Range" in request.headers and _if_range_matches(request, etag, last_modified):
+        byte_range = _parse_range(request.headers["Range"], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _range_iterator(served_path, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+    else:
+        response = FileResponse(
+            open(served_path, "rb"),
+            content_type=content_type,
+            as_attachment=as_attachment,
+            filename=os.path.basename(fullpath),
+        )
+
+    for key, value in headers.items():
+        if key != "Content-Type":
+            response[key] = value
+    if coding:
+        response["Content-Encoding"] = coding
+    if byte_range:
+        start, end = byte_range
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    else:
+        response["Content-Length"] = str(size)
+    return response
@@ -1,9 +1,28 @@
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from allauth.socialaccount.signals import social_account_updated
 from allauth.socialaccount.models import SocialAccount
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from .models import (
+    Comment,
+    CommentLike,
+    HeritageLike,
+    HeritageObject,
+    HeritageTombstone,
+    Submission,
+    UserProfile,
+)
+from . import filter_cache
+from .fragments import bump
+from .object_cache import invalidate
+from .read_model import refresh_cards, refresh_counters
+from .revisions import record as record_revision
+from .media_checks import check_submission_media
+from .publishing import render_posters
+from .storage import release, retain
+from .tasks import enqueue
 
 User = get_user_model()
 
@@ -48,4 +67,192 @@ def update_existing_user_photo(sender, instance, created, **kwargs):
             profile, _ = UserProfile.objects.get_or_create(user=instance.user)
             if profile.profile_photo_url != photo_url:
                 profile.profile_photo_url = photo_url
-                profile.save(update_fields=['profile_photo_url'])
\ No newline at end of file
+                profile.save(update_fields=['profile_photo_url'])
+
+
+# ---------- Media reference counting (see archive/storage.py) ----------
+
+def _file_fields(model):
+    return [f.name for f in model._meta.get_fields() if isinstance(f, models.FileField)]
+
+
+def _file_names(instance, fields):
+    return {name: (getattr(instance, name).name or None) for name in fields}
+
+
+@receiver(pre_save, sender=HeritageObject)
+@receiver(pre_save, sender=Submission)
+def remember_media_names(sender, instance, **kwargs):
+    """Capture the stored file names before the row is overwritten."""
+    fields = _file_fields(sender)
+    before = {}
+    if instance.pk:
+        before = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+    instance._media_before = {name: (before.get(name) or None) for name in fields}
+
+
+@receiver(post_save, sender=HeritageObject)
+@receiver(post_save, sender=Submission)
+def count_media_references(sender, instance, **kwargs):
+    before = getattr(instance, "_media_before", {})
+    after = _file_names(instance, _file_fields(sender))
+    changed = []
+    for name, new in after.items():
+        old = before.get(name)
+        if old != new:
+            retain(new)
+            release(old)
+            changed.append(name)
+    instance._media_before = after
+    instance._media_changed = changed
+
+
+@receiver(post_delete, sender=HeritageObject)
+@receiver(post_delete, sender=Submission)
+def release_media_references(sender, instance, **kwargs):
+    for name in _file_names(instance, _file_fields(sender)).values():
+        release(name)
+
+
+@receiver(post_save, sender=Submission)
+def schedule_media_checks(sender, instance, **kwargs):
+    """Inspect new or replaced submission files in the background."""
+    if getattr(instance, "_media_changed", None):
+        enqueue(check_submission_media, instance.pk)
+
+
+# Registered after the reference counting handlers: render_poster() keeps
+# its own counts in step because it writes the poster with a queryset update.
+
+@receiver(pre_save, sender=HeritageObject)
+def clear_stale_poster(sender, instance, **kwargs):
+    """
+    Drop the rendered poster when the 3D model file is replaced or removed,
+    so that post_save renders a fresh one.
+    """
+    if not instance.pk or not instance.poster:
+        return
+    previous = (
+        HeritageObject.objects.filter(pk=instance.pk)
+        .values_list('model_3d', flat=True)
+        .first()
+    )
+    if (previous or None) != (instance.model_3d.name or None):
+        instance.poster.delete(save=False)
+
+
+@receiver(post_save, sender=HeritageObject)
+def render_model_poster(sender, instance, **kwargs):
+    """
+    Render a poster image in the background for objects that have a 3D
+    model but no poster yet, unless this model already failed to render.
+    """
+    if instance.model_3d and not instance.poster and instance.poster_failed != instance.model_3d.name:
+        enqueue(render_posters, [instance.pk])
+
+
+# ---------- Fragment cache versions (see archive/fragments.py) ----------
+
+@receiver(post_save, sender=HeritageObject)
+@receiver(post_delete, sender=HeritageObject)
+def bump_card_version(sender, instance, **kwargs):
+    bump("card", instance.pk)
+
+
+@receiver(post_save, sender=HeritageLike)
+@receiver(post_delete, sender=HeritageLike)
+def bump_card_version_for_like(sender, instance, **kwargs):
+    bump("card", instance.object_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_version(sender, instance, **kwargs):
+    # The parent shows the reply count
+    bump("comment", instance.pk, instance.parent_id)
+
+
+@receiver(post_save, sender=CommentLike)
+@receiver(post_delete, sender=CommentLike)
+def bump_comment_version_for_like(sender, instance, **kwargs):
+    bump("comment", instance.comment_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=UserProfile)
+def bump_user_version(sender, instance, **kwargs):
+    bump("user", instance.pk if sender is User else instance.user_id)
+
+
+# ---------- Object cache (see archive/object_cache.py) ----------
+
+@receiver(post_save, sender=HeritageObject)
+@receiver(post_delete, sender=HeritageObject)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_cached_row(sender, instance, **kwargs):
+    invalidate(sender, instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    invalidate(UserProfile, instance.user_id)
+
+
+# ---------- Read model (see archive/read_model.py) ----------
+
+@receiver(post_save, sender=HeritageObject)
+def refresh_heritage_cards(sender, instance, **kwargs):
+    refresh_cards(instance.pk)
+
+
+@receiver(post_save, sender=HeritageLike)
+@receiver(post_delete, sender=HeritageLike)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def refresh_card_counters(sender, instance, **kwargs):
+    refresh_counters(instance.object_id)
+
+
+# ---------- Filter result lists (see archive/filter_cache.py) ----------
+
+@receiver(post_save, sender=HeritageObject)
+@receiver(post_delete, sender=HeritageObject)
+def invalidate_filter_results(sender, instance, **kwargs):
+    # After the cards above are rebuilt, and once the change is visible to
+    # other connections, so a list is never recomputed from old rows.
+    transaction.on_commit(filter_cache.invalidate)
+
+
+# ---------- Harvesting tombstones (see archive/harvest.py) ----------
+
+@receiver(post_delete, sender=HeritageObject)
+def record_tombstone(sender, instance, **kwargs):
+    HeritageTombstone.objects.update_or_create(
+        object_id=instance.pk,
+        defaults={
+            "accession_number": instance.accession_number,
+            "record_id": instance.record_id,
+            "deleted_at": timezone.now(),
+        },
+    )
+
+
+@receiver(post_save, sender=HeritageObject)
+def clear_tombstone(sender, instance, created, **kwargs):
+    # SQLite may hand out the id of a deleted last row again
+    if created:
+        HeritageTombstone.objects.filter(object_id=instance.pk).delete()
+
+
+# ---------- Revision history (see archive/revisions.py) ----------
+
+@receiver(post_save, sender=HeritageObject)
+def record_object_revision(sender, instance, created, **kwargs):
+    record_revision(
+        instance.pk,
+        user=getattr(instance, "_revision_user", None),
+        source="create" if created else "save",
+        new=created,
+    )
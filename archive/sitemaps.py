@@ -0,0 +1,148 @@
+"""
+XML sitemaps, so crawlers find every object without walking the list and
+filter pages.
+
+``/sitemap.xml`` is a sitemap index pointing at ``/sitemap-pages.xml``
+(home, list and static pages) and one ``/sitemap-<n>.xml`` section per
+``SECTION_SIZE`` object ids. Every object is listed once per site
+language (``?lang=…``, see QueryLanguageMiddleware) with ``hreflang``
+alternates for the others and its ``updated_at`` as ``lastmod``.
+
+Sections cover fixed id ranges, so a change to an object only touches
+the section its id falls in. Each section is cached with a stamp (row
+count and newest ``updated_at`` in its range, one indexed aggregate): a
+request whose stamp still matches is served from the cache, otherwise
+the section is regenerated by streaming over its rows in chunks while it
+is sent, and stored for the next request.
+"""
+import hashlib
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+
+from .models import HeritageObject
+
+SECTION_SIZE = 1000
+CHUNK_SIZE = 500
+SECTION_TIMEOUT = 60 * 60 * 24 * 7
+INDEX_TIMEOUT = 60 * 5
+
+PAGES = ("home", "heritage-list", "about", "sponsors", "donate")
+CONTENT_TYPE = "application/xml; charset=utf-8"
+
+URLSET = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:xhtml="http://www.w3.org/1999/xhtml">\n'
+)
+
+
+def _languages():
+    return [code for code, _name in settings.LANGUAGES]
+
+
+def _key(request, name):
+    site = hashlib.sha1(request.build_absolute_uri("/").encode()).hexdigest()[:12]
+    return f"sitemap:{site}:{name}"
+
+
+def _w3c(moment):
+    return moment.replace(microsecond=0).isoformat()
+
+
+def _url_entries(request, path, lastmod=None):
+    """One <url> per language for ``path``, each listing all translations."""
+    base = request.build_absolute_uri(path)
+    urls = {language: f"{base}?lang={language}" for language in _languages()}
+    links = "".join(
+        f'<xhtml:link rel="alternate" hreflang="{language}" href={quoteattr(url)}/>'
+        for language, url in urls.items()
+    ) + f'<xhtml:link rel="alternate" hreflang="x-default" href={quoteattr(base)}/>'
+    modified = f"<lastmod>{_w3c(lastmod)}</lastmod>" if lastmod else ""
+    return "".join(f"<url><loc>{escape(url)}</loc>{modified}{links}</url>\n" for url in urls.values())
+
+
+# ---------- Sections ----------
+
+def _section_rows(section):
+    first = section * SECTION_SIZE + 1
+    return HeritageObject.objects.filter(pk__gte=first, pk__lt=first + SECTION_SIZE)
+
+
+def _stamp(section):
+    stats = _section_rows(section).aggregate(n=Count("pk"), lastmod=Max("updated_at"))
+    if not stats["n"]:
+        return None
+    return f"{stats['n']}:{stats['lastmod'].isoformat()}"
+
+
+def _generate(request, section, key, stamp):
+    parts = [URLSET]
+    yield URLSET
+    rows = _section_rows(section).order_by("pk").values_list("pk", "updated_at").iterator(chunk_size=CHUNK_SIZE)
+    for pk, updated_at in rows:
+        entries = _url_entries(request, reverse("heritage-detail", args=[pk]), updated_at)
+        parts.append(entries)
+        yield entries
+    parts.append("</urlset>\n")
+    yield "</urlset>\n"
+    # Only reached when the whole section was sent
+    cache.set(key, {"stamp": stamp, "xml": "".join(parts)}, SECTION_TIMEOUT)
+
+
+def section(request, number: int):
+    stamp = _stamp(number)
+    if stamp is None:
+        raise Http404
+    key = _key(request, f"section:{number}")
+    cached = cache.get(key)
+    if cached is not None and cached["stamp"] == stamp:
+        return HttpResponse(cached["xml"], content_type=CONTENT_TYPE)
+    return StreamingHttpResponse(_generate(request, number, key, stamp), content_type=CONTENT_TYPE)
+
+
+def pages(request):
+    xml = URLSET + "".join(_url_entries(request, reverse(name)) for name in PAGES) + "</urlset>\n"
+    return HttpResponse(xml, content_type=CONTENT_TYPE)
+
+
+# ---------- Index ----------
+
+def index(request):
+    key = _key(request, "index")
+    xml = cache.get(key)
+    if xml is None:
+        sections = (
+            HeritageObject.objects.annotate(section=(F("pk") - 1) / SECTION_SIZE)
+            .values("section")
+            .annotate(lastmod=Max("updated_at"))
+            .order_by("section")
+        )
+        entries = [f"<sitemap><loc>{escape(request.build_absolute_uri(reverse('sitemap-pages')))}</loc></sitemap>\n"]
+        for row in sections:
+            loc = request.build_absolute_uri(reverse("sitemap-section", args=[row["section"]]))
+            entries.append(
+                f"<sitemap><loc>{escape(loc)}</loc>"
+                f"<lastmod>{_w3c(row['lastmod'])}</lastmod></sitemap>\n"
+            )
+        xml = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            + "".join(entries)
+            + "</sitemapindex>\n"
+        )
+        cache.set(key, xml, INDEX_TIMEOUT)
+    return HttpResponse(xml, content_type=CONTENT_TYPE)
+
+
+def robots_txt(request):
+    lines = [
+        "User-agent: *",
+        "Disallow: /admin/",
+        f"Sitemap: {request.build_absolute_uri(reverse('sitemap-index'))}",
+    ]
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; charset=utf-8")
@@ -0,0 +1,294 @@
+"""
+Portable catalog snapshots for offline kiosks and field teams.
+
+A bundle is a zip file with
+
+* ``manifest.json`` — format, ``version`` (the newest change included),
+  ``base_version`` for a delta, counts and the media files it carries;
+* ``objects.jsonl`` — one HeritageObject per line, public catalog fields
+  only (no users, likes, comments, submissions or proposals);
+* ``deleted.json`` — ids deleted since ``base_version`` (deltas only);
+* ``media/<name>`` — the images, thumbnails and posters those objects
+  use, and optionally their 3D models. JPEG/PNG/GLB files are stored
+  as-is; everything else is deflated.
+
+A full bundle holds every object as of its version; a delta holds what
+changed (``updated_at``) or was deleted (tombstones) after its base
+version. The version is read before any row is, and only rows at or
+before it are written, so a change made while a bundle is built is
+picked up by the next delta rather than lost.
+
+``apply_bundle()`` loads a bundle on the receiving side: media first
+(content-addressed names make files that are already there free), then
+objects upserted by id with ``bulk_create(update_conflicts=True)`` in
+chunked transactions, then deletions. A full bundle replaces the catalog,
+so objects it does not contain are deleted; callers can ask for
+confirmation before anything is written. Each applied bundle is recorded
+in ``AppliedSnapshot``; a delta is only applied on top of its base
+version or a later one, and re-applying one is harmless.
+"""
+import io
+import json
+import os
+import shutil
+import zipfile
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+
+from . import filter_cache, object_cache
+from .fragments import bump
+from .importer import import_fields
+from .models import AppliedSnapshot, HeritageObject, HeritageTombstone
+from .read_model import refresh_cards
+from .revisions import record
+from .storage import hash_from_name, release, retain
+
+FORMAT = 1
+CHUNK_SIZE = 1000
+
+MEDIA_FIELDS = ("image", "thumbnail", "poster")
+MODEL_FIELD = "model_3d"
+FILE_FIELDS = (*MEDIA_FIELDS, MODEL_FIELD)
+STORED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".glb", ".zip")
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshot_fields():
+    fields = ["id", *import_fields()]
+    fields.insert(fields.index(MODEL_FIELD) + 1, "poster")
+    return fields
+
+
+def catalog_version():
+    """The time of the newest change to the catalog."""
+    moments = [
+        HeritageObject.objects.aggregate(m=Max("updated_at"))["m"],
+        HeritageTombstone.objects.aggregate(m=Max("deleted_at"))["m"],
+    ]
+    return max((moment for moment in moments if moment is not None), default=EPOCH)
+
+
+def local_version():
+    """The version of the last bundle applied here, or None."""
+    return AppliedSnapshot.objects.values_list("version", flat=True).first()
+
+
+def parse_version(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise SnapshotError(f"Bad version {value!r}")
+    return moment if moment.tzinfo else moment.replace(tzinfo=dt_timezone.utc)
+
+
+def read_manifest(path_or_file):
+    try:
+        with zipfile.ZipFile(path_or_file) as bundle:
+            manifest = json.loads(bundle.read("manifest.json"))
+    except (zipfile.BadZipFile, KeyError, ValueError) as exc:
+        raise SnapshotError(f"Not a catalog snapshot: {exc}")
+    if manifest.get("format") != FORMAT:
+        raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')!r}")
+    return manifest
+
+
+# ---------- Writing ----------
+
+def _zip_info(name):
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def write_bundle(path_or_file, since=None, with_media=True, with_models=False, chunk_size=CHUNK_SIZE):
+    """Write a full bundle, or a delta of the changes after ``since``.
+    Returns the manifest."""
+    since = parse_version(since)
+    version = max(catalog_version(), since or EPOCH)
+    fields = snapshot_fields()
+    media_fields = (*MEDIA_FIELDS, MODEL_FIELD) if with_models else MEDIA_FIELDS
+
+    records = HeritageObject.objects.filter(updated_at__lte=version)
+    deleted = []
+    if since is not None:
+        records = records.filter(updated_at__gt=since)
+        deleted = list(
+            HeritageTombstone.objects.filter(deleted_at__gt=since, deleted_at__lte=version)
+            .order_by("object_id").values_list("object_id", flat=True)
+        )
+
+    manifest = {
+        "format": FORMAT,
+        "version": version.isoformat(),
+        "base_version": since.isoformat() if since else None,
+        "fields": fields,
+        "objects": 0,
+        "deleted": len(deleted),
+        "media": [],
+        "missing_media": [],
+        "with_models": with_models,
+    }
+    media = set()
+    with zipfile.ZipFile(path_or_file, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        with bundle.open("objects.jsonl", "w", force_zip64=True) as fh:
+            rows = records.order_by("pk").values(*fields).iterator(chunk_size=chunk_size)
+            for row in rows:
+                if not with_models:
+                    row[MODEL_FIELD] = None  # the kiosk has no model file to show
+                media.update(row[name] for name in media_fields if row[name])
+                fh.write((json.dumps(row, ensure_ascii=False, default=str) + "\n").encode())
+                manifest["objects"] += 1
+        bundle.writestr("deleted.json", json.dumps(deleted))
+
+        if with_media:
+            for name in sorted(media):
+                if not default_storage.exists(name):
+                    manifest["missing_media"].append(name)
+                    continue
+                with default_storage.open(name) as src, bundle.open(_zip_info(f"media/{name}"), "w", force_zip64=True) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                manifest["media"].append(name)
+        bundle.writestr("manifest.json", json.dumps(manifest, indent=1))
+    return manifest
+
+
+# ---------- Loading ----------
+
+def _store_media(bundle, names):
+    """Save the bundle's media files; returns {bundle name: storage name}."""
+    stored = {}
+    for name in names:
+        if hash_from_name(name) and default_storage.exists(name):
+            stored[name] = name
+            continue
+        with bundle.open(f"media/{name}") as fh:
+            stored[name] = default_storage.save(os.path.basename(name), File(fh, name=os.path.basename(name)))
+        if hash_from_name(name) and stored[name] != name:
+            raise SnapshotError(f"{name} does not match its content hash")
+    return stored
+
+
+def _upsert(rows, stored):
+    fields = {field.name: field for field in HeritageObject._meta.concrete_fields}
+    objs = []
+    for row in rows:
+        values = {}
+        for name, value in row.items():
+            if name not in fields:
+                continue
+            if name in FILE_FIELDS:
+                values[name] = stored.get(value, value) if value else None
+            else:
+                values[name] = fields[name].to_python(value)
+        objs.append(HeritageObject(**values))
+
+    pks = [obj.pk for obj in objs]
+    update_fields = [name for name in snapshot_fields() if name != "id"] + ["updated_at"]
+    with transaction.atomic():
+        # Read the files being replaced in the same transaction that
+        # replaces them, so a concurrent change cannot skew the counts.
+        # release() only deletes a file after the commit.
+        before = {
+            row[0]: row[1:]
+            for row in HeritageObject.objects.filter(pk__in=pks).values_list("pk", *FILE_FIELDS)
+        }
+        HeritageObject.objects.bulk_create(
+            objs, update_conflicts=True, unique_fields=["id"], update_fields=update_fields,
+        )
+        HeritageTombstone.objects.filter(object_id__in=pks).delete()
+        # bulk_create skips the signals that keep media reference counts
+        for obj in objs:
+            old_names = before.get(obj.pk, (None,) * len(FILE_FIELDS))
+            for field, old in zip(FILE_FIELDS, old_names):
+                new = getattr(obj, field).name or None
+                if (old or None) != new:
+                    retain(new)
+                    release(old)
+    record(*pks, source="snapshot")
+    refresh_cards(*pks)
+    bump("card", *pks)
+    object_cache.invalidate(HeritageObject, *pks)
+    return len(objs)
+
+
+def _delete(pks, chunk_size):
+    deleted = 0
+    for start in range(0, len(pks), chunk_size):
+        # QuerySet.delete() sends post_delete per object: media references,
+        # tombstones and caches are handled by the signals.
+        deleted += HeritageObject.objects.filter(pk__in=pks[start:start + chunk_size]).delete()[1].get(
+            HeritageObject._meta.label, 0
+        )
+    return deleted
+
+
+def _bundle_ids(bundle):
+    with bundle.open("objects.jsonl") as fh:
+        return {json.loads(line)["id"] for line in io.TextIOWrapper(fh, encoding="utf-8")}
+
+
+def apply_bundle(path_or_file, chunk_size=CHUNK_SIZE, force=False, on_progress=None, confirm_delete=None):
+    """Load one bundle. Returns the AppliedSnapshot, or None if this
+    installation already has that version.
+
+    Before a full bundle deletes local objects it does not contain,
+    ``confirm_delete(count)`` is called (if given); unless it returns true
+    nothing is written and SnapshotError is raised."""
+    manifest = read_manifest(path_or_file)
+    version = parse_version(manifest["version"])
+    base = parse_version(manifest["base_version"])
+    local = local_version()
+    if local is not None and local >= version and not force:
+        return None
+    if base is not None and (local is None or local < base):
+        raise SnapshotError(
+            f"This delta starts at {base.isoformat()} but the local catalog is at "
+            f"{local.isoformat() if local else 'no snapshot'}; load a full snapshot or the missing deltas first."
+        )
+    on_progress = on_progress or (lambda written: None)
+
+    with zipfile.ZipFile(path_or_file) as bundle:
+        if base is None:
+            # A full snapshot replaces the catalog: drop what it does not have.
+            ids = _bundle_ids(bundle)
+            gone = [pk for pk in HeritageObject.objects.values_list("pk", flat=True).iterator() if pk not in ids]
+            if gone and confirm_delete is not None and not confirm_delete(len(gone)):
+                raise SnapshotError(f"Cancelled; it would delete {len(gone)} local objects.")
+        else:
+            gone = json.loads(bundle.read("deleted.json"))
+        stored = _store_media(bundle, manifest["media"])
+
+        written, chunk = 0, []
+        with bundle.open("objects.jsonl") as fh:
+            for line in io.TextIOWrapper(fh, encoding="utf-8"):
+                chunk.append(json.loads(line))
+                if len(chunk) >= chunk_size:
+                    written += _upsert(chunk, stored)
+                    on_progress(written)
+                    chunk = []
+        if chunk:
+            written += _upsert(chunk, stored)
+            on_progress(written)
+    deleted = _delete(gone, chunk_size)
+    filter_cache.invalidate()
+
+    return AppliedSnapshot.objects.create(
+        version=version,
+        base_version=base,
+        objects_written=written,
+        objects_deleted=deleted,
+    )
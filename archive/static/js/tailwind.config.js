@@ -0,0 +1,55 @@
+// Tailwind theme for Turath3D.
+// Used by the Tailwind CLI in `manage.py build_assets` (module.exports) and,
+// until the bundle is built, by the Play CDN fallback in base.html.
+const turathTailwind = {
+  darkMode: 'class',
+  theme: {
+    extend: {
+      colors: {
+        brand: {
+          navy: "#8B3A2B",
+          gold: "#C9A66B",
+          sand: "#F5E9DA",
+          charcoal: "#1A1A1A",
+          palm: "#2D5A27",
+          mist: "#EFF3F6",
+          // True dark mode colors
+          'dark-bg': "#000000",
+          'dark-surface': "#111111",
+          'dark-elevated': "#1a1a1a",
+          'dark-border': "#ffffff",
+          'dark-text': "#ffffff",
+          'dark-text-secondary': "#cccccc",
+          'dark-gold': "#C9A66B",
+          'dark-navy': "#8B3A2B"
+        }
+      },
+      fontFamily: {
+        sans: ["Inter","system-ui","-apple-system","Segoe UI","Roboto","Ubuntu","Noto Sans","sans-serif"],
+        arabic: ["Noto Kufi Arabic","Inter","sans-serif"]
+      },
+      boxShadow: {
+        soft: "0 8px 24px rgba(10,31,68,0.08)",
+        'soft-dark': "0 8px 24px rgba(0,0,0,0.3)"
+      },
+      borderRadius: {
+        xl2: "1rem"
+      }
+    }
+  }
+};
+
+if (typeof module !== 'undefined' && module.exports) {
+  const path = require('path');
+  const archive = path.join(__dirname, '..', '..');
+  module.exports = {
+    ...turathTailwind,
+    // Templates plus Python code that builds class names (e.g. profile badges)
+    content: [
+      path.join(archive, 'templates', '**', '*.html'),
+      path.join(archive, '**', '*.py'),
+    ],
+  };
+} else {
+  tailwind.config = turathTailwind;
+}
@@ -0,0 +1,217 @@
+"""
+Content-addressed media storage.
+
+Every uploaded file is stored once under its SHA-256
+(``cas/ab/cd/abcd….ext``), whatever model field it was uploaded to, so the
+same photo or model attached to a Submission, the HeritageObject published
+from it and a thumbnail share one file on disk. A ``MediaBlob`` row per
+file keeps a reference count that the model signals maintain; a file is
+removed once nothing points at it anymore.
+
+Counts move inside the writer's transaction, but files are only deleted
+after it commits (a rolled back write keeps its files), with one
+conditional DELETE of the MediaBlob row. Content stored within
+``STORE_GRACE`` is never deleted there: an upload is registered before
+the row that references it is saved, so its count is briefly zero.
+The ``prune_media`` command removes what is left over.
+
+Uploads are hashed while they stream in (see the ``Hashing*UploadHandler``
+classes), so storing them needs no second read pass.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from datetime import timedelta
+from functools import partial
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+CAS_PREFIX = "cas"
+
+_CAS_NAME_RE = re.compile(r"^%s/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]{1,10})?$" % CAS_PREFIX)
+_EXT_RE = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+STORE_GRACE = timedelta(hours=1)
+
+
+def cas_name(digest, original_name):
+    """Storage name for a file with the given SHA-256 hex digest."""
+    ext = os.path.splitext(original_name)[1].lower()
+    if not _EXT_RE.match(ext):
+        ext = ""
+    return f"{CAS_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def hash_from_name(name):
+    """Return the SHA-256 encoded in a content-addressed name, or None."""
+    match = _CAS_NAME_RE.match(name.replace(os.sep, "/")) if name else None
+    return match.group(1) if match else None
+
+
+# ---------- Upload handlers ----------
+
+class HashingMemoryFileUploadHandler(MemoryFileUploadHandler):
+    """Memory upload handler that also computes the file's SHA-256."""
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)  # raises StopFutureHandlers when activated
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.activated:
+            self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self.sha256.hexdigest()
+        return file
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Temporary-file upload handler that also computes the file's SHA-256."""
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self.sha256.hexdigest()
+        return file
+
+
+# ---------- Storage ----------
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names files by content hash and never stores the
+    same content twice. Files saved before this storage was enabled keep
+    their original names and are served as before.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Same name means same bytes, so a concurrent write of an identical
+        # file may safely replace the other one.
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(*args, **kwargs)
+
+    def get_available_name(self, name, max_length=None):
+        # The real name is only known once the content is hashed in _save();
+        # identical names mean identical content, so never add a suffix.
+        return name
+
+    def _save(self, name, content):
+        digest = getattr(content, "content_hash", None)
+        if digest is None:
+            return self._save_hashing(name, content)
+
+        final = cas_name(digest, name)
+        self._register(digest, final, content.size)
+        if not self.exists(final):
+            super()._save(final, content)
+        return final
+
+    def _save_hashing(self, name, content):
+        """Copy ``content`` to a temporary file while hashing it, then move it
+        into place (or drop it if the content is already stored)."""
+        tmp_dir = self.path(os.path.join(CAS_PREFIX, "tmp"))
+        os.makedirs(tmp_dir, exist_ok=True)
+        sha256 = hashlib.sha256()
+
+        if hasattr(content, "seek"):
+            content.seek(0)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    sha256.update(chunk)
+                    out.write(chunk)
+
+            digest = sha256.hexdigest()
+            final = cas_name(digest, name)
+            self._register(digest, final, os.path.getsize(tmp_path))
+            full = self.path(final)
+            if not os.path.exists(full):
+                os.makedirs(os.path.dirname(full), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, full)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return final
+
+    def _register(self, digest, name, size):
+        """Record the blob before its file is written (or found), so a
+        concurrent release sees it as freshly stored."""
+        from .models import MediaBlob
+
+        _, created = MediaBlob.objects.get_or_create(
+            sha256=digest, defaults={"name": name, "size": size}
+        )
+        if not created:
+            MediaBlob.objects.filter(sha256=digest).update(stored_at=timezone.now())
+
+    def delete(self, name):
+        """Only remove content-addressed files that nothing references."""
+        digest = hash_from_name(name)
+        if digest is not None:
+            from .models import MediaBlob
+
+            if MediaBlob.objects.filter(sha256=digest, ref_count__gt=0).exists():
+                return
+            MediaBlob.objects.filter(sha256=digest).delete()
+        super().delete(name)
+
+
+# ---------- Reference counting ----------
+
+def retain(name):
+    """Record one more reference to a stored file."""
+    digest = hash_from_name(name)
+    if digest is not None:
+        from .models import MediaBlob
+
+        MediaBlob.objects.filter(sha256=digest).update(ref_count=F("ref_count") + 1)
+
+
+def release(name):
+    """Drop one reference to a stored file; once the transaction commits,
+    delete it if none remain."""
+    digest = hash_from_name(name)
+    if digest is None:
+        return
+    from .models import MediaBlob
+
+    MediaBlob.objects.filter(sha256=digest, ref_count__gt=0).update(ref_count=F("ref_count") - 1)
+    transaction.on_commit(partial(_collect, digest, name))
+
+
+def _collect(digest, name):
+    from django.core.files.storage import default_storage
+    from .models import MediaBlob
+
+    # Re-checked in the DELETE itself: a reference taken since the release
+    # (or a fresh upload of the same content) keeps the file.
+    deleted, _ = MediaBlob.objects.filter(
+        sha256=digest, ref_count=0, stored_at__lt=timezone.now() - STORE_GRACE
+    ).delete()
+    if deleted:
+        default_storage.delete(name)
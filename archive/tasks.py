@@ -0,0 +1,35 @@
+"""
+Minimal in-process background jobs.
+
+Work that should not hold up a request (media checks, derivative
+generation, large moderation batches) is handed to a small thread pool
+once the surrounding transaction commits. Set ``BACKGROUND_TASKS_SYNC``
+to run jobs inline instead, e.g. in management commands or tests.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="archive-task")
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, "__name__", func))
+    finally:
+        connection.close()
+
+
+def enqueue(func, *args, **kwargs):
+    """Run ``func(*args, **kwargs)`` in the background after commit."""
+    if getattr(settings, "BACKGROUND_TASKS_SYNC", False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+    transaction.on_commit(lambda: _executor.submit(_run, func, args, kwargs))
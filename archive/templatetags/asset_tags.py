@@ -0,0 +1,23 @@
+from django import template
+
+from archive import assets
+
+register = template.Library()
+
+@register.simple_tag
+def use_asset_bundle():
+    """Whether to load the self-hosted asset bundle (see build_assets)"""
+    return assets.use_bundle()
+
+@register.simple_tag
+def vendor_script(name):
+    """URL of a vendored script, or its pinned CDN copy until the bundle is built"""
+    return assets.script_url(name)
+
+@register.simple_tag
+def tailwind_play_url():
+    return assets.TAILWIND_PLAY_URL
+
+@register.simple_tag
+def google_fonts_url():
+    return assets.GOOGLE_FONTS_URL
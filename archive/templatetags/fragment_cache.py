@@ -0,0 +1,24 @@
+from django import template
+
+from archive import fragments
+
+register = template.Library()
+
+@register.simple_tag(takes_context=True)
+def fragment_version(context, *args):
+    """Version token for cached fragments: {% fragment_version 'comment' c.id 'user' c.user_id as v %}"""
+    return fragments.fragment_version(*zip(args[::2], args[1::2]), known=context.get("fragment_versions"))
+
+@register.simple_tag
+def fragment_timeout():
+    return fragments.FRAGMENT_TIMEOUT
+
+@register.filter
+def contains(collection, item):
+    """True if item is in collection, usable as a {% cache %} vary-on value"""
+    return item in collection if collection else False
+
+@register.filter
+def deletable_by(comment, user):
+    """True if user may delete the comment (staff or its author)"""
+    return bool(user.is_staff or user.id == comment.user_id)
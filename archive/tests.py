@@ -1,3 +1,617 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import harvest, object_cache, proposals, revisions, serving, storage, uploads
+from .models import ChunkedUpload, EditProposal, HeritageObject, HeritageRevision, MediaBlob
+
+TEST_SETTINGS = {
+    "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    "BACKGROUND_TASKS_SYNC": True,
+}
+
+
+def make_object(**fields):
+    values = {"title": "Dallah", "description": "Coffee pot", "origin_date": date(1900, 1, 1)}
+    values.update(fields)
+    return HeritageObject.objects.create(**values)
+
+
+@override_settings(**TEST_SETTINGS)
+class ObjectCacheTests(TestCase):
+    def setUp(self):
+        object_cache.local.clear()
+
+    def test_save_invalidates_cached_row(self):
+        obj = make_object()
+        self.assertEqual(object_cache.get_cached(HeritageObject, obj.pk).title, "Dallah")
+        obj.title = "Mabkhara"
+        obj.save()
+        self.assertEqual(object_cache.get_cached(HeritageObject, obj.pk).title, "Mabkhara")
+
+    def test_update_needs_explicit_invalidate(self):
+        obj = make_object()
+        object_cache.get_cached(HeritageObject, obj.pk)
+        HeritageObject.objects.filter(pk=obj.pk).update(title="Mabkhara")
+        self.assertEqual(object_cache.get_cached(HeritageObject, obj.pk).title, "Dallah")
+        object_cache.invalidate(HeritageObject, obj.pk)
+        self.assertEqual(object_cache.get_cached(HeritageObject, obj.pk).title, "Mabkhara")
+
+    def test_missing_row_is_cached_until_created(self):
+        pk = (HeritageObject.objects.order_by("-pk").values_list("pk", flat=True).first() or 0) + 1
+        self.assertIsNone(object_cache.get_cached(HeritageObject, pk))
+        make_object(pk=pk)
+        self.assertEqual(object_cache.get_cached(HeritageObject, pk).pk, pk)
+
+    def test_delete_invalidates_cached_row(self):
+        obj = make_object()
+        object_cache.get_cached(HeritageObject, obj.pk)
+        pk = obj.pk
+        obj.delete()
+        self.assertIsNone(object_cache.get_cached(HeritageObject, pk))
+
+    def test_callers_get_their_own_copy(self):
+        obj = make_object()
+        object_cache.get_cached(HeritageObject, obj.pk).title = "Changed in memory"
+        self.assertEqual(object_cache.get_cached(HeritageObject, obj.pk).title, "Dallah")
+
+
+@override_settings(**TEST_SETTINGS)
+class HarvestTests(TestCase):
+    def setUp(self):
+        self.objects = [make_object(title=f"Object {i}") for i in range(5)]
+        self.deleted_pk = self.objects.pop(2).pk
+        HeritageObject.objects.get(pk=self.deleted_pk).delete()
+
+    def harvest_all(self, verb="ListIdentifiers"):
+        pages, params = [], {"verb": verb, "metadataPrefix": "oai_dc"}
+        while True:
+            entries, token, _delivered, _prefix = harvest.list_page(verb, params)
+            pages.append([(kind, pk) for _datestamp, kind, pk, _entry in entries])
+            if not token:
+                return pages, token
+            params = {"verb": verb, "resumptionToken": token}
+
+    @mock.patch.object(harvest, "PAGE_SIZE", 2)
+    def test_resumption_tokens_walk_every_record_once(self):
+        pages, last_token = self.harvest_all()
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(last_token, "")
+        delivered = [entry for page in pages for entry in page]
+        self.assertCountEqual(delivered, [
+            *((harvest.RECORD, obj.pk) for obj in self.objects),
+            (harvest.DELETED, self.deleted_pk),
+        ])
+
+    @mock.patch.object(harvest, "PAGE_SIZE", 2)
+    def test_changes_after_the_cursor_are_picked_up(self):
+        entries, token, _delivered, _prefix = harvest.list_page(
+            "ListIdentifiers", {"verb": "ListIdentifiers", "metadataPrefix": "oai_dc"}
+        )
+        first = {pk for _datestamp, _kind, pk, _entry in entries}
+        changed = next(obj for obj in self.objects if obj.pk in first)
+        changed.title = "Renamed"
+        changed.save()
+        rest = []
+        while token:
+            entries, token, _delivered, _prefix = harvest.list_page(
+                "ListIdentifiers", {"verb": "ListIdentifiers", "resumptionToken": token}
+            )
+            rest += [pk for _datestamp, _kind, pk, _entry in entries]
+        self.assertIn(changed.pk, rest)
+
+    def test_token_is_bound_to_its_verb(self):
+        token = harvest.make_token("ListIdentifiers", {"m": "oai_dc"}, (self.objects[0].updated_at, 0, 1), 1)
+        with self.assertRaises(harvest.OAIError) as raised:
+            harvest.list_page("ListRecords", {"verb": "ListRecords", "resumptionToken": token})
+        self.assertEqual(raised.exception.code, "badResumptionToken")
+
+    @mock.patch.object(harvest, "PAGE_SIZE", 2)
+    def test_view_pages_with_tokens(self):
+        url = reverse("oai-pmh")
+        response = self.client.get(url, {"verb": "ListIdentifiers", "metadataPrefix": "oai_dc"})
+        token = re.search(r"<resumptionToken[^>]*>([^<]+)</resumptionToken>", response.content.decode()).group(1)
+        response = self.client.get(url, {"verb": "ListIdentifiers", "resumptionToken": token})
+        self.assertNotIn("<error", response.content.decode())
+        response = self.client.get(url, {"verb": "ListIdentifiers", "resumptionToken": token + "x"})
+        self.assertIn('code="badResumptionToken"', response.content.decode())
+
+
+@override_settings(**TEST_SETTINGS)
+class ApplyProposalsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("editor", password="x")
+        self.obj = make_object(maker="Unknown")
+
+    def propose(self, **data):
+        return EditProposal.objects.create(
+            user=self.user, object=self.obj, data=data,
+            base=proposals.base_values(self.obj, data), status="approved",
+        )
+
+    def test_clean_proposal_is_applied(self):
+        proposal = self.propose(title="Dallah of Hail")
+        result = proposals.apply_proposals(EditProposal.objects.all())
+        self.assertEqual((result.applied, result.conflicts, result.objects), (1, 0, 1))
+        obj = HeritageObject.objects.get(pk=self.obj.pk)
+        self.assertEqual(obj.title, "Dallah of Hail")
+        self.assertEqual(obj.version, self.obj.version + 1)
+        proposal.refresh_from_db()
+        self.assertIsNotNone(proposal.applied_at)
+
+    def test_field_changed_since_proposal_conflicts(self):
+        proposal = self.propose(title="Dallah of Hail", maker="Ahmad")
+        HeritageObject.objects.filter(pk=self.obj.pk).update(title="Dallah of Qassim")
+        result = proposals.apply_proposals(EditProposal.objects.all())
+        self.assertEqual((result.applied, result.conflicts), (0, 1))
+        proposal.refresh_from_db()
+        self.assertEqual(proposal.status, "conflict")
+        self.assertEqual(proposal.conflicts["title"]["kind"], "conflict")
+        self.assertEqual(proposal.conflicts["title"]["current"], "Dallah of Qassim")
+        # Applied whole or not at all
+        obj = HeritageObject.objects.get(pk=self.obj.pk)
+        self.assertEqual((obj.title, obj.maker), ("Dallah of Qassim", "Unknown"))
+
+    def test_unrelated_change_does_not_conflict(self):
+        self.propose(title="Dallah of Hail")
+        HeritageObject.objects.filter(pk=self.obj.pk).update(maker="Ahmad")
+        result = proposals.apply_proposals(EditProposal.objects.all())
+        self.assertEqual(result.applied, 1)
+        obj = HeritageObject.objects.get(pk=self.obj.pk)
+        self.assertEqual((obj.title, obj.maker), ("Dallah of Hail", "Ahmad"))
+
+    def test_force_overrides_a_conflict(self):
+        proposal = self.propose(title="Dallah of Hail")
+        HeritageObject.objects.filter(pk=self.obj.pk).update(title="Dallah of Qassim")
+        proposals.apply_proposals(EditProposal.objects.all())
+        result = proposals.apply_proposals(EditProposal.objects.filter(pk=proposal.pk), force=True)
+        self.assertEqual(result.applied, 1)
+        self.assertEqual(HeritageObject.objects.get(pk=self.obj.pk).title, "Dallah of Hail")
+
+    def test_later_proposal_on_the_same_field_conflicts_with_earlier_one(self):
+        first = self.propose(title="Dallah of Hail")
+        second = self.propose(title="Dallah of Jouf")
+        result = proposals.apply_proposals(EditProposal.objects.all())
+        self.assertEqual((result.applied, result.conflicts), (1, 1))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, second.status), ("approved", "conflict"))
+        self.assertEqual(HeritageObject.objects.get(pk=self.obj.pk).title, "Dallah of Hail")
+
+    def test_invalid_value_is_reported(self):
+        proposal = self.propose(region="atlantis")
+        result = proposals.apply_proposals(EditProposal.objects.all())
+        self.assertEqual(result.conflicts, 1)
+        proposal.refresh_from_db()
+        self.assertEqual(proposal.conflicts["region"]["kind"], "invalid")
+
+    def test_applied_proposals_are_not_applied_again(self):
+        self.propose(title="Dallah of Hail")
+        proposals.apply_proposals(EditProposal.objects.all())
+        result = proposals.apply_proposals(EditProposal.objects.all())
+        self.assertEqual((result.applied, result.objects), (0, 0))
+
+
+@override_settings(**TEST_SETTINGS)
+class VersionedEditTests(TestCase):
+    def setUp(self):
+        object_cache.local.clear()
+        self.obj = make_object()
+
+    def test_save_moves_the_version_on(self):
+        seen = []
+
+        def receiver(sender, instance, **kwargs):
+            seen.append(instance.version)
+
+        post_save.connect(receiver, sender=HeritageObject)
+        self.addCleanup(post_save.disconnect, receiver, sender=HeritageObject)
+        self.obj.save()
+        self.obj.save(update_fields=["title"])
+        self.assertEqual(seen, [2, 3])
+        self.assertEqual(self.obj.version, 3)
+
+    def test_write_fields_at_current_version(self):
+        object_cache.get_cached(HeritageObject, self.obj.pk)
+        version = proposals.write_fields(self.obj.pk, self.obj.version, {"title": "Mabkhara"})
+        self.assertEqual(version, self.obj.version + 1)
+        cached = object_cache.get_cached(HeritageObject, self.obj.pk)
+        self.assertEqual((cached.title, cached.version), ("Mabkhara", version))
+        self.assertEqual(HeritageRevision.objects.filter(object_id=self.obj.pk).count(), 2)
+
+    def test_write_fields_at_stale_version(self):
+        self.obj.save()
+        with self.assertRaises(proposals.StaleVersion):
+            proposals.write_fields(self.obj.pk, self.obj.version - 1, {"title": "Mabkhara"})
+        self.assertEqual(HeritageObject.objects.get(pk=self.obj.pk).title, "Dallah")
+
+
+@override_settings(**TEST_SETTINGS)
+class InlineEditViewTests(TestCase):
+    def setUp(self):
+        object_cache.local.clear()
+        self.obj = make_object()
+        staff = get_user_model().objects.create_user("moderator", password="x", is_staff=True)
+        self.client.force_login(staff)
+        self.url = reverse("propose-edit-inline", args=[self.obj.pk])
+
+    def post(self, **data):
+        return self.client.post(self.url, data, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+
+    def test_edit_at_current_version_is_applied(self):
+        response = self.post(title="Mabkhara", version=self.obj.version)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(HeritageObject.objects.get(pk=self.obj.pk).title, "Mabkhara")
+
+    def test_edit_at_stale_version_is_refused(self):
+        version = self.obj.version
+        self.obj.title = "Mabkhara"
+        self.obj.save()
+        response = self.post(title="Dallah of Hail", version=version)
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.json()["conflict"])
+        self.assertEqual(HeritageObject.objects.get(pk=self.obj.pk).title, "Mabkhara")
+
+    def test_edit_without_version_is_refused(self):
+        response = self.post(title="Dallah of Hail")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(HeritageObject.objects.get(pk=self.obj.pk).title, "Dallah")
+
+
+@override_settings(**TEST_SETTINGS)
+class RevisionTests(TestCase):
+    REVISIONS = revisions.SNAPSHOT_EVERY + 5
+
+    def setUp(self):
+        # Revision n sets the title to "v<n>" and is dated n minutes after start
+        self.obj = make_object(title="v1")
+        for number in range(2, self.REVISIONS + 1):
+            self.obj.title = f"v{number}"
+            self.obj.save()
+        self.start = timezone.now() - timedelta(days=1)
+        for revision in HeritageRevision.objects.filter(object_id=self.obj.pk):
+            revision.created_at = self.at(revision.number)
+            revision.save(update_fields=["created_at"])
+
+    def at(self, number):
+        return self.start + timedelta(minutes=number)
+
+    def title_as_of(self, when):
+        obj = revisions.as_of(self.obj.pk, when)
+        return obj and obj.title
+
+    def test_every_nth_revision_is_a_snapshot(self):
+        kinds = dict(HeritageRevision.objects.filter(object_id=self.obj.pk).values_list("number", "kind"))
+        self.assertEqual(len(kinds), self.REVISIONS)
+        snapshots = {number for number, kind in kinds.items() if kind == HeritageRevision.SNAPSHOT}
+        self.assertEqual(snapshots, {1, revisions.SNAPSHOT_EVERY + 1})
+
+    def test_unchanged_save_records_nothing(self):
+        self.obj.save()
+        self.assertEqual(HeritageRevision.objects.filter(object_id=self.obj.pk).count(), self.REVISIONS)
+
+    def test_as_of_across_a_snapshot_boundary(self):
+        boundary = revisions.SNAPSHOT_EVERY + 1
+        for number in (1, boundary - 2, boundary - 1, boundary, boundary + 1, self.REVISIONS):
+            self.assertEqual(self.title_as_of(self.at(number)), f"v{number}")
+        self.assertEqual(self.title_as_of(self.at(boundary) + timedelta(seconds=30)), f"v{boundary}")
+        self.assertIsNone(self.title_as_of(self.at(0)))
+        self.assertEqual(revisions.state(self.obj.pk, boundary + 1)["title"], f"v{boundary + 1}")
+        self.assertEqual(revisions.state(self.obj.pk)["title"], f"v{self.REVISIONS}")
+
+    def test_diff_across_a_snapshot_boundary(self):
+        old, new = revisions.SNAPSHOT_EVERY - 1, revisions.SNAPSHOT_EVERY + 3
+        self.assertEqual(revisions.diff(self.obj.pk, old, new), {"title": (f"v{old}", f"v{new}")})
+        self.assertEqual(revisions.diff(self.obj.pk, new, old), {"title": (f"v{new}", f"v{old}")})
+        self.assertEqual(revisions.diff(self.obj.pk, new, new), {})
+
+    def test_as_of_after_compact(self):
+        cutoff = revisions.SNAPSHOT_EVERY + 2
+        compacted, removed = revisions.compact(self.at(cutoff) + timedelta(seconds=30))
+        self.assertEqual((compacted, removed), (1, cutoff - 1))
+        remaining = HeritageRevision.objects.filter(object_id=self.obj.pk).order_by("number")
+        self.assertEqual(remaining[0].number, cutoff)
+        self.assertEqual(remaining[0].kind, HeritageRevision.SNAPSHOT)
+        # Times before the cutoff read as the folded snapshot
+        self.assertEqual(self.title_as_of(self.at(1)), f"v{cutoff}")
+        for number in (cutoff, cutoff + 1, self.REVISIONS):
+            self.assertEqual(self.title_as_of(self.at(number)), f"v{number}")
+        self.assertEqual(revisions.compact(self.at(cutoff) + timedelta(seconds=30)), (0, 0))
+
+    def test_deleted_object(self):
+        pk = self.obj.pk
+        self.obj.delete()
+        self.assertIsNone(revisions.as_of(pk, timezone.now()))
+        self.assertEqual(revisions.as_of(pk, self.at(self.REVISIONS)).title, f"v{self.REVISIONS}")
+        revisions.compact(timezone.now() + timedelta(seconds=1))
+        self.assertFalse(HeritageRevision.objects.filter(object_id=pk).exists())
+
+
+class TempMediaMixin:
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class MediaServingTests(TempMediaMixin, TestCase):
+
+    def write(self, name, content):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(content)
+        return path
+
+    def get(self, name, **headers):
+        return self.client.get(f"/media/{name}", headers=headers)
+
+    def body(self, response):
+        return b"".join(response.streaming_content) if response.streaming else response.content
+
+    def test_full_response_headers(self):
+        self.write("images/a.png", b"0123456789")
+        response = self.get("images/a.png")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), b"0123456789")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+        self.assertEqual(response["Content-Security-Policy"], "sandbox")
+        self.assertTrue(response["Content-Disposition"].startswith("inline"))
+
+    def test_range(self):
+        self.write("models/m.glb", b"0123456789")
+        response = self.get("models/m.glb", Range="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), b"2345")
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(response["Content-Length"], "4")
+
+        response = self.get("models/m.glb", Range="bytes=-3")
+        self.assertEqual((response.status_code, self.body(response)), (206, b"789"))
+
+    def test_unsatisfiable_range(self):
+        self.write("models/m.glb", b"0123456789")
+        response = self.get("models/m.glb", Range="bytes=10-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_stale_if_range_sends_the_whole_file(self):
+        self.write("models/m.glb", b"0123456789")
+        response = self.get("models/m.glb", Range="bytes=2-5", If_Range='"not-the-etag"')
+        self.assertEqual((response.status_code, self.body(response)), (200, b"0123456789"))
+
+    def test_if_none_match(self):
+        self.write("images/a.png", b"0123456789")
+        etag = self.get("images/a.png")["ETag"]
+        response = self.get("images/a.png", If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.write("images/a.png", b"changed")
+        os.utime(os.path.join(self.media_root, "images/a.png"), ns=(1, 1))
+        serving._hash_file.cache_clear()
+        self.assertEqual(self.get("images/a.png", If_None_Match=etag).status_code, 200)
+
+    def test_precompressed_sibling(self):
+        content = b"v 0 0 0\n" * 1000
+        path = self.write("models/m.obj", content)
+        serving.precompress(path)
+        response = self.get("models/m.obj", Accept_Encoding="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertLess(len(self.body(response)), len(content))
+        plain = self.get("models/m.obj")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertEqual(self.body(plain), content)
+        self.assertNotEqual(plain["ETag"], response["ETag"])
+
+    def test_other_types_are_attachments(self):
+        self.write("uploads/page.html", b"<script>alert(1)</script>")
+        response = self.get("uploads/page.html")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Disposition"].startswith("attachment"))
+        self.assertEqual(response["Content-Security-Policy"], "sandbox")
+
+    def test_compressed_siblings_are_not_served_directly(self):
+        path = self.write("models/m.obj", b"v 0 0 0\n" * 1000)
+        serving.precompress(path)
+        self.assertEqual(self.get("models/m.obj.gz").status_code, 404)
+        self.assertEqual(self.get("../settings.py").status_code, 404)
+
+
+@override_settings(**TEST_SETTINGS)
+class MediaReferenceTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        object_cache.local.clear()
+
+    def attach(self, content=b"same bytes"):
+        obj = make_object()
+        obj.image.save("photo.png", ContentFile(content))
+        return obj
+
+    def age(self, blob, hours):
+        MediaBlob.objects.filter(pk=blob.pk).update(stored_at=timezone.now() - timedelta(hours=hours))
+
+    def test_same_content_is_stored_once(self):
+        first, second = self.attach(), self.attach()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image.name, storage.cas_name(MediaBlob.objects.get().sha256, "photo.png"))
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.ref_count, blob.size), (2, len(b"same bytes")))
+        self.assertTrue(default_storage.exists(blob.name))
+
+    def test_release_to_zero_collects_after_grace(self):
+        first, second = self.attach(), self.attach()
+        blob = MediaBlob.objects.get()
+        self.age(blob, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(default_storage.exists(blob.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.name))
+
+    def test_young_blob_is_kept(self):
+        obj = self.attach()
+        blob = MediaBlob.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+        self.assertTrue(default_storage.exists(blob.name))
+
+        self.age(blob, storage.STORE_GRACE.total_seconds() / 3600 + 1)
+        storage._collect(blob.sha256, blob.name)
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.name))
+
+    def test_new_reference_before_collect_keeps_file(self):
+        obj = self.attach()
+        blob = MediaBlob.objects.get()
+        self.age(blob, 2)
+        obj.delete()  # _collect is deferred until commit
+        other = make_object(image=blob.name)
+        storage._collect(blob.sha256, blob.name)
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+        self.assertTrue(default_storage.exists(other.image.name))
+
+    def test_prune_media(self):
+        kept = self.attach(b"kept")
+        self.attach(b"orphan")
+        orphan = MediaBlob.objects.get(size=len(b"orphan"))
+        # Counts drifted: prune_media recounts from the file fields.
+        HeritageObject.objects.exclude(pk=kept.pk).update(image="")
+        MediaBlob.objects.update(ref_count=5)
+        self.age(orphan, 3)
+
+        call_command("prune_media", "--grace-hours=2", "--dry-run", stdout=StringIO())
+        self.assertTrue(MediaBlob.objects.filter(pk=orphan.pk).exists())
+
+        call_command("prune_media", "--grace-hours=4", stdout=StringIO())
+        self.assertTrue(MediaBlob.objects.filter(pk=orphan.pk).exists())
+
+        call_command("prune_media", "--grace-hours=2", stdout=StringIO())
+        self.assertFalse(MediaBlob.objects.filter(pk=orphan.pk).exists())
+        self.assertFalse(default_storage.exists(orphan.name))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+        self.assertTrue(default_storage.exists(kept.image.name))
+
+
+@override_settings(**TEST_SETTINGS)
+class ChunkedUploadViewTests(TempMediaMixin, TestCase):
+    CONTENT = b"v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n"  # 4 chunks of 8 bytes
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(mock.patch.stopall)
+        mock.patch.object(uploads, "CHUNK_SIZE", 8).start()
+        part_dir = os.path.join(self.media_root, "partial")
+        override = override_settings(CHUNKED_UPLOAD_DIR=part_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = get_user_model().objects.create_user("uploader", password="x")
+        self.client.force_login(self.user)
+
+    def start(self, content=CONTENT, sha256=None, filename="mesh.obj"):
+        if sha256 is None:
+            sha256 = hashlib.sha256(content).hexdigest()
+        payload = {"field": "model_3d", "filename": filename, "size": len(content), "sha256": sha256}
+        return self.client.post(reverse("upload-start"), json.dumps(payload), content_type="application/json")
+
+    def put_chunk(self, upload_id, index, content=CONTENT, **headers):
+        data = content[index * 8:(index + 1) * 8]
+        return self.client.put(
+            reverse("upload-chunk", args=[upload_id, index]), data,
+            content_type="application/octet-stream", headers=headers,
+        )
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse("upload-finalize", args=[upload_id]))
+
+    def test_out_of_order_and_duplicate_chunks(self):
+        response = self.start()
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()["upload_id"]
+        self.assertEqual(response.json()["total_chunks"], 4)
+
+        for index in (3, 1, 1, 0):
+            self.assertEqual(self.put_chunk(upload_id, index).status_code, 200)
+        status = self.client.get(reverse("upload-status", args=[upload_id])).json()
+        self.assertEqual(status["received"], [0, 1, 3])
+
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("1 chunk(s) are still missing", response.json()["message"])
+
+        self.assertEqual(self.put_chunk(upload_id, 2).status_code, 200)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "complete")
+        upload = ChunkedUpload.objects.get(pk=upload_id)
+        with default_storage.open(upload.stored_name) as fh:
+            self.assertEqual(fh.read(), self.CONTENT)
+        self.assertEqual(self.finalize(upload_id).status_code, 200)  # repeated finalize is a no-op
+
+    def test_chunk_checks(self):
+        upload_id = self.start().json()["upload_id"]
+        response = self.put_chunk(upload_id, 0, X_Chunk_SHA256="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.put_chunk(upload_id, 4).status_code, 400)
+        self.assertEqual(self.put_chunk(upload_id, 0, content=b"short").status_code, 400)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).chunks.count(), 0)
+
+    def test_finalize_rejects_hash_mismatch(self):
+        upload_id = self.start(sha256="0" * 64).json()["upload_id"]
+        for index in range(4):
+            self.put_chunk(upload_id, index)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("checksum", response.json()["message"])
+        upload = ChunkedUpload.objects.get(pk=upload_id)
+        self.assertEqual((upload.status, upload.stored_name), ("uploading", ""))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_finalize_while_assembling_is_busy(self):
+        upload_id = self.start().json()["upload_id"]
+        ChunkedUpload.objects.filter(pk=upload_id).update(status="assembling")
+        self.assertEqual(self.finalize(upload_id).status_code, 409)
+
+    def test_open_upload_limit(self):
+        for _ in range(uploads.MAX_OPEN_UPLOADS):
+            self.assertEqual(self.start().status_code, 201)
+        response = self.start()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Too many unfinished uploads", response.json()["message"])
+
+        ChunkedUpload.objects.filter(user=self.user).first().delete()
+        self.assertEqual(self.start().status_code, 201)
+
+    def test_uploads_are_private(self):
+        upload_id = self.start().json()["upload_id"]
+        other = get_user_model().objects.create_user("other", password="x")
+        self.client.force_login(other)
+        self.assertEqual(self.put_chunk(upload_id, 0).status_code, 404)
+        self.assertEqual(self.finalize(upload_id).status_code, 404)
@@ -0,0 +1,216 @@
+"""
+Chunked, resumable uploads for large submission files.
+
+A client opens an upload (``start_upload``), sends numbered chunks that are
+written straight into a preallocated ``.part`` file at their offset
+(``write_chunk``), can ask which chunks already arrived to resume after a
+dropped connection, and finally asks the server to assemble the file
+(``finalize_upload``), which moves it into content-addressed storage. The
+resulting name is then attached to a Submission by ``claim_upload``.
+
+Each user may have ``MAX_OPEN_UPLOADS`` unfinished uploads totalling at
+most ``MAX_OPEN_BYTES``. Finalizing claims the upload with a conditional
+UPDATE to "assembling" first, so of two concurrent requests only one
+assembles the file and the other gets UploadBusy. Images are checked
+with Pillow before they are stored, as ImageField would for a form
+upload.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError
+from django.db.models import Count, Sum
+from PIL import Image
+
+from .models import ChunkedUpload, UploadChunk
+
+CHUNK_SIZE = 4 * 1024 * 1024
+MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024
+READ_BLOCK = 64 * 1024
+MAX_OPEN_UPLOADS = 5  # per user
+MAX_OPEN_BYTES = 4 * 1024 * 1024 * 1024  # per user
+
+OPEN_STATUSES = ("uploading", "assembling")
+
+ALLOWED_EXTENSIONS = {
+    "model_3d": (".obj", ".ply", ".stl", ".gltf", ".glb"),
+    "image": (".jpg", ".jpeg", ".png", ".gif", ".webp", ".tif", ".tiff"),
+}
+
+
+class UploadError(ValueError):
+    """Raised for invalid upload requests; the message is shown to the client."""
+
+
+class UploadBusy(UploadError):
+    """The upload is being assembled by another request."""
+
+
+class _AssembledFile(File):
+    """Lets FileSystemStorage move the assembled file instead of copying it."""
+
+    def __init__(self, file, path, content_hash):
+        super().__init__(file, name=os.path.basename(path))
+        self._path = path
+        self.content_hash = content_hash
+
+    def temporary_file_path(self):
+        return self._path
+
+
+def part_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{upload.pk}.part")
+
+
+def start_upload(user, field, filename, size, sha256=""):
+    filename = os.path.basename(filename or "")
+    if field not in ALLOWED_EXTENSIONS:
+        raise UploadError("Unknown upload field.")
+    if not filename.lower().endswith(ALLOWED_EXTENSIONS[field]):
+        raise UploadError("This file type is not allowed.")
+    if size <= 0 or size > MAX_UPLOAD_SIZE:
+        raise UploadError("File is empty or too large.")
+    open_uploads = ChunkedUpload.objects.filter(user=user, status__in=OPEN_STATUSES).aggregate(
+        count=Count("pk"), size=Sum("size")
+    )
+    if open_uploads["count"] >= MAX_OPEN_UPLOADS:
+        raise UploadError("Too many unfinished uploads; finish or abandon one first.")
+    if (open_uploads["size"] or 0) + size > MAX_OPEN_BYTES:
+        raise UploadError("Your unfinished uploads are too large; finish one first.")
+
+    upload = ChunkedUpload.objects.create(
+        user=user,
+        field=field,
+        filename=filename[:255],
+        size=size,
+        chunk_size=CHUNK_SIZE,
+        sha256=(sha256 or "").lower()[:64],
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    with open(part_path(upload), "wb") as fh:
+        fh.truncate(size)
+    return upload
+
+
+def received_chunks(upload):
+    return sorted(upload.chunks.values_list("index", flat=True))
+
+
+def write_chunk(upload, index, stream, checksum=None):
+    """
+    Stream one chunk from ``stream`` (the request) into the part file.
+
+    ``checksum`` is the client's SHA-256 of the chunk; when given, a
+    mismatching chunk is rejected and must be re-sent.
+    """
+    if upload.status != "uploading":
+        raise UploadError("Upload is already finalized.")
+    if not 0 <= index < upload.total_chunks:
+        raise UploadError("Chunk index out of range.")
+
+    offset = index * upload.chunk_size
+    expected = min(upload.chunk_size, upload.size - offset)
+    digest = hashlib.sha256()
+    written = 0
+
+    with open(part_path(upload), "r+b") as fh:
+        fh.seek(offset)
+        while written < expected:
+            block = stream.read(min(READ_BLOCK, expected - written))
+            if not block:
+                break
+            digest.update(block)
+            fh.write(block)
+            written += len(block)
+        if written == expected and stream.read(1):
+            written += 1  # more data than the chunk can hold
+
+    if written != expected:
+        raise UploadError(f"Chunk {index} must be exactly {expected} bytes.")
+    if checksum and checksum.lower() != digest.hexdigest():
+        raise UploadError(f"Checksum mismatch for chunk {index}; please resend it.")
+
+    try:
+        chunk, _ = UploadChunk.objects.update_or_create(
+            upload=upload, index=index,
+            defaults={"size": written, "sha256": digest.hexdigest()},
+        )
+    except IntegrityError:
+        # The same chunk was re-sent concurrently; the bytes are identical
+        chunk = UploadChunk.objects.get(upload=upload, index=index)
+    return chunk
+
+
+def finalize_upload(upload):
+    """Check that every chunk arrived, verify the whole-file hash and move the
+    file into media storage."""
+    claimed = ChunkedUpload.objects.filter(pk=upload.pk, status="uploading").update(status="assembling")
+    if not claimed:
+        upload.refresh_from_db()
+        if upload.status == "assembling":
+            raise UploadBusy("The upload is already being finalized.")
+        return upload
+    path = part_path(upload)
+    try:
+        actual = _verify(upload)
+        with open(path, "rb") as fh:
+            name = default_storage.save(
+                f"submissions/{upload.field}/{upload.filename}",
+                _AssembledFile(fh, path, actual),
+            )
+    except Exception:
+        ChunkedUpload.objects.filter(pk=upload.pk).update(status="uploading")
+        raise
+    if os.path.exists(path):
+        os.remove(path)
+
+    upload.sha256 = actual
+    upload.stored_name = name
+    upload.status = "complete"
+    upload.save(update_fields=["sha256", "stored_name", "status", "updated_at"])
+    upload.chunks.all().delete()
+    return upload
+
+
+def _verify(upload):
+    """Check the assembled part file; returns its SHA-256."""
+    missing = set(range(upload.total_chunks)) - set(received_chunks(upload))
+    if missing:
+        raise UploadError(f"{len(missing)} chunk(s) are still missing.")
+
+    path = part_path(upload)
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+        if upload.field == "image":
+            fh.seek(0)
+            try:
+                Image.open(fh).verify()
+            except Exception:
+                raise UploadError("Upload a valid image. The file is not an image or is corrupted.")
+    actual = digest.hexdigest()
+    if upload.sha256 and upload.sha256 != actual:
+        raise UploadError("File checksum does not match; please upload it again.")
+    return actual
+
+
+def claim_upload(user, upload_id, field):
+    """Return the user's finished upload for ``field`` so its stored file can
+    be assigned to a new Submission."""
+    upload = ChunkedUpload.objects.filter(
+        pk=upload_id, user=user, field=field, status="complete"
+    ).first()
+    if upload is None:
+        raise UploadError("The uploaded file could not be found; please upload it again.")
+    return upload
+
+
+def discard_upload(upload):
+    path = part_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    upload.delete()
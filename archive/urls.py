@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, sitemaps, views
 
 urlpatterns = [
     # 🏠 Homepage
@@ -15,6 +15,23 @@ urlpatterns = [
 
     # 📜 Individual heritage object detail
     path("heritage/<int:pk>/", views.heritage_detail, name="heritage-detail"),
+    path("heritage/<int:pk>/events/", views.heritage_events, name="heritage-events"),  # live updates (SSE)
+
+    # 📦 Full catalog dumps (CSV / JSON Lines)
+    path("export/catalog.<str:fmt>", views.catalog_export, name="catalog-export"),
+    path("oai/", views.oai_pmh, name="oai-pmh"),  # OAI-PMH harvesting
+
+    # 🗺️ Sitemaps for crawlers (see archive/sitemaps.py)
+    path("robots.txt", sitemaps.robots_txt, name="robots-txt"),
+    path("sitemap.xml", sitemaps.index, name="sitemap-index"),
+    path("sitemap-pages.xml", sitemaps.pages, name="sitemap-pages"),
+    path("sitemap-<int:number>.xml", sitemaps.section, name="sitemap-section"),
+
+    # 🔌 Read-only JSON API (see archive/api.py)
+    path("api/v1/objects/", api.object_list, name="api-object-list"),
+    path("api/v1/objects/<int:pk>/", api.object_detail, name="api-object-detail"),
+    path("api/v1/search/", api.search, name="api-search"),
+    path("api/v1/facets/", api.facets, name="api-facets"),
 
     # ❤️ Object likes
     path("heritage/<int:pk>/like/", views.toggle_like, name="heritage-like"),
@@ -41,6 +58,12 @@ urlpatterns = [
 
     # 📥 Community submissions (new objects)
     path("submit/", views.submit_object, name="submit-object"),
+
+    # ⏫ Chunked, resumable uploads for large files
+    path("uploads/", views.upload_start, name="upload-start"),
+    path("uploads/<uuid:upload_id>/", views.upload_status, name="upload-status"),
+    path("uploads/<uuid:upload_id>/chunks/<int:index>/", views.upload_chunk, name="upload-chunk"),
+    path("uploads/<uuid:upload_id>/finalize/", views.upload_finalize, name="upload-finalize"),
     path("my/submissions/", views.my_submissions, name="my-submissions"),
     path("my/proposals/", views.my_proposals, name="my-proposals"),
 
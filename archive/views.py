@@ -2,26 +2,47 @@ from __future__ import annotations
 
 import json
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
-from django.http import HttpResponseForbidden, HttpResponseRedirect, JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
+from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Count
 from django import forms
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import gettext
+from django.utils.translation import get_language
+from django.utils import timezone, translation
 
 from .models import (
     HeritageObject,
+    HeritageCard,
     HeritageLike,
     Comment,
     CommentLike,
     EditProposal,
     Submission,
-    UserProfile,
+    ChunkedUpload,
+)
+from . import export, filter_cache, fragments, harvest, live, proposals
+from .object_cache import get_cached_or_404, profile_for
+from .resilience import serve_stale, unavailable
+from .uploads import (
+    OPEN_STATUSES,
+    UploadBusy,
+    UploadError,
+    claim_upload,
+    finalize_upload,
+    received_chunks,
+    start_upload,
+    write_chunk,
 )
 
 # ---------- FORMS ----------
@@ -49,6 +70,10 @@ class ProposeEditForm(forms.Form):
 
 
 class SubmissionForm(forms.ModelForm):
+    # IDs of files sent through the chunked upload API instead of the form
+    image_upload = forms.UUIDField(required=False, widget=forms.HiddenInput)
+    model_3d_upload = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Submission
         fields = [
@@ -142,36 +167,44 @@ def _liked_ids_for(user):
     )
 
 
+def _catalog_cards():
+    """Read-model cards (archive/read_model.py) in the active language."""
+    return HeritageCard.objects.filter(language=get_language()).order_by("object_id")
+
+
+@serve_stale()
 def heritage_list(request):
     """List all objects."""
-    objects = HeritageObject.objects.all().annotate(like_count=Count("likes"))
+    objects = list(_catalog_cards())
     liked_ids = _liked_ids_for(request.user)
     return render(
         request,
         "archive/heritage_list.html",
-        {"objects": objects, "liked_ids": liked_ids, "filter_type": "all"},
+        {
+            "objects": objects,
+            "liked_ids": liked_ids,
+            "filter_type": "all",
+            "fragment_versions": fragments.versions(("card", card.object_id) for card in objects),
+        },
     )
 
 
+@serve_stale(params=("region", "type", "q", "search", "page"))
 def heritage_filtered(request):
     """Filtering by region, type, and search query."""
-    region = request.GET.get("region")
-    obj_type = request.GET.get("type")
-    q = request.GET.get("q")
-
-    objects = HeritageObject.objects.all()
-
-    if region:
-        objects = objects.filter(region__iexact=region)
-
-    if obj_type:
-        objects = objects.filter(object_type__iexact=obj_type)
+    region, obj_type, q = filter_cache.normalize(
+        request.GET.get("region"),
+        request.GET.get("type"),
+        # The hero search bar submits its text as ``search``
+        request.GET.get("q") or request.GET.get("search"),
+    )
 
-    if q and q.strip():
-        objects = objects.filter(title__icontains=q)
+    # Titles are matched in English and in the language the user is browsing in
+    cards = _catalog_cards()
+    ids = filter_cache.matching_ids(cards, get_language(), (region, obj_type, q))
+    page_obj = Paginator(ids, filter_cache.PAGE_SIZE).get_page(request.GET.get("page"))
+    objects = list(cards.filter(object_id__in=page_obj.object_list))
 
-    # add like counts for the badges
-    objects = objects.annotate(like_count=Count("likes"))
     liked_ids = _liked_ids_for(request.user)
 
     return render(
@@ -179,18 +212,22 @@ def heritage_filtered(request):
         "archive/heritage_list.html",
         {
             "objects": objects,
+            "page_obj": page_obj,
+            "result_count": page_obj.paginator.count,
             "filter_type": "combined",
             "region": region,
             "obj_type": obj_type,
             "q": q,
             "liked_ids": liked_ids,
+            "fragment_versions": fragments.versions(("card", card.object_id) for card in objects),
         },
     )
 
 
+@serve_stale()
 def heritage_detail(request, pk: int):
     """Object detail + comments + like state."""
-    obj = get_object_or_404(HeritageObject, pk=pk)
+    obj = get_cached_or_404(HeritageObject, pk)
 
     # Get top-level comments sorted by likes (most liked first)
     comments = (
@@ -203,9 +240,11 @@ def heritage_detail(request, pk: int):
     
     # Get user stats for comments
     comment_user_stats = {}
+    comment_ids = []
     for comment in comments:
+        comment_ids.append(comment.pk)
         if comment.user_id not in comment_user_stats:
-            user_profile, _ = UserProfile.objects.get_or_create(user=comment.user)
+            user_profile = profile_for(comment.user)
             comment_user_stats[comment.user_id] = {
                 "profile": user_profile,
                 "total_comments": Comment.objects.filter(user=comment.user, is_deleted=False).count(),
@@ -218,8 +257,9 @@ def heritage_detail(request, pk: int):
         
         # Process replies
         for reply in comment.replies.filter(is_deleted=False):
+            comment_ids.append(reply.pk)
             if reply.user_id not in comment_user_stats:
-                reply_profile, _ = UserProfile.objects.get_or_create(user=reply.user)
+                reply_profile = profile_for(reply.user)
                 comment_user_stats[reply.user_id] = {
                     "profile": reply_profile,
                     "total_comments": Comment.objects.filter(user=reply.user, is_deleted=False).count(),
@@ -232,15 +272,22 @@ def heritage_detail(request, pk: int):
     comment_form = CommentForm()
 
     user_liked = False
+    like_count = 0
     if request.user.is_authenticated:
         user_liked = HeritageLike.objects.filter(user=request.user, object=obj).exists()
+        like_count = HeritageLike.objects.filter(object=obj).count()
 
     context = {
         "object": obj,
         "comments": comments,
         "comment_form": comment_form,
         "user_liked": user_liked,
+        "like_count": like_count,
         "comment_user_stats": comment_user_stats,
+        # Versions of every cached comment fragment, read at once
+        "fragment_versions": fragments.versions(
+            [("comment", pk) for pk in comment_ids] + [("user", pk) for pk in comment_user_stats]
+        ),
         # Add field choices for edit form
         "region_choices": HeritageObject.REGION_CHOICES,
         "type_choices": HeritageObject.TYPE_CHOICES,
@@ -251,68 +298,122 @@ def heritage_detail(request, pk: int):
 
 # ---------- STATIC PAGES ----------
 
+@serve_stale()
 def home(request):
     return render(request, "archive/home.html")
 
 
+@serve_stale()
 def about(request):
     return render(request, "archive/about.html")
 
 
+@serve_stale()
 def sponsors(request):
     return render(request, "archive/sponsors.html")
 
 
+@serve_stale()
 def donate(request):
     return render(request, "archive/donate.html")
 
 
+# ---------- CATALOG EXPORT ----------
+
+@login_required
+@require_http_methods(["GET"])
+def catalog_export(request, fmt: str):
+    """Stream the whole catalog as CSV or JSON Lines (see archive/export.py)
+    to staff. ?fields=title,region,... selects columns, ?language=ar
+    translates them."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Not allowed")
+    if fmt not in export.FORMATS:
+        return HttpResponse(status=404)
+    try:
+        fields = export.resolve_fields(request.GET.get("fields"))
+        language = export.resolve_language(request.GET.get("language"))
+    except export.ExportError as exc:
+        return HttpResponse(str(exc), status=400, content_type="text/plain; charset=utf-8")
+    rows = export.export_rows(fields, language)
+    response = StreamingHttpResponse(export.encode(fmt, fields, rows), content_type=export.FORMATS[fmt])
+    filename = f"catalog-{timezone.localdate():%Y%m%d}{'-' + language if language else ''}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ---------- HARVESTING (OAI-PMH) ----------
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def oai_pmh(request):
+    """OAI-PMH 2.0 endpoint for aggregators (see archive/harvest.py)."""
+    source = request.POST if request.method == "POST" else request.GET
+    params = {name: values[0] if len(values) == 1 else values for name, values in source.lists()}
+    with translation.override("en"):
+        context = harvest.respond(request, params)
+        return render(request, "archive/oai_pmh.xml", context, content_type="text/xml; charset=utf-8")
+
+
 # ---------- SOCIAL ACTIONS (likes & comments) ----------
+# The like/comment endpoints are async views: under ASGI
+# (heritage_site/asgi.py) one worker holds many of these short AJAX calls
+# at once instead of a thread each. Template rendering and the object
+# cache are synchronous and run through sync_to_async.
+
+async def _comment_user_stats(user):
+    """``comment_user_stats`` entry for the author of a freshly posted comment."""
+    return {
+        user.id: {
+            "profile": await sync_to_async(profile_for)(user),
+            "total_comments": await Comment.objects.filter(user=user, is_deleted=False).acount(),
+            "total_likes_received": await CommentLike.objects.filter(comment__user=user).acount(),
+        }
+    }
+
 
 @login_required
-def toggle_like(request, pk: int):
-    obj = get_object_or_404(HeritageObject, pk=pk)
-    like, created = HeritageLike.objects.get_or_create(user=request.user, object=obj)
+async def toggle_like(request, pk: int):
+    user = await request.auser()
+    obj = await sync_to_async(get_cached_or_404)(HeritageObject, pk)
+    like, created = await HeritageLike.objects.aget_or_create(user=user, object=obj)
     if not created:
-        like.delete()
+        await like.adelete()
         messages.success(request, "Removed like.")
     else:
         messages.success(request, "Liked.")
+    like_count = await HeritageLike.objects.filter(object=obj).acount()
+    await sync_to_async(live.publish)(obj.pk, "like", {"like_count": like_count})
     return redirect("heritage-detail", pk=obj.pk)
 
 
 @login_required
-def post_comment(request, pk: int):
+async def post_comment(request, pk: int):
     if request.method != "POST":
         return HttpResponseForbidden("POST required")
 
-    obj = get_object_or_404(HeritageObject, pk=pk)
+    user = await request.auser()
+    obj = await sync_to_async(get_cached_or_404)(HeritageObject, pk)
     form = CommentForm(request.POST)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         # AJAX request
         if form.is_valid():
-            comment = Comment.objects.create(
-                user=request.user,
+            comment = await Comment.objects.acreate(
+                user=user,
                 object=obj,
                 body=form.cleaned_data["body"],
             )
             
             # Get user stats for the new comment
-            user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
-            comment_user_stats = {
-                request.user.id: {
-                    "profile": user_profile,
-                    "total_comments": Comment.objects.filter(user=request.user, is_deleted=False).count(),
-                    "total_likes_received": CommentLike.objects.filter(comment__user=request.user).count(),
-                }
-            }
+            comment_user_stats = await _comment_user_stats(user)
             
             # Set like status
             comment.user_liked = False
+            await sync_to_async(live.comment_posted)(comment, comment_user_stats)
             
             # Render comment HTML
-            comment_html = render_to_string('archive/comment_partial.html', {
+            comment_html = await sync_to_async(render_to_string)('archive/comment_partial.html', {
                 'c': comment,
                 'comment_user_stats': comment_user_stats,
                 'request': request,
@@ -333,11 +434,13 @@ def post_comment(request, pk: int):
     
     # Regular form submission (fallback)
     if form.is_valid():
-        Comment.objects.create(
-            user=request.user,
+        comment = await Comment.objects.acreate(
+            user=user,
             object=obj,
             body=form.cleaned_data["body"],
         )
+        comment.user_liked = False
+        await sync_to_async(live.comment_posted)(comment, await _comment_user_stats(user))
         messages.success(request, "Comment posted.")
     else:
         messages.error(request, "Please fix the errors in your comment.")
@@ -347,7 +450,7 @@ def post_comment(request, pk: int):
 
 @login_required
 def delete_comment(request, comment_id: int):
-    comment = get_object_or_404(Comment, pk=comment_id)
+    comment = get_cached_or_404(Comment, comment_id)
     obj_pk = comment.object_id
 
     if not (request.user.is_staff or comment.user_id == request.user.id):
@@ -358,28 +461,32 @@ def delete_comment(request, comment_id: int):
         comment.save(update_fields=["is_deleted"])
     else:
         comment.delete()
+    live.publish(obj_pk, "comment-deleted", {"id": comment.pk, "parent_id": comment.parent_id})
 
     messages.success(request, "Comment removed.")
     return redirect("heritage-detail", pk=obj_pk)
 
 
 @login_required
-def toggle_comment_like(request, comment_id: int):
-    comment = get_object_or_404(Comment, pk=comment_id, is_deleted=False)
+async def toggle_comment_like(request, comment_id: int):
+    user = await request.auser()
+    comment = await sync_to_async(get_cached_or_404)(Comment, comment_id, is_deleted=False)
     obj_pk = comment.object_id
 
-    like, created = CommentLike.objects.get_or_create(user=request.user, comment=comment)
+    like, created = await CommentLike.objects.aget_or_create(user=user, comment=comment)
     liked = True
     if not created:
-        like.delete()
+        await like.adelete()
         liked = False
         messages.success(request, "Removed like.")
     else:
         messages.success(request, "Liked.")
     
+    like_count = await comment.likes.acount()
+    await sync_to_async(live.publish)(obj_pk, "comment-like", {"id": comment.pk, "like_count": like_count})
+    
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         # AJAX request
-        like_count = comment.likes.count()
         return JsonResponse({
             'success': True,
             'liked': liked,
@@ -391,11 +498,12 @@ def toggle_comment_like(request, comment_id: int):
 
 
 @login_required
-def post_comment_reply(request, comment_id: int):
+async def post_comment_reply(request, comment_id: int):
     if request.method != "POST":
         return HttpResponseForbidden("POST required")
     
-    parent_comment = get_object_or_404(Comment, pk=comment_id, is_deleted=False)
+    user = await request.auser()
+    parent_comment = await sync_to_async(get_cached_or_404)(Comment, comment_id, is_deleted=False)
     obj_pk = parent_comment.object_id
     
     body = request.POST.get("body", "").strip()
@@ -403,28 +511,23 @@ def post_comment_reply(request, comment_id: int):
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         # AJAX request
         if body:
-            reply = Comment.objects.create(
-                user=request.user,
-                object=parent_comment.object,
+            reply = await Comment.objects.acreate(
+                user=user,
+                object_id=parent_comment.object_id,
                 parent=parent_comment,
                 body=body,
             )
             
             # Get user stats for the reply
-            user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
-            comment_user_stats = {
-                request.user.id: {
-                    "profile": user_profile,
-                    "total_comments": Comment.objects.filter(user=request.user, is_deleted=False).count(),
-                    "total_likes_received": CommentLike.objects.filter(comment__user=request.user).count(),
-                }
-            }
+            comment_user_stats = await _comment_user_stats(user)
             
             # Set like status
             reply.user_liked = False
+            reply_count = await parent_comment.replies.filter(is_deleted=False).acount()
+            await sync_to_async(live.comment_posted)(reply, comment_user_stats, reply_count)
             
             # Render reply HTML
-            reply_html = render_to_string('archive/reply_partial.html', {
+            reply_html = await sync_to_async(render_to_string)('archive/reply_partial.html', {
                 'reply': reply,
                 'comment_user_stats': comment_user_stats,
                 'request': request,
@@ -434,8 +537,9 @@ def post_comment_reply(request, comment_id: int):
                 'success': True,
                 'message': 'Reply posted successfully!',
                 'reply_html': reply_html,
+                'reply_id': reply.id,
                 'parent_comment_id': parent_comment.id,
-                'reply_count': parent_comment.replies.filter(is_deleted=False).count()
+                'reply_count': reply_count
             })
         else:
             return JsonResponse({
@@ -445,12 +549,15 @@ def post_comment_reply(request, comment_id: int):
     
     # Regular form submission (fallback)
     if body:
-        Comment.objects.create(
-            user=request.user,
-            object=parent_comment.object,
+        reply = await Comment.objects.acreate(
+            user=user,
+            object_id=parent_comment.object_id,
             parent=parent_comment,
             body=body,
         )
+        reply.user_liked = False
+        reply_count = await parent_comment.replies.filter(is_deleted=False).acount()
+        await sync_to_async(live.comment_posted)(reply, await _comment_user_stats(user), reply_count)
         messages.success(request, "Reply posted.")
     else:
         messages.error(request, "Reply cannot be empty.")
@@ -458,11 +565,29 @@ def post_comment_reply(request, comment_id: int):
     return redirect("heritage-detail", pk=obj_pk)
 
 
+async def heritage_events(request, pk: int):
+    """Server-Sent Events with live comments and likes for one object (see
+    archive/live.py)."""
+    await sync_to_async(get_cached_or_404)(HeritageObject, pk)
+    if not hasattr(request, "scope"):
+        # Under WSGI a stream would hold a worker thread for its whole
+        # lifetime; 204 tells EventSource not to reconnect.
+        return HttpResponse(status=204)
+    try:
+        subscription = live.broker().subscribe(pk, request.LANGUAGE_CODE)
+    except live.TooManyStreams:
+        return unavailable(request, live.KEEPALIVE)
+    response = StreamingHttpResponse(live.stream(subscription), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 # ---------- COMMUNITY CONTRIBUTIONS ----------
 
 @login_required
 def propose_edit(request, pk: int):
-    obj = get_object_or_404(HeritageObject, pk=pk)
+    obj = get_cached_or_404(HeritageObject, pk)
 
     if request.method == "POST":
         form = ProposeEditForm(request.POST)
@@ -474,6 +599,7 @@ def propose_edit(request, pk: int):
                 user=request.user,
                 object=obj,
                 data=data,
+                base=proposals.base_values(obj, data) if isinstance(data, dict) else {},
                 note=note,
                 status="pending",
             )
@@ -487,13 +613,32 @@ def propose_edit(request, pk: int):
     return render(request, "archive/propose_edit.html", {"object": obj, "form": form})
 
 
+def _edit_conflict(obj, fields):
+    """409 for an inline edit made against an older version of the object,
+    with the values stored now so the editor can show what changed."""
+    current = {}
+    for field in fields:
+        value = getattr(obj, field)
+        current[field] = "" if value is None else str(value)
+    return JsonResponse({
+        "success": False,
+        "conflict": True,
+        "message": gettext(
+            "Someone else changed this object while you were editing. The fields they changed "
+            "are marked; submit again to replace their values with yours."
+        ),
+        "version": obj.version,
+        "current": current,
+    }, status=409)
+
+
 @login_required
 def propose_edit_inline(request, pk: int):
     """Handle inline edit submissions with permission-based auto-approval"""
     if request.method != "POST":
         return JsonResponse({"success": False, "message": "POST required"})
     
-    obj = get_object_or_404(HeritageObject, pk=pk)
+    obj = get_cached_or_404(HeritageObject, pk)
     
     # Check if this is an AJAX request
     if request.headers.get('X-Requested-With') != 'XMLHttpRequest':
@@ -516,6 +661,21 @@ def propose_edit_inline(request, pk: int):
             'origin_place', 'materials', 'dimensions', 'weight'
         ]
         
+        # Compare with the row as stored, not the cached copy, reading only
+        # the fields an inline edit can change
+        obj = HeritageObject.objects.only(*core_fields, *optional_fields, "version").get(pk=obj.pk)
+        version = request.POST.get("version", "")
+        if not version.isdigit():
+            # Without the version the form was loaded at there is nothing
+            # to detect a concurrent edit against
+            return JsonResponse({
+                "success": False,
+                "message": gettext("The edit form is out of date. Please reload the page."),
+            }, status=400)
+        version = int(version)
+        if version != obj.version:
+            return _edit_conflict(obj, core_fields + optional_fields)
+        
         # Collect changed fields only
         for field in core_fields + optional_fields:
             if field in request.POST:
@@ -539,7 +699,7 @@ def propose_edit_inline(request, pk: int):
             })
         
         # Check user permissions for auto-approval
-        user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
+        user_profile = profile_for(request.user)
         auto_approve = (
             request.user.is_superuser or
             request.user.is_staff or
@@ -547,29 +707,34 @@ def propose_edit_inline(request, pk: int):
         )
         
         if auto_approve:
-            # Apply changes directly to the object
-            for field, value in edited_data.items():
-                if field == 'origin_date' and value:
-                    # Parse date field
-                    from datetime import datetime
-                    value = datetime.strptime(value, '%Y-%m-%d').date()
-                elif value == '':
-                    # Convert empty strings to None for optional fields
-                    if field in optional_fields:
-                        value = None
-                
-                setattr(obj, field, value)
-            
-            obj.save()
-            
-            # Create an approved EditProposal for record-keeping
-            EditProposal.objects.create(
-                user=request.user,
-                object=obj,
-                data=edited_data,
-                note=f"Auto-approved edit by {user_profile.get_rank_display()}",
-                status="approved"
-            )
+            # One UPDATE of just the edited columns, refused if someone else
+            # saved the object after the form was loaded
+            values, problems = proposals.clean_values(edited_data, obj)
+            if problems:
+                return JsonResponse({
+                    "success": False,
+                    "message": gettext("Your changes could not be applied: %(problems)s") % {
+                        "problems": "; ".join(
+                            f"{field}: {problem['reason']}" for field, problem in problems.items()
+                        )
+                    }
+                })
+            try:
+                with transaction.atomic():
+                    proposals.write_fields(obj.pk, version, values, user=request.user)
+                    # Keep an approved EditProposal for record-keeping
+                    EditProposal.objects.create(
+                        user=request.user,
+                        object=obj,
+                        data=edited_data,
+                        base=proposals.base_values(obj, edited_data),
+                        note=f"Auto-approved edit by {user_profile.get_rank_display()}",
+                        status="approved",
+                        applied_at=timezone.now()
+                    )
+            except proposals.StaleVersion:
+                obj = HeritageObject.objects.only(*core_fields, *optional_fields, "version").get(pk=obj.pk)
+                return _edit_conflict(obj, core_fields + optional_fields)
             
             return JsonResponse({
                 "success": True,
@@ -582,6 +747,7 @@ def propose_edit_inline(request, pk: int):
                 user=request.user,
                 object=obj,
                 data=edited_data,
+                base=proposals.base_values(obj, edited_data),
                 note="Inline edit from heritage detail page",
                 status="pending"
             )
@@ -604,14 +770,26 @@ def propose_edit_inline(request, pk: int):
 def submit_object(request):
     if request.method == "POST":
         form = SubmissionForm(request.POST, request.FILES)
+        uploads = []
+        if form.is_valid():
+            for field in ("image", "model_3d"):
+                upload_id = form.cleaned_data.get(f"{field}_upload")
+                if upload_id and not form.cleaned_data.get(field):
+                    try:
+                        uploads.append(claim_upload(request.user, upload_id, field))
+                    except UploadError as e:
+                        form.add_error(field, str(e))
         if form.is_valid():
             submission: Submission = form.save(commit=False)
             submission.user = request.user
+            for upload in uploads:
+                setattr(submission, upload.field, upload.stored_name)
             
             # Check if user has auto-approval privileges
             if submission.should_auto_approve():
                 submission.status = "approved"
                 submission.save()
+                ChunkedUpload.objects.filter(pk__in=[u.pk for u in uploads]).update(status="attached")
                 
                 # Automatically create HeritageObject
                 heritage_obj = submission.create_heritage_object()
@@ -620,6 +798,7 @@ def submit_object(request):
             else:
                 submission.status = "pending"
                 submission.save()
+                ChunkedUpload.objects.filter(pk__in=[u.pk for u in uploads]).update(status="attached")
                 messages.success(request, "📋 Thank you! Your submission is pending review by our moderation team.")
                 
             return redirect("my-submissions")
@@ -642,6 +821,70 @@ def submit_object(request):
     })
 
 
+# ---------- CHUNKED UPLOADS ----------
+
+def _upload_json(upload):
+    return {
+        "success": True,
+        "upload_id": str(upload.pk),
+        "status": upload.status,
+        "chunk_size": upload.chunk_size,
+        "total_chunks": upload.total_chunks,
+        "received": received_chunks(upload) if upload.status in OPEN_STATUSES else [],
+    }
+
+
+@login_required
+@require_http_methods(["POST"])
+def upload_start(request):
+    """Open a chunked upload: {field, filename, size, sha256?}."""
+    try:
+        payload = json.loads(request.body or b"{}")
+        upload = start_upload(
+            request.user,
+            field=payload.get("field", ""),
+            filename=payload.get("filename", ""),
+            size=int(payload.get("size", 0)),
+            sha256=payload.get("sha256", ""),
+        )
+    except (ValueError, TypeError) as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=400)
+    return JsonResponse(_upload_json(upload), status=201)
+
+
+@login_required
+@require_http_methods(["GET"])
+def upload_status(request, upload_id):
+    """Report which chunks arrived so a client can resume."""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    return JsonResponse(_upload_json(upload))
+
+
+@login_required
+@require_http_methods(["PUT"])
+def upload_chunk(request, upload_id, index: int):
+    """Receive one chunk as the raw request body (X-Chunk-SHA256 optional)."""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    try:
+        chunk = write_chunk(upload, index, request, request.headers.get("X-Chunk-SHA256"))
+    except UploadError as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=400)
+    return JsonResponse({"success": True, "index": chunk.index, "sha256": chunk.sha256})
+
+
+@login_required
+@require_http_methods(["POST"])
+def upload_finalize(request, upload_id):
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    try:
+        upload = finalize_upload(upload)
+    except UploadBusy as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=409)
+    except UploadError as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=400)
+    return JsonResponse(_upload_json(upload))
+
+
 @login_required
 def my_submissions(request):
     items = Submission.objects.filter(user=request.user).order_by("-created_at")
@@ -658,7 +901,7 @@ def my_proposals(request):
 
 @login_required
 def me_dashboard(request):
-    profile, _ = UserProfile.objects.get_or_create(user=request.user)
+    profile = profile_for(request.user)
 
     likes_count = HeritageLike.objects.filter(user=request.user).count()
     comments_count = Comment.objects.filter(user=request.user, is_deleted=False).count()
@@ -686,10 +929,11 @@ def me_dashboard(request):
     )
 
 
+@serve_stale()
 def public_profile(request, username: str):
     User = get_user_model()
     user = get_object_or_404(User, username=username)
-    profile, _ = UserProfile.objects.get_or_create(user=user)
+    profile = profile_for(user)
 
     likes_count = HeritageLike.objects.filter(user=user).count()
     comments_count = Comment.objects.filter(user=user, is_deleted=False).count()
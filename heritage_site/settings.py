@@ -42,8 +42,11 @@ SITE_ID = 1  # required by django-allauth
 # Middleware (LocaleMiddleware MUST be after SessionMiddleware and before CommonMiddleware)
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'archive.middleware.StaticFilesMiddleware',           # WhiteNoise: fingerprinted static files
+    'archive.resilience.DatabaseBreakerMiddleware',       # 503 + Retry-After while the DB is failing
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',          # per-request language
+    'archive.middleware.QueryLanguageMiddleware',         # ?lang=ar overrides it (sitemaps/hreflang)
     'archive.middleware.ForceEnglishAdminMiddleware',     # keep admin in English
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -132,6 +135,42 @@ TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_TZ = True
 
+# Cache shared by all worker processes: fragment versions, cached pages and
+# rows, filter lists, and the locks and counters of the object cache, the
+# stale-page refresh and the circuit breaker, which rely on an atomic
+# add() and incr(). Set REDIS_URL (and install `redis`) in production.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    # Development fallback. The file cache lists its whole directory on
+    # every write and evicts entries at random once full (versions and
+    # generations then read as new, which only costs cache misses); its
+    # add() and incr() are not atomic, so those locks and counters are
+    # exact within one process only.
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        },
+    }
+
+# Shared by the workers' in-process object caches to evict changed rows
+# everywhere (see archive/object_cache.py)
+OBJECT_CACHE_LOG = BASE_DIR / 'cache' / 'object-cache.log'
+
+# Live comment/like events on detail pages (see archive/live.py). With more
+# than one ASGI worker use 'archive.live.LogFileBroker' so events published
+# by one worker reach the streams held by the others.
+LIVE_EVENTS_BROKER = 'archive.live.InProcessBroker'
+LIVE_EVENTS_LOG = BASE_DIR / 'cache' / 'live-events.log'
+
 # Static files
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [
@@ -139,9 +178,40 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Front-end libraries, fonts and Tailwind CSS are built by `manage.py build_assets`
+# (see archive/assets.py). WhiteNoise serves fingerprinted files with
+# `Cache-Control: immutable`; unhashed ones get a short max-age.
+WHITENOISE_MAX_AGE = 3600
+# Until the bundle is built, pages load the pinned CDN copies (and the
+# Tailwind Play CDN); `check --deploy` warns about it.
+# TAILWIND_CLI = '/usr/local/bin/tailwindcss'  # optional; downloaded if unset
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored once per content hash (see archive/storage.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'archive.storage.ContentAddressedStorage',
+    },
+    # Hashed file names plus .gz/.br siblings, written by collectstatic
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Hash uploads while they stream in so storage needs no second read pass
+FILE_UPLOAD_HANDLERS = [
+    'archive.storage.HashingMemoryFileUploadHandler',
+    'archive.storage.HashingTemporaryFileUploadHandler',
+]
+
+# Partial files of chunked uploads (see archive/uploads.py)
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'uploads_partial')
+
+# Run archive background jobs inline instead of on a thread pool (archive/tasks.py)
+BACKGROUND_TASKS_SYNC = False
+
 # Default auto field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
@@ -1,10 +1,10 @@
 # heritage_site/urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from django.views.generic import RedirectView  # ← add this
 from archive.admin_site import admin_site
+from archive.serving import serve_media
 
 urlpatterns = [
     # i18n (language switching)
@@ -25,6 +25,7 @@ urlpatterns = [
     path("", include("archive.urls")),
 ]
 
-# media in dev
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# media (Range requests, ETags and precompressed siblings; see archive/serving.py)
+urlpatterns += [
+    re_path(r"^%s(?P<path>.+)$" % settings.MEDIA_URL.lstrip("/"), serve_media, name="media"),
+]
\ No newline at end of file